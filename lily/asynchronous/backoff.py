@@ -1,5 +1,6 @@
 
 import asyncio
+import contextvars
 
 from .task import AsyncTask
 
@@ -29,9 +30,11 @@ class BackoffExecutor:
         idx = 0
         for task in self.tasks:
             if task.successful is False:
+                # -- each task runs in its own copy of the caller's context
                 futures.append(
                     loop.run_in_executor(
                         None,
+                        contextvars.copy_context().run,
                         task.callback,
                         *task.args
                     )
@@ -1,6 +1,7 @@
 
 import asyncio
 import concurrent.futures
+import contextvars
 
 from .task import AsyncTask
 
@@ -13,9 +14,15 @@ class ParallelExecutor:
 
     async def async_execute(self, loop):
 
+        # -- each task runs in its own copy of the caller's context so that
+        # -- `get_context` works the same way in the worker threads
         with concurrent.futures.ThreadPoolExecutor() as pool:
             futures = [
-                loop.run_in_executor(pool, task.callback, *task.args)
+                loop.run_in_executor(
+                    pool,
+                    contextvars.copy_context().run,
+                    task.callback,
+                    *task.args)
                 for task in self.tasks]
 
         future_results = asyncio.gather(*futures, return_exceptions=True)
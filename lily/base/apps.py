@@ -1,8 +1,16 @@
 from django.apps import AppConfig
 
+from lily.conf import settings
+from .log import start_queue_listener
+
 
 class BaseAppConfig(AppConfig):
 
     name = 'lily.base'
 
     verbose_name = 'Base'
+
+    def ready(self):
+
+        if settings.LILY_LOG_QUEUE_ENABLED:
+            start_queue_listener(max_size=settings.LILY_LOG_QUEUE_MAX_SIZE)
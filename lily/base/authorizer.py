@@ -1,5 +1,9 @@
+from functools import lru_cache
+from threading import Lock
+from time import monotonic
 
 from lily.base.events import EventFactory
+from lily.base.utils import import_from_string
 
 
 class AuthorizedResponse:
@@ -17,6 +21,11 @@ class AuthorizedResponse:
 class BaseAuthorizer(EventFactory):
     """Minimal Authorizer Class."""
 
+    # -- headers which fully determine the result of `authorize`, they are
+    # -- not inherited (each authorizer must declare its own) and if set to
+    # -- `None` the results of a given authorizer will never be cached
+    identity_headers = ('HTTP_X_ACCOUNT_TYPE', 'HTTP_X_USER_ID')
+
     def __init__(self, access_list):
         self.access_list = access_list
 
@@ -31,5 +40,83 @@ class BaseAuthorizer(EventFactory):
         except KeyError:
             raise self.AccessDenied('ACCESS_DENIED', context=request)
 
+    def get_identity(self, request):
+        """Render hashable identity of the request.
+
+        `None` is returned when the identity cannot be established and
+        therefore the result of the authorization must not be cached.
+
+        """
+        # -- `authorize` overridden by the subclass could depend on any
+        # -- other header, so inherited headers are never trusted
+        identity_headers = type(self).__dict__.get('identity_headers')
+        if not identity_headers:
+            return None
+
+        identity = tuple(request.META.get(h) for h in identity_headers)
+        if None in identity:
+            return None
+
+        return identity
+
     def log(self, authorize_data):
         return authorize_data
+
+
+class AuthorizedResponseCache:
+    """Time bounded cache of successful authorizations.
+
+    Only `AuthorizedResponse` instances are stored, therefore any
+    authorization error is always computed from scratch.
+
+    """
+
+    def __init__(self, ttl, max_size):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.entries = {}
+        self.lock = Lock()
+
+    def get(self, identity):
+        try:
+            expires_at, authorized = self.entries[identity]
+
+        except KeyError:
+            return None
+
+        if expires_at < monotonic():
+            return None
+
+        return self.copy(authorized)
+
+    def set(self, identity, authorized):
+        with self.lock:
+            if len(self.entries) >= self.max_size:
+                self.evict()
+
+            self.entries[identity] = (
+                monotonic() + self.ttl, self.copy(authorized))
+
+    def copy(self, authorized):
+        # -- make sure that handlers mutating `request.access` would not
+        # -- affect the cached value
+        return AuthorizedResponse(
+            request_access=dict(authorized.request_access),
+            response_headers=dict(authorized.response_headers))
+
+    def evict(self):
+        now = monotonic()
+        self.entries = {
+            identity: entry
+            for identity, entry in self.entries.items()
+            if entry[0] >= now
+        }
+
+        # -- all entries are still valid so the oldest one is dropped
+        if len(self.entries) >= self.max_size:
+            del self.entries[next(iter(self.entries))]
+
+
+@lru_cache(maxsize=None)
+def get_authorizer_class(path):
+    return import_from_string(path)
@@ -0,0 +1,227 @@
+import hashlib
+from collections import OrderedDict
+from functools import lru_cache
+from threading import Lock
+from time import monotonic
+
+from django.core.cache import caches
+import orjson
+
+from lily.conf import settings
+from .events import JsonResponseBase
+from .utils import import_from_string
+from . import name
+
+
+# -- names of the commands which responses can be cached
+CACHEABLE_NAMES = (name.Read, name.BulkRead)
+
+
+# -- names of the commands which invalidate cached responses of all
+# -- commands acting on the same resource
+INVALIDATING_NAMES = (
+    name.Create,
+    name.Update,
+    name.Delete,
+    name.BulkCreate,
+    name.BulkUpdate,
+    name.BulkDelete,
+    name.CreateOrUpdate,
+    name.CreateOrRead,
+)
+
+
+class CachePolicy:
+
+    def __init__(self, ttl, vary_on=None):
+        self.ttl = ttl
+
+        # -- names of the request headers (e.g. `Accept-Language`) which
+        # -- on top of the path params, query and access distinguish
+        # -- cached responses
+        self.vary_on = vary_on or []
+        self.vary_on_meta = [
+            'HTTP_{}'.format(header.upper().replace('-', '_'))
+            for header in self.vary_on
+        ]
+
+    def __eq__(self, other):
+        return (
+            isinstance(other, CachePolicy) and
+            self.ttl == other.ttl and
+            self.vary_on == other.vary_on)
+
+    def render_key(self, request, command_name, kwargs, generation):
+
+        return render_request_key(
+            request,
+            command_name,
+            kwargs,
+            generation,
+            [request.META.get(h) for h in self.vary_on_meta])
+
+
+def render_request_key(request, command_name, kwargs, *extra):
+    """Render key identifying all requests which would result in the
+    same response of a given command.
+
+    """
+    query = getattr(getattr(request, 'input', None), 'query', None)
+    if query is None:
+        query = sorted(request.GET.lists())
+
+    return orjson.dumps(
+        [
+            command_name,
+            kwargs,
+            query,
+            getattr(request, 'access', None),
+            *extra,
+        ],
+        default=str,
+        option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SORT_KEYS,
+    ).decode('utf8')
+
+
+class CachedResponse:
+
+    def __init__(self, status_code, content, etag=None):
+        self.status_code = status_code
+        self.content = content
+        self.etag = etag
+
+    @classmethod
+    def from_response(cls, response):
+        """Render shareable copy of the response.
+
+        `None` is returned for the responses which cannot be shared
+        with other requests (errors, streams, not modified etc.).
+
+        """
+        if (not isinstance(response, JsonResponseBase) or
+                response.status_code != 200):
+            return None
+
+        return cls(
+            status_code=response.status_code,
+            content=response.content,
+            etag=response.get('ETag'))
+
+
+class BaseResponseCache:
+    """Store of encoded responses of the cacheable commands.
+
+    Instead of removing cached entries of a given resource one by one
+    each resource has its generation which is part of the cache keys,
+    therefore bumping it invalidates all of them at once.
+
+    """
+
+    def get(self, key):
+        raise NotImplementedError
+
+    def set(self, key, response, ttl):
+        raise NotImplementedError
+
+    def get_generation(self, resource):
+        raise NotImplementedError
+
+    def invalidate(self, resource):
+        raise NotImplementedError
+
+
+class LocalResponseCache(BaseResponseCache):
+    """In-process LRU store of responses.
+
+    It is invalidated only by the writes served by the same process, the
+    other processes keep their responses until the `ttl` expires.
+
+    """
+
+    def __init__(self, max_size=None):
+        self.max_size = max_size or settings.LILY_RESPONSE_CACHE_MAX_SIZE
+        self.entries = OrderedDict()
+        self.generations = {}
+        self.lock = Lock()
+
+    def get(self, key):
+        with self.lock:
+            try:
+                expires_at, response = self.entries[key]
+
+            except KeyError:
+                return None
+
+            if expires_at < monotonic():
+                del self.entries[key]
+                return None
+
+            self.entries.move_to_end(key)
+
+            return response
+
+    def set(self, key, response, ttl):
+        with self.lock:
+            self.entries[key] = (monotonic() + ttl, response)
+            self.entries.move_to_end(key)
+
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def get_generation(self, resource):
+        return self.generations.get(resource, 0)
+
+    def invalidate(self, resource):
+        with self.lock:
+            self.generations[resource] = self.generations.get(resource, 0) + 1
+
+
+class DjangoResponseCache(BaseResponseCache):
+    """Store of responses shared by all processes using the same
+    Django's cache backend.
+
+    """
+
+    def __init__(self, alias=None):
+        self.cache = caches[alias or settings.LILY_RESPONSE_CACHE_ALIAS]
+
+    def get(self, key):
+        entry = self.cache.get(self.render_key(key))
+        if entry is None:
+            return None
+
+        return CachedResponse(*entry)
+
+    def set(self, key, response, ttl):
+        self.cache.set(
+            self.render_key(key),
+            (response.status_code, response.content, response.etag),
+            ttl)
+
+    def render_key(self, key):
+        # -- some backends (e.g. memcached) accept only short keys
+        # -- without any whitespaces
+        digest = hashlib.blake2b(key.encode('utf8'), digest_size=20)
+
+        return 'lily:response:{}'.format(digest.hexdigest())
+
+    def get_generation(self, resource):
+        return self.cache.get('lily:generation:{}'.format(resource), 0)
+
+    def invalidate(self, resource):
+        key = 'lily:generation:{}'.format(resource)
+
+        # -- `add` makes sure that concurrent invalidations would not
+        # -- override each other
+        if not self.cache.add(key, 1, None):
+            self.cache.incr(key)
+
+
+@lru_cache(maxsize=None)
+def get_response_cache(path):
+    return import_from_string(path)()
+
+
+# -- resources of which responses are cached by at least one command,
+# -- the writes of all the other resources need not invalidate anything
+cached_resources = set()
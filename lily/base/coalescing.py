@@ -0,0 +1,160 @@
+import hashlib
+from functools import lru_cache
+from threading import Event, Lock
+from time import monotonic, sleep
+from uuid import uuid4
+
+from lily.conf import settings
+from .cache import CachedResponse
+from .utils import get_redis, import_from_string
+
+
+class BaseSingleFlight:
+    """Execute at most one of the identical concurrent requests.
+
+    Requests arriving while the identical one is in flight wait for it
+    and share its response. If that response cannot be shared (error,
+    stream etc.) or it was not rendered within the timeout, the waiting
+    requests are executed on their own.
+
+    """
+
+    def __init__(self, timeout=None):
+        self.timeout = timeout or settings.LILY_COALESCING_TIMEOUT
+
+    def execute(self, key, render):
+        """Return response rendered by `render` or shared one.
+
+        The shared response is returned as `CachedResponse`.
+
+        """
+        raise NotImplementedError
+
+
+class Flight:
+
+    def __init__(self):
+        self.done = Event()
+        self.shared = None
+
+
+class LocalSingleFlight(BaseSingleFlight):
+    """Coalesce requests handled by the threads of the same process."""
+
+    def __init__(self, timeout=None):
+        super(LocalSingleFlight, self).__init__(timeout)
+        self.flights = {}
+        self.lock = Lock()
+
+    def execute(self, key, render):
+        with self.lock:
+            flight = self.flights.get(key)
+            is_leader = flight is None
+            if is_leader:
+                flight = self.flights[key] = Flight()
+
+        if is_leader:
+            response = None
+            try:
+                response = render()
+
+                return response
+
+            finally:
+                flight.shared = CachedResponse.from_response(response)
+                with self.lock:
+                    del self.flights[key]
+
+                flight.done.set()
+
+        if flight.done.wait(self.timeout) and flight.shared is not None:
+            return flight.shared
+
+        return render()
+
+
+class RedisSingleFlight(BaseSingleFlight):
+    """Coalesce requests handled by all processes sharing the redis
+    instance configured by the `LILY_ASYNC_LOCK_DB_*` settings.
+
+    """
+
+    POLL_INTERVAL = 0.01
+
+    # -- the lock is deleted only by the flight holding it, since after the
+    # -- timeout it could already be held by another leader
+    RELEASE_SCRIPT = '''
+        if redis.call('get', KEYS[1]) == ARGV[1] then
+            return redis.call('del', KEYS[1])
+        end
+
+        return 0
+    '''
+
+    def __init__(self, timeout=None):
+        super(RedisSingleFlight, self).__init__(timeout)
+
+        self.db = get_redis()
+        self.release = self.db.register_script(self.RELEASE_SCRIPT)
+
+    def execute(self, key, render):
+        digest = hashlib.blake2b(
+            key.encode('utf8'), digest_size=20).hexdigest()
+        lock_key = 'lily:flight:{}'.format(digest)
+        timeout_ms = int(1000 * self.timeout)
+
+        # -- each flight shares its response under its own key so that
+        # -- the response of the already finished flight is never reused
+        flight_id = uuid4().hex
+        if self.db.set(lock_key, flight_id, nx=True, px=timeout_ms):
+            response = None
+            try:
+                response = render()
+
+                return response
+
+            finally:
+                self.share(lock_key, flight_id, response, timeout_ms)
+
+        flight_id = self.db.get(lock_key)
+        if flight_id is None:
+            return render()
+
+        shared_key = 'lily:flight:shared:{}'.format(flight_id.decode('utf8'))
+        deadline = monotonic() + self.timeout
+        while True:
+            # -- the response is shared together with the release of the
+            # -- lock, so it must be checked after the lock
+            is_in_flight = self.db.get(lock_key) == flight_id
+            shared = self.db.hgetall(shared_key)
+            if shared:
+                return CachedResponse(
+                    status_code=int(shared[b'status_code']),
+                    content=shared[b'content'],
+                    etag=shared[b'etag'].decode('utf8') or None)
+
+            if not is_in_flight or monotonic() >= deadline:
+                return render()
+
+            sleep(self.POLL_INTERVAL)
+
+    def share(self, lock_key, flight_id, response, timeout_ms):
+        shared = CachedResponse.from_response(response)
+
+        with self.db.pipeline() as pipeline:
+            if shared is not None:
+                shared_key = 'lily:flight:shared:{}'.format(flight_id)
+                pipeline.hset(shared_key, mapping={
+                    'status_code': shared.status_code,
+                    'content': shared.content,
+                    'etag': shared.etag or '',
+                })
+                pipeline.pexpire(shared_key, timeout_ms)
+
+            self.release(keys=[lock_key], args=[flight_id], client=pipeline)
+            pipeline.execute()
+
+
+@lru_cache(maxsize=None)
+def get_single_flight(path):
+    return import_from_string(path)()
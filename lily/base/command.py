@@ -1,21 +1,47 @@
-
+import asyncio
+from contextlib import contextmanager, ExitStack
+import hashlib
+import random
 import re
+from time import perf_counter
 
 from django.views.generic import View as DjangoGenericView
-from django.db import transaction
+from django.db import connections, transaction
+from django.db.models import QuerySet
+from django.http.response import (
+    HttpResponse,
+    HttpResponseBase,
+    HttpResponseNotModified,
+)
+from django.utils.http import parse_etags
 from django.db.utils import DatabaseError
 from django.core.exceptions import (
+    ImproperlyConfigured,
     ObjectDoesNotExist,
     MultipleObjectsReturned,
     ValidationError,
 )
+import orjson
 
 from lily.conf import settings
-from .events import EventFactory
+from .events import EventFactory, JsonStreamingResponse
 from . import serializers
-from .utils import import_from_string
+from .authorizer import AuthorizedResponseCache, get_authorizer_class
+from .cache import (
+    CACHEABLE_NAMES,
+    INVALIDATING_NAMES,
+    CachedResponse,
+    cached_resources,
+    get_response_cache,
+    render_request_key,
+)
+from .coalescing import get_single_flight
+from .compression import ResponseCompressor
+from .limits import ConcurrencyLimiter, get_rate_limiter
+from .routers import READ_NAMES, is_sticky, make_sticky
 from .access import Access
-from .context import Context
+from .context import Context, current_context
+from .metrics import QUERY_COUNT_BUCKETS, registry
 from .source import Source
 from .input import Input
 from .output import Output
@@ -25,6 +51,9 @@ from .name import ConstantName
 event = EventFactory()
 
 
+NO_RESPONSE_HEADERS = {}
+
+
 class command_override:  # noqa
 
     def __init__(
@@ -34,7 +63,13 @@ class command_override:  # noqa
             access=None,
             input=None,
             output=None,
-            is_atomic=None):
+            is_atomic=None,
+            cache=None,
+            coalesce=None,
+            rate_limit=None,
+            concurrency_limit=None,
+            replica=None,
+            max_queries=None):
 
         self.name = name
         self.meta = meta
@@ -42,10 +77,69 @@ class command_override:  # noqa
         self.input = input
         self.output = output
         self.is_atomic = is_atomic
+        self.cache = cache
+        self.coalesce = coalesce
+        self.rate_limit = rate_limit
+        self.concurrency_limit = concurrency_limit
+        self.replica = replica
+        self.max_queries = max_queries
 
 
 class HTTPCommands(DjangoGenericView):
 
+    @classmethod
+    def is_async(cls):
+        """Check if commands should be served by the event loop.
+
+        All commands of a given class must be either synchronous or
+        asynchronous.
+
+        """
+        handlers = [
+            getattr(cls, method)
+            for method in cls.http_method_names
+            if method != 'options' and hasattr(cls, method)
+        ]
+        if not handlers:
+            return False
+
+        is_async = asyncio.iscoroutinefunction(handlers[0])
+        if any(asyncio.iscoroutinefunction(h) != is_async for h in handlers):
+            raise ImproperlyConfigured(
+                f'{cls.__qualname__} HTTP handlers must either be all sync '
+                f'or all async.')
+
+        return is_async
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        view = super(HTTPCommands, cls).as_view(**initkwargs)
+
+        # -- mark the view as a coroutine so that the ASGI handler would
+        # -- await it instead of running it in the thread
+        if cls.is_async():
+            view._is_coroutine = asyncio.coroutines._is_coroutine
+
+        return view
+
+    def http_method_not_allowed(self, request, *args, **kwargs):
+        response = super(HTTPCommands, self).http_method_not_allowed(
+            request, *args, **kwargs)
+
+        if self.is_async():
+            return _as_coroutine(response)
+
+        return response
+
+    def options(self, request, *args, **kwargs):
+        response = super(HTTPCommands, self).options(
+            request, *args, **kwargs)
+
+        if self.is_async():
+            return _as_coroutine(response)
+
+        return response
+
     @classmethod
     def overwrite(cls, get=None, post=None, put=None, delete=None):
 
@@ -74,18 +168,66 @@ class HTTPCommands(DjangoGenericView):
                         is_atomic=(
                             verb.is_atomic is not None and verb.is_atomic or
                             conf['is_atomic']),
+                        cache=verb.cache or conf['cache'],
+                        coalesce=(
+                            verb.coalesce is not None and verb.coalesce or
+                            conf['coalesce']),
+                        rate_limit=verb.rate_limit or conf['rate_limit'],
+                        concurrency_limit=(
+                            verb.concurrency_limit or
+                            conf['concurrency_limit']),
+                        replica=(
+                            verb.replica is not None and verb.replica or
+                            conf['replica']),
+                        max_queries=verb.max_queries or conf['max_queries'],
                     )(conf['fn']))
 
         return cls_copy
 
 
+class EventNameRenderer:
+    """Render and cache event names of a given command.
+
+    For the verb based names the event name depends only on the class of
+    the success exception, while for the `ConstantName` it depends on the
+    event declared by the exception itself, therefore both of them can be
+    computed only once per command.
+
+    """
+
+    MAX_CACHED_EVENTS = 256
+
+    def __init__(self, name):
+        self.name = name
+        self.cache = {}
+
+    def __call__(self, request, e):
+        key = (e.__class__, e.event)
+
+        try:
+            return self.cache[key]
+
+        except KeyError:
+            event_name = self.name.render_event_name(request, e)
+            if len(self.cache) < self.MAX_CACHED_EVENTS:
+                self.cache[key] = event_name
+
+            return event_name
+
+
 def command(
         name,
         meta,
         access=None,
         input=None,
         output=None,
-        is_atomic=False):
+        is_atomic=False,
+        cache=None,
+        coalesce=False,
+        rate_limit=None,
+        concurrency_limit=None,
+        replica=None,
+        max_queries=None):
 
     # -- defaults
     name = (isinstance(name, str) and ConstantName(name)) or name
@@ -95,147 +237,184 @@ def command(
 
     def command_inner(fn):
 
-        def inner(self, request, *args, **kwargs):
+        #
+        # PIPELINE
+        #
+        # -- everything which is known at the decoration time is computed
+        # -- here once, and stages which are not declared by the command
+        # -- are not part of the pipeline at all
+        command_name = name.render_command_name()
+        render_event_name = EventNameRenderer(name)
+        is_timed = (
+            settings.LILY_COMMAND_TIMINGS_ENABLED or
+            settings.LILY_SERVER_TIMING_ENABLED)
 
-            self.event = event
+        pipeline = _handler_stage(
+            is_timed and _timed('handler', fn) or fn,
+            output,
+            render_event_name,
+            is_atomic)
 
-            request._lily_context = Context(
-                command_name=name.render_command_name(),
-                request=request)
+        if max_queries is not None:
+            if asyncio.iscoroutinefunction(fn):
+                raise ImproperlyConfigured(
+                    f'{command_name} cannot declare max_queries, since it '
+                    f'is not supported by the async commands.')
 
-            try:
-                #
-                # AUTHORIZATION
-                #
-                response_headers = {}
-                if access.access_list:
-                    authorizer = import_from_string(
-                        settings.LILY_AUTHORIZER_CLASS
-                    )(access.access_list)
-                    authorized = authorizer.authorize(request)
-                    request.access = authorized.request_access
-                    request.log_authorizer = authorizer.log(request.access)
-                    response_headers = authorized.response_headers
-
-                #
-                # INPUT
-                #
-                if input:
-                    input.parse(
-                        request,
-                        command_name=request._lily_context.command_name)
-
-                #
-                # IS_ATOMIC
-                #
-                if not is_atomic:
-                    # -- trigger the handler which should raise the success or
-                    # -- error response
-                    # -- if no exception will be raised we return whatever it
-                    # -- was returned since most likely some default Django's
-                    # -- mechanism took place
-                    response = fn(self, request, *args, **kwargs)
-                    if isinstance(response, EventFactory.BaseSuccessException):
-                        return _handle_response(
-                            request, name, output, response_headers, response)
-
-                    else:
-                        return response
-
-                else:
-                    success_exception = None
-                    with transaction.atomic(using=is_atomic):
-                        try:
-                            response = fn(self, request, *args, **kwargs)
-                            if isinstance(response, EventFactory.BaseSuccessException):  # noqa
-                                return _handle_response(
-                                    request, name, output, response_headers, response)  # noqa
-
-                            else:
-                                return response
-
-                        except EventFactory.BaseSuccessException as e:
-                            e.extend(
-                                context=request,
-                                event=name.render_event_name(request, e)).log()
-
-                            success_exception = e
-
-                    # -- re-raise success exceptions outside of the
-                    # -- transaction block in order to make sure that it
-                    # -- would not be interpreted by `atomic` block as an
-                    # -- error
-                    if success_exception:
-                        raise success_exception
-
-            except EventFactory.Generic as e:
-                return e.extend(
-                    method=request.method, path=request.path
-                ).log().response()
+            pipeline = _query_budget_stage(
+                pipeline, command_name, max_queries)
 
-            except EventFactory.BaseSuccessException as e:
-                return _handle_response(
-                    request, name, output, response_headers, e)
+        # -- reads of the non atomic read commands are routed to the
+        # -- replica unless the command says otherwise
+        database = replica
+        if replica is None:
+            database = (
+                isinstance(name, READ_NAMES) and
+                not is_atomic and
+                settings.LILY_READ_REPLICA_DATABASE)
+
+        if database:
+            pipeline = _replica_stage(
+                pipeline, database, asyncio.iscoroutinefunction(fn))
+
+        elif (settings.LILY_READ_REPLICA_DATABASE and
+                (is_atomic or not isinstance(name, READ_NAMES))):
+            pipeline = _sticky_stage(
+                pipeline, asyncio.iscoroutinefunction(fn))
 
-            except EventFactory.BaseErrorException as e:
-                e.update_with_context(context=request)
+        if coalesce:
+            if not isinstance(name, CACHEABLE_NAMES):
+                raise ImproperlyConfigured(
+                    f'{command_name} cannot be coalesced, only the Read and '
+                    f'BulkRead commands can.')
 
-                response = e.response_class(e.data)
-                if e.extra_headers:
-                    for k, v in e.extra_headers.items():
-                        response[k] = v
+            if asyncio.iscoroutinefunction(fn):
+                raise ImproperlyConfigured(
+                    f'{command_name} cannot be coalesced, since it is not '
+                    f'supported by the async commands.')
+
+            pipeline = _coalescing_stage(pipeline, command_name)
+
+        if cache:
+            if not isinstance(name, CACHEABLE_NAMES):
+                raise ImproperlyConfigured(
+                    f'{command_name} cannot be cached, only the responses '
+                    f'of the Read and BulkRead commands can.')
+
+            cached_resources.add(name.resource)
+            pipeline = _cache_stage(
+                pipeline, cache, name.resource, command_name)
+
+        elif isinstance(name, INVALIDATING_NAMES):
+            pipeline = _invalidation_stage(pipeline, name.resource)
+
+        if input.query_parser or input.body_parser:
+            pipeline = _input_stage(pipeline, input, command_name, is_timed)
+
+        else:
+            pipeline = _empty_input_stage(pipeline, input)
+
+        if access.access_list:
+            pipeline = _authorization_stage(pipeline, access, is_timed)
+
+        if settings.LILY_COMPRESSION_ENCODINGS:
+            compressor = ResponseCompressor(
+                settings.LILY_COMPRESSION_ENCODINGS,
+                settings.LILY_COMPRESSION_LEVELS,
+                settings.LILY_COMPRESSION_MIN_SIZE,
+                (output.cache_compressed and
+                    settings.LILY_COMPRESSION_CACHE_MAX_SIZE))
+            if compressor.codecs:
+                pipeline = _compression_stage(
+                    pipeline,
+                    compressor.compress,
+                    asyncio.iscoroutinefunction(fn))
+
+        # -- excess load is shed before anything else is computed
+        if rate_limit or concurrency_limit:
+            pipeline = _admission_stage(
+                pipeline,
+                command_name,
+                rate_limit,
+                concurrency_limit,
+                asyncio.iscoroutinefunction(fn))
+
+        if asyncio.iscoroutinefunction(fn):
+            if is_atomic:
+                raise ImproperlyConfigured(
+                    f'{command_name} cannot be atomic, since it is not '
+                    f'supported by the async commands.')
+
+            async def inner(self, request, *args, **kwargs):
+
+                started = is_timed and perf_counter()
+                self.event = event
+
+                request._lily_context = Context(
+                    command_name=command_name,
+                    request=request)
+                token = current_context.set(request._lily_context)
+                if is_timed:
+                    request._lily_context.timings = []
+
+                try:
+                    response = await pipeline(
+                        self, request, NO_RESPONSE_HEADERS, args, kwargs)
+
+                except Exception as e:
+                    response = _handle_exception(
+                        request, render_event_name, output, e)
+
+                finally:
+                    current_context.reset(token)
+
+                if getattr(response, 'streaming', False):
+                    response.streaming_content = _stream_in_context(
+                        response.streaming_content, request._lily_context)
+
+                if is_timed:
+                    _report_timings(
+                        request._lily_context,
+                        response,
+                        perf_counter() - started)
 
                 return response
 
-            #
-            # GENERIC ERRORS HANDLING
-            #
-            except ValidationError as e:
-                e = event.BrokenRequest(
-                    'BODY_JSON_DID_NOT_PARSE',
-                    context=request,
-                    data={'errors': e.message_dict})
-                return e.response_class(e.data)
-
-            except ObjectDoesNotExist as e:
-                # -- Rather Hacky way of fetching the name of model
-                # -- which raised the DoesNotExist error
-                model_name = str(e).split()[0].upper()
-                e = event.DoesNotExist(
-                    'COULD_NOT_FIND_{}'.format(model_name),
-                    context=request)
-                return e.response_class(e.data)
-
-            except MultipleObjectsReturned as e:
-                # -- Rather Hacky way of fetching the name of model
-                # -- which raised the MultipleObjectsReturned error
-                m = re.search(r'than one\s+(?P<model_name>\w+)', str(e))
-                model_name = m.group('model_name').upper()
-
-                e = event.ServerError(
-                    'FOUND_MULTIPLE_INSTANCES_OF_{}'.format(model_name),
-                    context=request,
-                    is_critical=True)
-                return e.response_class(e.data)
-
-            # -- handle gracefully database and generic exceptions
-            # -- to make sure that lily valid response will be generated
-            except DatabaseError:
-                e = event.ServerError(
-                    'DATABASE_ERROR_OCCURRED',
-                    context=request,
-                    is_critical=True)
-
-                return e.response_class(e.data)
-
-            except Exception as err:
-                e = event.ServerError(
-                    'GENERIC_ERROR_OCCURRED',
-                    context=request,
-                    data={'errors': [str(err)]},
-                    is_critical=True)
-
-                return e.response_class(e.data)
+        else:
+            def inner(self, request, *args, **kwargs):
+
+                started = is_timed and perf_counter()
+                self.event = event
+
+                request._lily_context = Context(
+                    command_name=command_name,
+                    request=request)
+                token = current_context.set(request._lily_context)
+                if is_timed:
+                    request._lily_context.timings = []
+
+                try:
+                    response = pipeline(
+                        self, request, NO_RESPONSE_HEADERS, args, kwargs)
+
+                except Exception as e:
+                    response = _handle_exception(
+                        request, render_event_name, output, e)
+
+                finally:
+                    current_context.reset(token)
+
+                if getattr(response, 'streaming', False):
+                    response.streaming_content = _stream_in_context(
+                        response.streaming_content, request._lily_context)
+
+                if is_timed:
+                    _report_timings(
+                        request._lily_context,
+                        response,
+                        perf_counter() - started)
+
+                return response
 
         # -- the below specs are available shortly after the code compilation
         # -- and therefore can be made available on runtime
@@ -246,9 +425,15 @@ def command(
             'input': input,
             'output': output,
             'is_atomic': is_atomic,
+            'cache': cache,
+            'coalesce': coalesce,
+            'rate_limit': rate_limit,
+            'concurrency_limit': concurrency_limit,
+            'replica': replica,
+            'max_queries': max_queries,
             'fn': fn,
             # -- derived values
-            'name': name.render_command_name(),
+            'name': command_name,
             'method': fn.__name__,
             'source': Source(fn),
         }
@@ -258,32 +443,588 @@ def command(
     return command_inner
 
 
-def _handle_response(request, name, output, response_headers, e):
+#
+# PIPELINE STAGES
+#
+def _admission_stage(
+        next_stage, command_name, rate_limit, concurrency_limit, is_async):
+
+    rate_limiter = rate_limit and get_rate_limiter(command_name, rate_limit)
+    concurrency_limiter = (
+        concurrency_limit and ConcurrencyLimiter(concurrency_limit))
+
+    # -- rejections are rendered from the precomputed content, since
+    # -- they must be as cheap as possible
+    def rejection(event_name, retry_after):
+        content = orjson.dumps({'@type': 'error', '@event': event_name})
+
+        def reject():
+            response = HttpResponse(
+                content=content,
+                status=EventFactory.TooManyRequests.response_class.status_code,
+                content_type='application/json')
+            response['Retry-After'] = retry_after
+
+            return response
+
+        return reject
+
+    reject_rate_limited = rate_limit and rejection(
+        'RATE_LIMIT_EXCEEDED', rate_limit.retry_after)
+    reject_overloaded = rejection('CONCURRENCY_LIMIT_EXCEEDED', 1)
+
+    if is_async:
+        async def admit(self, request, response_headers, args, kwargs):
+
+            if rate_limiter and not rate_limiter.acquire():
+                return reject_rate_limited()
+
+            if not concurrency_limiter:
+                return await next_stage(
+                    self, request, response_headers, args, kwargs)
+
+            if not concurrency_limiter.acquire():
+                return reject_overloaded()
+
+            try:
+                return await next_stage(
+                    self, request, response_headers, args, kwargs)
+
+            finally:
+                concurrency_limiter.release()
+
+    else:
+        def admit(self, request, response_headers, args, kwargs):
+
+            if rate_limiter and not rate_limiter.acquire():
+                return reject_rate_limited()
+
+            if not concurrency_limiter:
+                return next_stage(
+                    self, request, response_headers, args, kwargs)
+
+            if not concurrency_limiter.acquire():
+                return reject_overloaded()
+
+            try:
+                return next_stage(
+                    self, request, response_headers, args, kwargs)
+
+            finally:
+                concurrency_limiter.release()
+
+    return admit
+
+
+def _compression_stage(next_stage, compress, is_async):
+
+    if is_async:
+        async def compressed(self, request, response_headers, args, kwargs):
+            return compress(
+                request,
+                await next_stage(
+                    self, request, response_headers, args, kwargs))
+
+    else:
+        def compressed(self, request, response_headers, args, kwargs):
+            return compress(
+                request,
+                next_stage(self, request, response_headers, args, kwargs))
+
+    return compressed
+
+
+def _authorization_stage(next_stage, access, is_timed):
+
+    # -- authorizers (and their caches) are created once per access list
+    # -- and reused by all requests
+    authorizers = {}
+
+    def get_authorizer():
+        authorizer_class = get_authorizer_class(settings.LILY_AUTHORIZER_CLASS)
+
+        try:
+            return authorizers[authorizer_class]
+
+        except KeyError:
+            cache = None
+            if settings.LILY_AUTHORIZER_CACHE_TTL:
+                cache = AuthorizedResponseCache(
+                    ttl=settings.LILY_AUTHORIZER_CACHE_TTL,
+                    max_size=settings.LILY_AUTHORIZER_CACHE_MAX_SIZE)
+
+            authorizers[authorizer_class] = (
+                authorizer_class(access.access_list), cache)
+
+            return authorizers[authorizer_class]
+
+    def authorize_request(request):
+        authorizer, cache = get_authorizer()
+
+        if cache:
+            identity = authorizer.get_identity(request)
+            authorized = identity is not None and cache.get(identity)
+            if not authorized:
+                authorized = authorizer.authorize(request)
+                if identity is not None:
+                    cache.set(identity, authorized)
+
+        else:
+            authorized = authorizer.authorize(request)
+
+        request.access = authorized.request_access
+        request.log_authorizer = authorizer.log(request.access)
+
+        return authorized
+
+    if is_timed:
+        authorize_request = _timed('authorization', authorize_request)
+
+    def authorize(self, request, response_headers, args, kwargs):
+        authorized = authorize_request(request)
+
+        return next_stage(
+            self, request, authorized.response_headers, args, kwargs)
+
+    return authorize
+
+
+def _input_stage(next_stage, input, command_name, is_timed):
+
+    parse_request = input.parse
+    if is_timed:
+        parse_request = _timed('input', parse_request)
+
+    def parse(self, request, response_headers, args, kwargs):
+        parse_request(request, command_name=command_name)
+
+        return next_stage(self, request, response_headers, args, kwargs)
+
+    return parse
+
+
+def _empty_input_stage(next_stage, input):
+
+    # -- there is nothing to parse, yet the `request.input` is always there
+    InputAttrs = input.InputAttrs
+
+    def parse(self, request, response_headers, args, kwargs):
+        request.input = InputAttrs()
+
+        return next_stage(self, request, response_headers, args, kwargs)
+
+    return parse
+
+
+def _cache_stage(next_stage, cache, resource, command_name):
+
+    def get_store():
+        return get_response_cache(settings.LILY_RESPONSE_CACHE_CLASS)
+
+    def render_key(store, request, kwargs):
+        # -- the generation is taken before the handler is called so that
+        # -- response computed during the concurrent write is stored under
+        # -- the already invalidated key
+        return cache.render_key(
+            request, command_name, kwargs, store.get_generation(resource))
+
+    def store_response(store, key, response):
+        cached = CachedResponse.from_response(response)
+        if cached is not None:
+            store.set(key, cached, cache.ttl)
+
+    if asyncio.iscoroutinefunction(next_stage):
+        async def get_or_render(
+                self, request, response_headers, args, kwargs):
+
+            store = get_store()
+            key = render_key(store, request, kwargs)
+            cached = store.get(key)
+            if cached is not None:
+                return _render_cached_response(
+                    request, cached, response_headers)
+
+            response = await next_stage(
+                self, request, response_headers, args, kwargs)
+            store_response(store, key, response)
+
+            return response
+
+    else:
+        def get_or_render(self, request, response_headers, args, kwargs):
+
+            store = get_store()
+            key = render_key(store, request, kwargs)
+            cached = store.get(key)
+            if cached is not None:
+                return _render_cached_response(
+                    request, cached, response_headers)
+
+            response = next_stage(
+                self, request, response_headers, args, kwargs)
+            store_response(store, key, response)
+
+            return response
+
+    return get_or_render
+
+
+def _coalescing_stage(next_stage, command_name):
+
+    def coalesce(self, request, response_headers, args, kwargs):
+        flight = get_single_flight(settings.LILY_COALESCING_CLASS)
+
+        response = flight.execute(
+            render_request_key(request, command_name, kwargs),
+            lambda: next_stage(self, request, response_headers, args, kwargs))
+
+        if isinstance(response, CachedResponse):
+            return _render_cached_response(request, response, response_headers)
+
+        return response
+
+    return coalesce
+
+
+def _query_budget_stage(next_stage, command_name, max_queries):
+
+    def count_queries(self, request, response_headers, args, kwargs):
+
+        if random.random() >= settings.LILY_QUERY_BUDGET_SAMPLE_RATE:
+            return next_stage(self, request, response_headers, args, kwargs)
+
+        counter = QueryCounter()
+        try:
+            with _counted_queries(counter):
+                response = next_stage(
+                    self, request, response_headers, args, kwargs)
+
+        except Exception:
+            report(request, counter)
+            raise
+
+        # -- rows of the streamed responses are fetched only while the
+        # -- response is consumed, so they are reported afterwards
+        if getattr(response, 'streaming', False):
+            response.streaming_content = _count_streamed_queries(
+                response.streaming_content,
+                counter,
+                lambda: report(request, counter))
+
+        else:
+            report(request, counter)
+
+        return response
+
+    def report(request, counter):
+        registry.observe(
+            command_name, 'queries', counter.count, QUERY_COUNT_BUCKETS)
+        registry.observe(command_name, 'db', counter.duration)
+
+        if counter.count > max_queries:
+            event.Warning(
+                'QUERY_BUDGET_EXCEEDED',
+                context=request,
+                data={
+                    'command_name': command_name,
+                    'max_queries': max_queries,
+                    'queries': counter.count,
+                })
+
+    return count_queries
+
+
+@contextmanager
+def _counted_queries(counter):
+    with ExitStack() as stack:
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(counter))
+
+        yield
+
+
+def _count_streamed_queries(content, counter, report):
+    try:
+        content = iter(content)
+        while True:
+            with _counted_queries(counter):
+                try:
+                    chunk = next(content)
+
+                except StopIteration:
+                    return
+
+            yield chunk
+
+    finally:
+        report()
+
+
+def _stream_in_context(content, context):
+    # -- streamed responses are consumed after the command returns, yet
+    # -- their rows must still be fetched within its context (e.g. be
+    # -- routed to the replica)
+    content = iter(content)
+    while True:
+        token = current_context.set(context)
+        try:
+            chunk = next(content)
+
+        except StopIteration:
+            return
+
+        finally:
+            current_context.reset(token)
+
+        yield chunk
+
+
+class QueryCounter:
+    """Execute wrapper counting queries and their total duration."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = perf_counter()
+        try:
+            return execute(sql, params, many, context)
+
+        finally:
+            self.count += 1
+            self.duration += perf_counter() - started
+
+
+def _replica_stage(next_stage, database, is_async):
+
+    def set_database(request):
+        # -- only the correlation ids passed by the caller can be sticky
+        context = request._lily_context
+        if not (context.is_correlated and is_sticky(context.correlation_id)):
+            context.database = database
+
+    if is_async:
+        async def route(self, request, response_headers, args, kwargs):
+            set_database(request)
+
+            return await next_stage(
+                self, request, response_headers, args, kwargs)
+
+    else:
+        def route(self, request, response_headers, args, kwargs):
+            set_database(request)
+
+            return next_stage(self, request, response_headers, args, kwargs)
+
+    return route
+
+
+def _sticky_stage(next_stage, is_async):
+
+    def stick(request, response):
+        # -- subsequent reads of the same correlation must see the write
+        context = request._lily_context
+        if (context.is_correlated and
+                isinstance(response, HttpResponseBase) and
+                response.status_code < 400):
+            make_sticky(context.correlation_id)
+
+    if is_async:
+        async def write(self, request, response_headers, args, kwargs):
+            response = await next_stage(
+                self, request, response_headers, args, kwargs)
+            stick(request, response)
+
+            return response
+
+    else:
+        def write(self, request, response_headers, args, kwargs):
+            response = next_stage(
+                self, request, response_headers, args, kwargs)
+            stick(request, response)
+
+            return response
+
+    return write
+
+
+def _invalidation_stage(next_stage, resource):
+
+    def invalidate_cached(response):
+        # -- only resources cached by some command are invalidated
+        if (resource in cached_resources and
+                isinstance(response, HttpResponseBase) and
+                response.status_code < 400):
+            get_response_cache(
+                settings.LILY_RESPONSE_CACHE_CLASS).invalidate(resource)
+
+    if asyncio.iscoroutinefunction(next_stage):
+        async def invalidate(self, request, response_headers, args, kwargs):
+            response = await next_stage(
+                self, request, response_headers, args, kwargs)
+            invalidate_cached(response)
+
+            return response
+
+    else:
+        def invalidate(self, request, response_headers, args, kwargs):
+            response = next_stage(
+                self, request, response_headers, args, kwargs)
+            invalidate_cached(response)
+
+            return response
+
+    return invalidate
+
+
+def _handler_stage(fn, output, render_event_name, is_atomic):
+
+    def handle(self, request, response_headers, args, kwargs):
+
+        # -- trigger the handler which should raise the success or
+        # -- error response
+        # -- if no exception will be raised we return whatever it
+        # -- was returned since most likely some default Django's
+        # -- mechanism took place
+        try:
+            response = fn(self, request, *args, **kwargs)
+
+        except EventFactory.BaseSuccessException as e:
+            response = e
+
+        if isinstance(response, EventFactory.BaseSuccessException):
+            return _handle_response(
+                request, render_event_name, output, response_headers, response)
+
+        return response
+
+    def handle_atomic(self, request, response_headers, args, kwargs):
+
+        # -- only the success event is captured within the transaction,
+        # -- while its serialization and encoding take place after the
+        # -- commit, so that the locks are held only for the time of the
+        # -- handler's database work
+        with transaction.atomic(using=is_atomic):
+            try:
+                response = fn(self, request, *args, **kwargs)
+
+            # -- success exceptions are caught within the transaction
+            # -- block in order to make sure that they would not be
+            # -- interpreted by `atomic` block as an error
+            except EventFactory.BaseSuccessException as e:
+                response = e
+
+            if isinstance(response, EventFactory.BaseSuccessException):
+                _fetch_locked_rows(response)
+
+        if isinstance(response, EventFactory.BaseSuccessException):
+            return _handle_response(
+                request, render_event_name, output, response_headers, response)
+
+        return response
+
+    async def handle_async(self, request, response_headers, args, kwargs):
+
+        try:
+            response = await fn(self, request, *args, **kwargs)
+
+        except EventFactory.BaseSuccessException as e:
+            response = e
+
+        if isinstance(response, EventFactory.BaseSuccessException):
+            return _handle_response(
+                request, render_event_name, output, response_headers, response)
+
+        return response
+
+    if asyncio.iscoroutinefunction(fn):
+        return handle_async
+
+    elif is_atomic:
+        return handle_atomic
+
+    return handle
+
+
+def _fetch_locked_rows(e):
+    # -- rows locked with `select_for_update` can be fetched only within
+    # -- the transaction, therefore such querysets are evaluated before
+    # -- the commit instead of during the serialization
+    values = [e.instance, e.data]
+    if isinstance(e.data, dict):
+        values.extend(e.data.values())
+
+    for value in values:
+        if isinstance(value, QuerySet) and value.query.select_for_update:
+            len(value)
+
+
+def _handle_response(request, render_event_name, output, response_headers, e):
     e.extend(
         context=request,
-        event=name.render_event_name(request, e)).log()
+        event=render_event_name(request, e)).log()
+
+    timings = request._lily_context.timings
+    started = timings is not None and perf_counter()
+
+    #
+    # CONDITIONAL REQUESTS
+    #
+    # -- if the version of the data is known upfront the serialization
+    # -- is skipped altogether for the not modified responses
+    etag = None
+    is_conditional = output.etag and isinstance(e, CONDITIONAL_EVENTS)
+    if is_conditional and e.version is not None:
+        etag = _render_version_etag(request, e.version)
+        if _is_not_modified(request, etag):
+            return _not_modified(etag, response_headers)
 
     #
     # OUTPUT
     #
+    # -- results of the serializer methods decorated with `memoize` are
+    # -- shared by all serializers of the response and dropped with it
+    output_context = {
+        **e.output_context,
+        'request': request,
+        'command_name': request._lily_context.command_name,
+        'memo': {},
+    }
+
+    data = (
+        (e.data is not None and e.data) or
+        (e.instance is not None and e.instance))
+
     try:
-        body = output.serializer(
-            (
-                (e.data is not None and e.data) or
-                (e.instance is not None and e.instance)
-            ),
-            context={
-                **e.output_context,
-                'request': request,
-                'command_name': request._lily_context.command_name,
-            }).data
-
-        body['@event'] = e.event
-
-        response = e.response_class(body)
+        if output.stream_field and isinstance(data, dict):
+            response = JsonStreamingResponse(
+                output.stream(data, e.event, output_context),
+                status_code=e.response_class.status_code)
+
+        else:
+            body = output.serializer(data, context=output_context).data
+
+            if timings is not None:
+                serialized = perf_counter()
+                timings.append(('serialization', serialized - started))
+
+            response = e.response_class(body, envelope={'@event': e.event})
+
+            if timings is not None:
+                timings.append(('encoding', perf_counter() - serialized))
+
+            if is_conditional and etag is None:
+                etag = _render_content_etag(response.content)
+                if _is_not_modified(request, etag):
+                    return _not_modified(etag, response_headers)
+
         for k, v in response_headers.items():
             response[k] = v
 
+        if etag:
+            response['ETag'] = etag
+
         return response
 
     # -- case of serializer returning error as well
@@ -296,3 +1037,186 @@ def _handle_response(request, name, output, response_headers, e):
                 response[k] = v
 
         return response
+
+
+#
+# CONDITIONAL REQUESTS
+#
+CONDITIONAL_EVENTS = (EventFactory.Read, EventFactory.BulkRead)
+
+
+def _render_version_etag(request, version):
+    # -- the same version of data can be rendered differently for
+    # -- different commands and different accessors
+    key = orjson.dumps(
+        [
+            request._lily_context.command_name,
+            version,
+            getattr(request, 'access', None),
+        ],
+        default=str,
+        option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SORT_KEYS)
+
+    return 'W/"{}"'.format(hashlib.blake2b(key, digest_size=16).hexdigest())
+
+
+def _render_content_etag(content):
+    return '"{}"'.format(hashlib.blake2b(content, digest_size=16).hexdigest())
+
+
+def _is_not_modified(request, etag):
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+    if not if_none_match:
+        return False
+
+    etags = parse_etags(if_none_match)
+    if etags == ['*']:
+        return True
+
+    # -- weak comparison as required for `If-None-Match`
+    return etag.replace('W/', '', 1) in [
+        e.replace('W/', '', 1) for e in etags]
+
+
+def _render_cached_response(request, cached, response_headers):
+    if cached.etag and _is_not_modified(request, cached.etag):
+        return _not_modified(cached.etag, response_headers)
+
+    response = HttpResponse(
+        content=cached.content,
+        status=cached.status_code,
+        content_type='application/json')
+    for k, v in response_headers.items():
+        response[k] = v
+
+    if cached.etag:
+        response['ETag'] = cached.etag
+
+    return response
+
+
+def _not_modified(etag, response_headers):
+    response = HttpResponseNotModified()
+    for k, v in response_headers.items():
+        response[k] = v
+
+    response['ETag'] = etag
+
+    return response
+
+
+#
+# TIMINGS
+#
+def _timed(stage, fn):
+
+    if asyncio.iscoroutinefunction(fn):
+        async def timed(*args, **kwargs):
+            started = perf_counter()
+            try:
+                return await fn(*args, **kwargs)
+
+            finally:
+                current_context.get().timings.append(
+                    (stage, perf_counter() - started))
+
+    else:
+        def timed(*args, **kwargs):
+            started = perf_counter()
+            try:
+                return fn(*args, **kwargs)
+
+            finally:
+                current_context.get().timings.append(
+                    (stage, perf_counter() - started))
+
+    return timed
+
+
+def _report_timings(context, response, total):
+
+    timings = context.timings + [('total', total)]
+    for stage, duration in timings:
+        registry.observe(context.command_name, stage, duration)
+
+    if (settings.LILY_SERVER_TIMING_ENABLED and
+            isinstance(response, HttpResponseBase)):
+        response['Server-Timing'] = ', '.join(
+            f'{stage};dur={1000 * duration:.3f}'
+            for stage, duration in timings)
+
+
+def _handle_exception(request, render_event_name, output, e):
+
+    if isinstance(e, EventFactory.Generic):
+        return e.extend(
+            method=request.method, path=request.path
+        ).log().response()
+
+    elif isinstance(e, EventFactory.BaseSuccessException):
+        return _handle_response(
+            request, render_event_name, output, NO_RESPONSE_HEADERS, e)
+
+    elif isinstance(e, EventFactory.BaseErrorException):
+        e.update_with_context(context=request)
+
+        response = e.response_class(e.data)
+        if e.extra_headers:
+            for k, v in e.extra_headers.items():
+                response[k] = v
+
+        return response
+
+    #
+    # GENERIC ERRORS HANDLING
+    #
+    elif isinstance(e, ValidationError):
+        e = event.BrokenRequest(
+            'BODY_JSON_DID_NOT_PARSE',
+            context=request,
+            data={'errors': e.message_dict})
+        return e.response_class(e.data)
+
+    elif isinstance(e, ObjectDoesNotExist):
+        # -- Rather Hacky way of fetching the name of model
+        # -- which raised the DoesNotExist error
+        model_name = str(e).split()[0].upper()
+        e = event.DoesNotExist(
+            'COULD_NOT_FIND_{}'.format(model_name),
+            context=request)
+        return e.response_class(e.data)
+
+    elif isinstance(e, MultipleObjectsReturned):
+        # -- Rather Hacky way of fetching the name of model
+        # -- which raised the MultipleObjectsReturned error
+        m = re.search(r'than one\s+(?P<model_name>\w+)', str(e))
+        model_name = m.group('model_name').upper()
+
+        e = event.ServerError(
+            'FOUND_MULTIPLE_INSTANCES_OF_{}'.format(model_name),
+            context=request,
+            is_critical=True)
+        return e.response_class(e.data)
+
+    # -- handle gracefully database and generic exceptions
+    # -- to make sure that lily valid response will be generated
+    elif isinstance(e, DatabaseError):
+        e = event.ServerError(
+            'DATABASE_ERROR_OCCURRED',
+            context=request,
+            is_critical=True)
+
+        return e.response_class(e.data)
+
+    else:
+        e = event.ServerError(
+            'GENERIC_ERROR_OCCURRED',
+            context=request,
+            data={'errors': [str(e)]},
+            is_critical=True)
+
+        return e.response_class(e.data)
+
+
+async def _as_coroutine(response):
+    return response
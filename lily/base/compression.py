@@ -0,0 +1,227 @@
+import hashlib
+import zlib
+from collections import OrderedDict
+from functools import lru_cache
+from threading import Lock, local
+
+from django.utils.cache import patch_vary_headers
+
+try:
+    import zstandard
+
+except ImportError:
+    zstandard = None
+
+try:
+    import brotli
+
+except ImportError:
+    try:
+        import brotlicffi as brotli
+
+    except ImportError:
+        brotli = None
+
+
+class BaseCodec:
+
+    encoding = NotImplemented
+
+    def __init__(self, level):
+        self.level = level
+
+    @classmethod
+    def is_available(cls):
+        return True
+
+    def compress(self, content):
+        raise NotImplementedError
+
+
+class GzipCodec(BaseCodec):
+    """Codec based on the standard library, therefore always available."""
+
+    encoding = 'gzip'
+
+    def __init__(self, level):
+        super(GzipCodec, self).__init__(level)
+
+        # -- the initialized compressor is copied instead of being created
+        # -- for each response (`wbits=31` stands for the gzip container)
+        self.compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, content):
+        compressor = self.compressor.copy()
+
+        return compressor.compress(content) + compressor.flush()
+
+
+class BrotliCodec(BaseCodec):
+    """Codec requiring the `brotli` or `brotlicffi` package."""
+
+    encoding = 'br'
+
+    @classmethod
+    def is_available(cls):
+        return brotli is not None
+
+    def compress(self, content):
+        return brotli.compress(content, quality=self.level)
+
+
+class ZstdCodec(BaseCodec):
+    """Codec requiring the `zstandard` package."""
+
+    encoding = 'zstd'
+
+    def __init__(self, level):
+        super(ZstdCodec, self).__init__(level)
+
+        # -- compressors can be reused but not shared between threads
+        self.local = local()
+
+    @classmethod
+    def is_available(cls):
+        return zstandard is not None
+
+    def compress(self, content):
+        try:
+            compressor = self.local.compressor
+
+        except AttributeError:
+            compressor = self.local.compressor = zstandard.ZstdCompressor(
+                level=self.level)
+
+        return compressor.compress(content)
+
+
+CODECS = {
+    codec.encoding: codec
+    for codec in [GzipCodec, BrotliCodec, ZstdCodec]
+}
+
+
+@lru_cache(maxsize=None)
+def get_codec(encoding, level):
+    return CODECS[encoding](level)
+
+
+@lru_cache(maxsize=128)
+def parse_accept_encoding(header):
+    """Return mapping of the encodings accepted by the client to their
+    quality values.
+
+    """
+    accepted = {}
+    for part in header.split(','):
+        encoding, _, params = part.partition(';')
+        encoding = encoding.strip().lower()
+        if not encoding:
+            continue
+
+        quality = 1.0
+        for param in params.split(';'):
+            key, _, value = param.partition('=')
+            if key.strip().lower() == 'q':
+                try:
+                    quality = float(value)
+
+                except ValueError:
+                    quality = 0.0
+
+        accepted[encoding] = quality
+
+    return accepted
+
+
+class ResponseCompressor:
+    """Compress responses with the best encoding accepted by the client.
+
+    `encodings` are given in the order of preference which is used when
+    the client accepts more of them with the same quality, while the ones
+    whose optional packages are not installed are skipped.
+
+    """
+
+    def __init__(self, encodings, levels, min_size, cache_max_size=0):
+        self.codecs = [
+            get_codec(encoding, levels[encoding])
+            for encoding in encodings
+            if CODECS[encoding].is_available()
+        ]
+        self.min_size = min_size
+
+        # -- compressed bytes of the most recent contents, useful only for
+        # -- the static documents which are rendered over and over again
+        self.cache_max_size = cache_max_size
+        self.cache = OrderedDict()
+        self.lock = Lock()
+
+    def negotiate(self, header):
+        accepted = parse_accept_encoding(header)
+
+        best, best_quality = None, 0
+        for codec in self.codecs:
+            quality = accepted.get(codec.encoding, accepted.get('*', 0))
+            if quality > best_quality:
+                best, best_quality = codec, quality
+
+        return best
+
+    def compress(self, request, response):
+
+        if (response.streaming or
+                response.has_header('Content-Encoding') or
+                len(response.content) < self.min_size):
+            return response
+
+        # -- the response could have been compressed, therefore caches
+        # -- must distinguish it by the accepted encodings
+        patch_vary_headers(response, ('Accept-Encoding',))
+
+        codec = self.negotiate(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if codec is None:
+            return response
+
+        content = response.content
+        if self.cache_max_size:
+            compressed = self.compress_cached(codec, content)
+
+        else:
+            compressed = codec.compress(content)
+
+        if len(compressed) >= len(content):
+            return response
+
+        response.content = compressed
+        response['Content-Encoding'] = codec.encoding
+        response['Content-Length'] = str(len(compressed))
+
+        # -- the compressed representation is not byte by byte equal to
+        # -- the one described by the strong ETag
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+
+        return response
+
+    def compress_cached(self, codec, content):
+        key = (
+            codec.encoding,
+            hashlib.blake2b(content, digest_size=16).digest())
+
+        with self.lock:
+            compressed = self.cache.get(key)
+            if compressed is not None:
+                self.cache.move_to_end(key)
+
+                return compressed
+
+        compressed = codec.compress(content)
+
+        with self.lock:
+            self.cache[key] = compressed
+            if len(self.cache) > self.cache_max_size:
+                self.cache.popitem(last=False)
+
+        return compressed
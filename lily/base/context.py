@@ -1,32 +1,42 @@
-
-import inspect
+from contextvars import ContextVar
+from time import perf_counter
 from uuid import uuid4
 
-from django.http import HttpRequest
+
+# -- context of the command currently being executed, since it's stored
+# -- in the `ContextVar` it's automatically isolated between threads and
+# -- asyncio tasks
+current_context = ContextVar('lily_context', default=None)
 
 
-# FIXME: test it!!!
 class Context:
 
+    # -- durations of the consecutive stages of the command, collected only
+    # -- when timings are enabled
+    timings = None
+
+    # -- alias of the database to which reads are routed by the
+    # -- `ReadReplicaRouter`, `None` stands for the default routing
+    database = None
+
+    # -- `True` if the correlation id was passed by the caller and therefore
+    # -- could be shared by other requests
+    is_correlated = False
+
     def __init__(self, command_name, request):
 
         # -- to track current command
         self.command_name = command_name
+        self.started = perf_counter()
 
         # -- to track requests send between commands
         if request.META.get('HTTP_X_CS_CORRELATION_ID'):
             self.correlation_id = request.META['HTTP_X_CS_CORRELATION_ID']
+            self.is_correlated = True
 
         else:
             self.correlation_id = str(uuid4())
 
 
-# FIXME: test it!!!
 def get_context():
-    frame = inspect.currentframe()
-
-    while frame:
-        request = frame.f_locals.get('request')
-
-        if isinstance(request, HttpRequest):
-            return request._lily_context
+    return current_context.get()
@@ -1,21 +1,81 @@
 
+from decimal import Decimal
 import logging
+from time import perf_counter
 
 import orjson
-from django.http import HttpResponse
+from django.http import HttpResponse, StreamingHttpResponse
+
+from lily.conf import settings
+from .log import (
+    EventMessage,
+    get_critical_events_throttle,
+    get_success_events_aggregator,
+)
+from .sinks import get_event_sink
+
+
+JSON_OPTIONS = orjson.OPT_NON_STR_KEYS
+
+
+def encode_default(value):
+    # -- `datetime`, `UUID` and dataclasses are encoded by `orjson` itself
+    if isinstance(value, Decimal):
+        return str(value)
+
+    raise TypeError
+
+
+def render_json(data, envelope=None):
+    """Encode `data` together with the `envelope` keys straight to bytes.
+
+    The keys of the envelope (e.g. `@event`) are appended to the already
+    encoded object, so the `data` (which might be shared) is not mutated.
+    Only objects (or `None`) can be enveloped.
+
+    """
+    if not envelope:
+        return orjson.dumps(
+            data, default=encode_default, option=JSON_OPTIONS)
+
+    if data is None:
+        data = {}
+
+    if not isinstance(data, dict):
+        raise TypeError(
+            'only objects can be enveloped, got {}'.format(
+                type(data).__name__))
+
+    # -- envelope overrides the keys of the data
+    if not data.keys().isdisjoint(envelope):
+        return orjson.dumps(
+            {**data, **envelope},
+            default=encode_default,
+            option=JSON_OPTIONS)
+
+    encoded = orjson.dumps(
+        envelope, default=encode_default, option=JSON_OPTIONS)
+    if not data:
+        return encoded
+
+    content = orjson.dumps(data, default=encode_default, option=JSON_OPTIONS)
+
+    return content[:-1] + b',' + encoded[1:]
 
 
 class JsonResponseBase(HttpResponse):
+    """JSON response which keeps only the encoded content."""
 
     status_code = NotImplemented
 
-    data = {}
-
-    def __init__(self, data=None):
-        self.data = data or self.data or {}
+    def __init__(self, data=None, envelope=None):
+        # -- responses without any data are rendered as the empty object
+        if data is None:
+            data = {}
 
-        data = orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS)
-        super().__init__(content=data, content_type='application/json')
+        super().__init__(
+            content=render_json(data, envelope),
+            content_type='application/json')
 
 
 class Json200(JsonResponseBase):
@@ -50,10 +110,23 @@ class Json409(JsonResponseBase):
     status_code = 409
 
 
+class Json429(JsonResponseBase):
+    status_code = 429
+
+
 class Json500(JsonResponseBase):
     status_code = 500
 
 
+class JsonStreamingResponse(StreamingHttpResponse):
+
+    def __init__(self, streaming_content, status_code):
+        super().__init__(
+            streaming_content=streaming_content,
+            content_type='application/json',
+            status=status_code)
+
+
 class HttpGenericResponse(HttpResponse):
 
     def __init__(self, status_code, content, *args, **kwargs):
@@ -68,6 +141,25 @@ class EventFactory:
     def __init__(self):
         self.logger = logging.getLogger()
 
+    @staticmethod
+    def send_to_sink(event_type, event, response_class, data, context):
+        """Pass the event to the sink configured by `LILY_EVENT_SINK_CLASS`.
+
+        """
+        path = settings.LILY_EVENT_SINK_CLASS
+        if not path:
+            return
+
+        lily_context = getattr(context, '_lily_context', None)
+        get_event_sink(path).send({
+            'event': event,
+            'type': event_type,
+            'status_code': getattr(response_class, 'status_code', None),
+            'command_name': lily_context and lily_context.command_name,
+            'correlation_id': lily_context and lily_context.correlation_id,
+            'data': data,
+        })
+
     class Context:
 
         def __init__(self, **kwargs):
@@ -127,13 +219,17 @@ class EventFactory:
                 data=None,
                 event=None,
                 output_context=None,
-                context=None):
+                context=None,
+                version=None):
 
             self.context = context or EventFactory.Context()
             self.event = event
             self.instance = instance
             self.data = data or {}
             self.output_context = output_context or {}
+            # -- cheap token (e.g. `updated_at`) identifying the version of
+            # -- the returned data used for rendering of the `ETag`
+            self.version = version
             self.logger = logging.getLogger()
 
         def extend(self, event=None, context=None):
@@ -166,12 +262,31 @@ class EventFactory:
             if log_authorizer:
                 data['@authorizer'] = log_authorizer
 
-            # -- notify about the event
-            message = '{event}: {log_data}'.format(
-                event=self.event,
-                log_data=orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS))
+            EventFactory.send_to_sink(
+                'success',
+                self.event,
+                getattr(self, 'response_class', None),
+                data,
+                self.context)
 
-            self.logger.info(message)
+            if not self.logger.isEnabledFor(logging.INFO):
+                return
+
+            interval = settings.LILY_SUCCESS_EVENTS_AGGREGATION_INTERVAL
+            if interval:
+                # -- latency till the event was raised by the command
+                latency = 0
+                lily_context = getattr(self.context, '_lily_context', None)
+                if lily_context is not None:
+                    latency = perf_counter() - lily_context.started
+
+                get_success_events_aggregator(interval).record(
+                    self.event, self.response_class.status_code, latency)
+
+                return
+
+            # -- notify about the event
+            self.logger.info(EventMessage(self.event, data))
 
     class Executed(BaseSuccessException):
         response_class = Json200
@@ -252,14 +367,24 @@ class EventFactory:
 
             self.is_critical = is_critical
 
+            EventFactory.send_to_sink(
+                'error',
+                event,
+                getattr(self, 'response_class', None),
+                self.data,
+                context)
+
             # -- notify about the event
-            message = '{event}: {data}'.format(
-                event=event,
-                data=orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS))
+            message = EventMessage(event, self.data)
 
             # FIXME: !!!! make it log in the lazy way so that enriching with
             # the context could take place!!!
+
             if is_critical or self.is_critical:
+                if not self.is_logged_in_full(event):
+                    # -- only counted by the throttle
+                    return
+
                 if hasattr(context, 'data'):
                     self.logger.error(
                         message, exc_info=True, extra={'data': context.data})
@@ -274,6 +399,15 @@ class EventFactory:
                 # -- ERROR
                 self.logger.info(message)
 
+        def is_logged_in_full(self, event):
+            limit = settings.LILY_CRITICAL_EVENTS_LOG_LIMIT
+            if not limit:
+                return True
+
+            return get_critical_events_throttle(
+                limit,
+                settings.LILY_CRITICAL_EVENTS_LOG_WINDOW).acquire(event)
+
         def update_with_context(self, context):
             log_authorizer = getattr(context, 'log_authorizer', {})
             if log_authorizer:
@@ -307,6 +441,9 @@ class EventFactory:
 
         is_critical = True
 
+    class TooManyRequests(BaseErrorException):
+        response_class = Json429
+
     class ServerError(BaseErrorException):
         response_class = Json500
 
@@ -0,0 +1,116 @@
+import math
+from threading import Lock
+from time import monotonic, time
+
+from lily.conf import settings
+from .utils import get_redis, import_from_string
+
+
+class RateLimit:
+
+    def __init__(self, rate, per=1, burst=None):
+        # -- `rate` requests are admitted every `per` seconds, while
+        # -- at most `burst` of them can be admitted at once
+        self.rate = rate
+        self.per = per
+        self.burst = burst or rate
+
+        # -- time after which the next request will surely be admitted
+        self.retry_after = max(1, math.ceil(per / rate))
+
+    def __eq__(self, other):
+        return (
+            isinstance(other, RateLimit) and
+            self.rate == other.rate and
+            self.per == other.per and
+            self.burst == other.burst)
+
+
+class BaseRateLimiter:
+
+    def __init__(self, key, rate_limit):
+        self.key = key
+        self.rate_limit = rate_limit
+
+    def acquire(self):
+        """Return `True` if the request should be admitted."""
+        raise NotImplementedError
+
+
+class LocalRateLimiter(BaseRateLimiter):
+    """In-process token bucket."""
+
+    def __init__(self, key, rate_limit):
+        super(LocalRateLimiter, self).__init__(key, rate_limit)
+        self.refill_rate = rate_limit.rate / rate_limit.per
+        self.tokens = rate_limit.burst
+        self.refilled_at = monotonic()
+        self.lock = Lock()
+
+    def acquire(self):
+        with self.lock:
+            now = monotonic()
+            self.tokens = min(
+                self.rate_limit.burst,
+                self.tokens + (now - self.refilled_at) * self.refill_rate)
+            self.refilled_at = now
+
+            if self.tokens < 1:
+                return False
+
+            self.tokens -= 1
+
+            return True
+
+
+class RedisRateLimiter(BaseRateLimiter):
+    """Fixed window counter shared by all processes using the redis
+    instance configured by the `LILY_ASYNC_LOCK_DB_*` settings.
+
+    Within each window of `per` seconds at most `rate` requests are
+    admitted, `burst` is not taken into account.
+
+    """
+
+    def __init__(self, key, rate_limit):
+        super(RedisRateLimiter, self).__init__(key, rate_limit)
+
+        self.db = get_redis()
+
+    def acquire(self):
+        window = int(time() // self.rate_limit.per)
+        key = 'lily:rate_limit:{}:{}'.format(self.key, window)
+
+        with self.db.pipeline() as pipeline:
+            pipeline.incr(key)
+            pipeline.expire(key, math.ceil(self.rate_limit.per) + 1)
+            count, _ = pipeline.execute()
+
+        return count <= self.rate_limit.rate
+
+
+class ConcurrencyLimiter:
+    """Non blocking limit of requests being handled at the same time."""
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.in_flight = 0
+        self.lock = Lock()
+
+    def acquire(self):
+        with self.lock:
+            if self.in_flight >= self.limit:
+                return False
+
+            self.in_flight += 1
+
+            return True
+
+    def release(self):
+        with self.lock:
+            self.in_flight -= 1
+
+
+def get_rate_limiter(key, rate_limit):
+    return import_from_string(settings.LILY_RATE_LIMITER_CLASS)(
+        key, rate_limit)
@@ -0,0 +1,219 @@
+import atexit
+from functools import lru_cache
+import logging
+from logging.handlers import QueueHandler, QueueListener
+import queue
+from threading import Event, Lock, Thread, Timer
+from time import monotonic
+
+import orjson
+
+
+class EventMessage:
+    """Structured log message of the event.
+
+    It's rendered only when a handler actually emits the record, therefore
+    events discarded by the log level cost no serialization.
+
+    """
+
+    __slots__ = ('event', 'data', 'rendered')
+
+    def __init__(self, event, data):
+        self.event = event
+        self.data = data
+        self.rendered = None
+
+    def __str__(self):
+        if self.rendered is None:
+            self.rendered = '{event}: {data}'.format(
+                event=self.event,
+                data=orjson.dumps(
+                    self.data,
+                    default=str,
+                    option=orjson.OPT_NON_STR_KEYS).decode('utf8'))
+
+        return self.rendered
+
+    def __repr__(self):
+        return '<EventMessage {}>'.format(self.event)
+
+
+class EventQueueHandler(QueueHandler):
+    """Non blocking handler passing records to the `QueueListener`.
+
+    Unlike the `QueueHandler` it does not format records in the calling
+    thread, so the messages are rendered by the listener, which is valid
+    only for the in-process queues. Records which do not fit into the full
+    queue are dropped and counted instead of blocking the request.
+
+    """
+
+    def __init__(self, queue):
+        super(EventQueueHandler, self).__init__(queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+
+        except queue.Full:
+            self.dropped += 1
+
+
+class SuccessEventsAggregator:
+    """Aggregate success events instead of logging each of them.
+
+    Counts and latency sums are collected per event name and status code
+    and logged as a single summary record every `interval` seconds by the
+    background thread started with the first recorded event.
+
+    """
+
+    def __init__(self, interval, logger=None):
+        self.interval = interval
+        self.logger = logger or logging.getLogger()
+        self.counters = {}
+        self.window_started_at = monotonic()
+        self.lock = Lock()
+        self.stopped = Event()
+        self.thread = None
+
+    def record(self, event, status_code, latency):
+        with self.lock:
+            counter = self.counters.get((event, status_code))
+            if counter is None:
+                counter = self.counters[(event, status_code)] = [0, 0.0]
+
+            counter[0] += 1
+            counter[1] += latency
+
+            if self.thread is None:
+                self.start()
+
+    def start(self):
+        self.thread = Thread(
+            target=self.run, name='lily-success-events', daemon=True)
+        self.thread.start()
+        atexit.register(self.stop)
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            self.flush()
+
+    def stop(self):
+        self.stopped.set()
+        self.flush()
+
+    def flush(self):
+        with self.lock:
+            counters, self.counters = self.counters, {}
+            now = monotonic()
+            window = now - self.window_started_at
+            self.window_started_at = now
+
+        if not counters:
+            return
+
+        self.logger.info(EventMessage('SUCCESS_EVENTS_AGGREGATED', {
+            'window': round(window, 3),
+            'events': [
+                {
+                    '@event': event,
+                    'status_code': status_code,
+                    'count': count,
+                    'latency_sum': round(latency_sum, 6),
+                }
+                for (event, status_code), (count, latency_sum)
+                in counters.items()
+            ],
+        }))
+
+
+@lru_cache(maxsize=None)
+def get_success_events_aggregator(interval):
+    return SuccessEventsAggregator(interval)
+
+
+class CriticalEventsThrottle:
+    """Limit the number of critical events logged with their tracebacks.
+
+    Within each `window` seconds at most `limit` occurrences of the given
+    event are logged in full, the following ones are only counted and
+    their number is logged as a single summary when the window closes.
+
+    """
+
+    def __init__(self, limit, window, logger=None):
+        self.limit = limit
+        self.window = window
+        self.logger = logger or logging.getLogger()
+        self.windows = {}
+        self.lock = Lock()
+
+    def acquire(self, event):
+        """Return `True` if the occurrence should be logged in full."""
+        now = monotonic()
+
+        with self.lock:
+            window = self.windows.get(event)
+            if window is None or now - window[0] >= self.window:
+                # -- [started at, occurrences, suppressed occurrences]
+                window = self.windows[event] = [now, 0, 0]
+
+            window[1] += 1
+            if window[1] <= self.limit:
+                return True
+
+            window[2] += 1
+            if window[2] == 1:
+                timer = Timer(
+                    window[0] + self.window - now,
+                    self.close,
+                    args=(event, window))
+                timer.daemon = True
+                timer.start()
+
+            return False
+
+    def close(self, event, window):
+        with self.lock:
+            if self.windows.get(event) is window:
+                del self.windows[event]
+
+            suppressed = window[2]
+
+        self.logger.error(EventMessage('CRITICAL_EVENTS_SUPPRESSED', {
+            '@event': event,
+            'suppressed': suppressed,
+            'window': self.window,
+        }))
+
+
+@lru_cache(maxsize=None)
+def get_critical_events_throttle(limit, window):
+    return CriticalEventsThrottle(limit, window)
+
+
+def start_queue_listener(logger=None, max_size=0):
+    """Move handlers of the `logger` (root by default) to the background
+    thread, so that logging never blocks on their I/O.
+
+    """
+    logger = logger or logging.getLogger()
+    handlers = list(logger.handlers)
+
+    records = queue.Queue(max_size)
+    listener = QueueListener(records, *handlers, respect_handler_level=True)
+    for handler in handlers:
+        logger.removeHandler(handler)
+
+    logger.addHandler(EventQueueHandler(records))
+
+    listener.start()
+    atexit.register(listener.stop)
+
+    return listener
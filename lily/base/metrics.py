@@ -0,0 +1,157 @@
+from bisect import bisect_left
+from threading import current_thread, Lock, local
+
+
+# -- upper bounds (in seconds) of the buckets used for the timings
+DURATION_BUCKETS = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1,
+    2.5,
+    5,
+    10,
+)
+
+
+# -- upper bounds of the buckets used for the numbers of queries
+QUERY_COUNT_BUCKETS = (
+    1,
+    2,
+    5,
+    10,
+    20,
+    50,
+    100,
+    200,
+    500,
+    1000,
+)
+
+
+class Histogram:
+    """Fixed size histogram.
+
+    Observations are only counted in the predefined buckets therefore the
+    memory footprint does not depend on the number of observations.
+
+    """
+
+    def __init__(self, buckets=DURATION_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def merge(self, other):
+        for i, count in enumerate(other.counts):
+            self.counts[i] += count
+
+        self.count += other.count
+        self.sum += other.sum
+
+    def serialize(self):
+        return {
+            'count': self.count,
+            'sum': self.sum,
+            'buckets': dict(zip(self.buckets + ('+Inf',), self.counts)),
+        }
+
+
+class MetricsRegistry:
+    """In-process registry of per command histograms.
+
+    Each thread writes only to its own store, therefore observing does not
+    require any locking, while the lock is used only when a new thread
+    registers its store and when all of them get merged. Stores of the
+    finished threads are folded into the shared one, so the number of
+    stores is bounded by the number of the running threads.
+
+    """
+
+    def __init__(self):
+        self.local = local()
+        self.stores = []
+        self.retired = {}
+        self.lock = Lock()
+
+    def get_store(self):
+        try:
+            return self.local.store
+
+        except AttributeError:
+            store = self.local.store = {}
+            with self.lock:
+                self.retire_stores()
+                self.stores.append((current_thread(), store))
+
+            return store
+
+    def retire_stores(self):
+        alive = []
+        for thread, store in self.stores:
+            if thread.is_alive():
+                alive.append((thread, store))
+
+            else:
+                # -- finished thread would not write to its store anymore
+                merge_stores(self.retired, store)
+
+        self.stores = alive
+
+    def observe(self, command_name, metric, value, buckets=DURATION_BUCKETS):
+        store = self.get_store()
+
+        try:
+            histogram = store[(command_name, metric)]
+
+        except KeyError:
+            histogram = store[(command_name, metric)] = Histogram(buckets)
+
+        histogram.observe(value)
+
+    def snapshot(self):
+        merged = {}
+        with self.lock:
+            self.retire_stores()
+            merge_stores(merged, self.retired)
+            stores = [store for _, store in self.stores]
+
+        for store in stores:
+            merge_stores(merged, store)
+
+        snapshot = {}
+        for (command_name, metric), histogram in merged.items():
+            snapshot.setdefault(command_name, {})
+            snapshot[command_name][metric] = histogram.serialize()
+
+        return snapshot
+
+    def reset(self):
+        with self.lock:
+            self.retired.clear()
+            for _, store in self.stores:
+                store.clear()
+
+
+def merge_stores(merged, store):
+    for key, histogram in list(store.items()):
+        if key not in merged:
+            merged[key] = Histogram(histogram.buckets)
+
+        merged[key].merge(histogram)
+
+
+registry = MetricsRegistry()
@@ -2,6 +2,7 @@
 import math
 from enum import EnumMeta
 
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
 from django.db.models.expressions import RawSQL
 from django.db.models import JSONField
@@ -61,6 +62,29 @@ class ValidatingModel(models.Model):
         abstract = True
 
 
+class BaseEventRecord(models.Model):
+    """Event written by the `lily.base.sinks.ModelEventSink`."""
+
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    event = models.CharField(max_length=256)
+
+    type = models.CharField(max_length=16)
+
+    status_code = models.IntegerField(null=True)
+
+    command_name = models.CharField(max_length=256, null=True)
+
+    correlation_id = models.CharField(max_length=64, null=True)
+
+    # -- data of the events can contain values (e.g. `UUID`, `datetime` or
+    # -- `Decimal`) which the default encoder cannot handle
+    data = JSONField(default=dict, encoder=DjangoJSONEncoder)
+
+    class Meta:
+        abstract = True
+
+
 class ExtraColumn(RawSQL):
 
     def __init__(self, sql, params, output_field=None):
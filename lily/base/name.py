@@ -81,6 +81,16 @@ def to_plural(noun):
     return noun
 
 
+def to_singular(noun):
+    """Forgiving singular form transformer.
+
+    If the `noun` is already in the singular form no transformation will be
+    applied.
+
+    """
+    return INFLECT_ENGINE.singular_noun(noun) or noun
+
+
 def to_past(verb):
 
     verb = verb.lower()
@@ -136,11 +146,14 @@ class BaseVerb:
         self.past_verb = self.transform(to_past(self.verb))
 
         # -- noun
-        if isinstance(noun, str):
-            self.noun = self.transform(noun)
+        if not isinstance(noun, str):
+            noun = noun._meta.model_name
 
-        else:
-            self.noun = self.transform(noun._meta.model_name)
+        self.noun = self.transform(noun)
+
+        # -- singular noun shared by all verbs acting on the same resource,
+        # -- both single and bulk verbs must derive it the same way
+        self.resource = self.transform(to_singular(noun))
 
     def render_command_name(self):
 
@@ -187,6 +200,8 @@ class BaseBulkVerb(BaseVerb):
 
         super(BaseBulkVerb, self).__init__(to_plural(noun))
 
+        self.resource = self.transform(to_singular(noun))
+
 
 class Conjunction:
 
@@ -1,9 +1,112 @@
+from django.db import models
+
+from . import serializers
+from .events import render_json
 
 
 class Output:
 
-    def __init__(self, serializer):
+    def __init__(
+            self,
+            serializer,
+            stream_field=None,
+            chunk_size=500,
+            etag=False,
+            cache_compressed=False):
+
         self.serializer = serializer
 
+        # -- if enabled `Read` and `BulkRead` responses get the `ETag` and
+        # -- support conditional requests (`If-None-Match`)
+        self.etag = etag
+
+        # -- if enabled the compressed bytes of the response are cached, which
+        # -- pays off only for the static documents (e.g. the entrypoint)
+        self.cache_compressed = cache_compressed
+
+        # -- name of the `many` field of the serializer which should be
+        # -- streamed in chunks instead of being serialized all at once
+        self.stream_field = stream_field
+        self.chunk_size = chunk_size
+
     def __eq__(self, other):
-        return self.serializer == other.serializer
+        return (
+            self.serializer == other.serializer and
+            self.stream_field == other.stream_field and
+            self.chunk_size == other.chunk_size and
+            self.etag == other.etag and
+            self.cache_compressed == other.cache_compressed)
+
+    def stream(self, data, event, context):
+        """Render JSON response body as the stream of bytes.
+
+        The envelope (everything apart from the `stream_field`) is
+        serialized at once, while the items of the `stream_field` are
+        serialized and encoded chunk by chunk, therefore the memory
+        footprint does not depend on the number of items.
+
+        """
+        items = data.get(self.stream_field)
+
+        serializer = self.serializer(
+            {**data, self.stream_field: []}, context=context)
+        field = serializer._fields[self.stream_field]
+
+        if isinstance(field['serializer'], serializers.ListField):
+            serialize_item = field['serializer'].child.serialize
+
+            def serialize_chunk(chunk):
+                return [serialize_item(item) for item in chunk]
+
+        elif field['is_field']:
+            serialize_item = field['serializer'].serialize
+
+            def serialize_chunk(chunk):
+                return [serialize_item(item) for item in chunk]
+
+        else:
+            serializer_class = field['serializer'].__class__
+
+            # -- memoized results are kept only per chunk, so that the
+            # -- memory footprint of the stream stays bounded
+            def serialize_chunk(chunk):
+                return serializer_class(
+                    context={**context, 'memo': {}}).serialize_many(chunk)
+
+        body = serializer.data
+        del body[self.stream_field]
+
+        return self.render_stream(
+            render_json(body, {'@event': event}),
+            items,
+            serialize_chunk)
+
+    def render_stream(self, envelope, items, serialize_chunk):
+
+        yield envelope[:-1] + b',"' + self.stream_field.encode() + b'":['
+
+        separator = b''
+        for chunk in self.iterate_in_chunks(items):
+            yield separator + b','.join(
+                render_json(item) for item in serialize_chunk(chunk))
+            separator = b','
+
+        yield b']}'
+
+    def iterate_in_chunks(self, items):
+
+        if isinstance(items, models.Manager):
+            items = items.all()
+
+        if isinstance(items, models.QuerySet):
+            items = items.iterator(chunk_size=self.chunk_size)
+
+        chunk = []
+        for item in (items or []):
+            chunk.append(item)
+            if len(chunk) == self.chunk_size:
+                yield chunk
+                chunk = []
+
+        if chunk:
+            yield chunk
@@ -0,0 +1,54 @@
+from django.core.cache import caches
+
+from lily.conf import settings
+from .context import current_context
+from . import name
+
+
+# -- names of the commands which queries can be routed to the replica
+READ_NAMES = (name.Read, name.BulkRead)
+
+
+class ReadReplicaRouter:
+    """Route reads of the read only commands to the replica.
+
+    Must be added to the `DATABASE_ROUTERS` in order to take effect.
+
+    """
+
+    def db_for_read(self, model, **hints):
+        context = current_context.get()
+
+        return context and context.database or None
+
+    def db_for_write(self, model, **hints):
+        return None
+
+
+def get_sticky_key(correlation_id):
+    return 'lily:sticky:{}'.format(correlation_id)
+
+
+def is_sticky(correlation_id):
+    """Check if requests of a given correlation must read their writes.
+
+    Within the stickiness window after the successful write all reads
+    of the same correlation are served by the primary database, since
+    the replica might not have caught up yet.
+
+    """
+    if not settings.LILY_READ_REPLICA_STICKINESS:
+        return False
+
+    cache = caches[settings.LILY_READ_REPLICA_STICKINESS_CACHE_ALIAS]
+
+    return cache.get(get_sticky_key(correlation_id)) is not None
+
+
+def make_sticky(correlation_id):
+    if settings.LILY_READ_REPLICA_STICKINESS:
+        cache = caches[settings.LILY_READ_REPLICA_STICKINESS_CACHE_ALIAS]
+        cache.set(
+            get_sticky_key(correlation_id),
+            1,
+            settings.LILY_READ_REPLICA_STICKINESS)
@@ -1,7 +1,9 @@
 
 from datetime import datetime, date
 from copy import deepcopy
+from functools import wraps
 
+from django.core.exceptions import FieldDoesNotExist
 from django.db import models
 from django.db.models.fields import NOT_PROVIDED
 from django.contrib.postgres.fields import ArrayField
@@ -212,9 +214,60 @@ class ReadOnlyField(Field):
     pass
 
 
+# -- kinds of the fields in the serialization plan
+FIELD, MANY_FIELD, METHOD_FIELD, NESTED, MANY_NESTED = range(5)
+
+
+def memoize(method):
+    """Cache results of the serializer `method` (`get_<field>` or
+    `get_access`) in the memo of the serializer context.
+
+    Results are keyed by the method and the instance, therefore a value
+    computed for a given instance is reused by all serializers sharing the
+    context, which for commands lasts for a single request. Without the
+    memo in the context the method is simply called.
+
+    """
+    @wraps(method)
+    def wrapper(self, instance):
+        memo = get_memo(self.context)
+        if memo is None:
+            return method(self, instance)
+
+        key = (method, render_memo_key(instance))
+        try:
+            return memo[key][1]
+
+        except KeyError:
+            value = method(self, instance)
+
+            # -- the instance is kept alive by the entry, so that its
+            # -- identity cannot be reused by another object meanwhile
+            memo[key] = (instance, value)
+
+            return value
+
+    return wrapper
+
+
+def get_memo(context):
+    if isinstance(context, dict):
+        return context.get('memo')
+
+
+def render_memo_key(instance):
+
+    # -- distinct instances of the same row share the results
+    if isinstance(instance, models.Model) and instance.pk is not None:
+        return (type(instance), instance.pk)
+
+    return id(instance)
+
+
 class Serializer:
 
-    _meta_cache = {}
+    # -- attributes which are never considered to be fields
+    RESERVED_ATTRS = ('data', 'instance', 'many', 'required', 'context')
 
     def __init__(self, instance=None, context=None, many=None, required=True):
         self.instance = instance
@@ -222,35 +275,75 @@ class Serializer:
         self.required = required
         self.context = context
 
-        if 'fields' not in Serializer._meta_cache:
-            self._fields = {}
-            for attr in dir(self):
-                if attr in ['data', 'instance', 'many', 'required', 'context']:
-                    continue
-
-                if isinstance(getattr(self, attr), SerializerMethodField):
-                    self._fields[attr] = {
-                        'is_field': True,
-                        'is_method': True,
-                        'serializer': getattr(self, attr),
-                    }
-
-                elif isinstance(getattr(self, attr), Field):
-                    self._fields[attr] = {
-                        'is_field': True,
-                        'is_method': False,
-                        'serializer': getattr(self, attr),
-                    }
-
-                elif isinstance(getattr(self, attr), Serializer):
-                    self._fields[attr] = {
-                        'is_field': False,
-                        'is_method': False,
-                        'serializer': getattr(self, attr),
-                    }
-
-        else:
-            self._fields = Serializer._meta_cache['fields']
+        self._fields, self._plan = self.compile()
+
+    @classmethod
+    def compile(cls):
+        """Return fields of the serializer and the plan of their serialization.
+
+        Both are computed once, on the first use of a given class, and
+        stored on it, therefore serialization of the consecutive instances
+        does not involve any fields discovery.
+
+        """
+        try:
+            return cls.__dict__['_compiled']
+
+        except KeyError:
+            fields = cls.discover_fields()
+            cls._compiled = (fields, cls.render_plan(fields))
+
+            return cls._compiled
+
+    @classmethod
+    def discover_fields(cls):
+        fields = {}
+        for attr in dir(cls):
+            if attr in cls.RESERVED_ATTRS:
+                continue
+
+            value = getattr(cls, attr)
+            if isinstance(value, SerializerMethodField):
+                fields[attr] = {
+                    'is_field': True,
+                    'is_method': True,
+                    'serializer': value,
+                }
+
+            elif isinstance(value, Field):
+                fields[attr] = {
+                    'is_field': True,
+                    'is_method': False,
+                    'serializer': value,
+                }
+
+            elif isinstance(value, Serializer):
+                fields[attr] = {
+                    'is_field': False,
+                    'is_method': False,
+                    'serializer': value,
+                }
+
+        return fields
+
+    @classmethod
+    def render_plan(cls, fields):
+
+        plan = []
+        for name, field in fields.items():
+            s = field['serializer']
+            if field['is_method']:
+                kind = METHOD_FIELD
+
+            elif field['is_field']:
+                kind = s.many and MANY_FIELD or FIELD
+
+            else:
+                kind = s.many and MANY_NESTED or NESTED
+
+            plan.append((name, kind, s, getattr(s, 'default', True)))
+
+        return tuple(plan)
 
     def get_fields(self):
         """Calculate and return fields required by the schema renderer."""
@@ -294,64 +387,43 @@ class Serializer:
 
     def serialize(self):
 
-        serialized = {}
-        for name, field in self._fields.items():
-            s = field['serializer']
-            required = getattr(s, 'required', True)
-            default = getattr(s, 'default', True)
-            is_method = field['is_method']
-            is_field = field['is_field']
-
-            # -- VALUE
-            if not is_method and not required:
-                if isinstance(self.instance, dict):
-                    value = self.instance.get(name, default)
-
-                else:
-                    value = getattr(self.instance, name, default)
-
-            elif not is_method:
-                if isinstance(self.instance, dict):
-                    value = self.instance.get(name, default)
+        instance = self.instance
+        is_dict = isinstance(instance, dict)
 
-                else:
-                    value = getattr(self.instance, name, default)
-
-            # -- SERIALIZATION
-            if is_method:
-                serialized[name] = (
-                    getattr(self, f'get_{name}')(self.instance))
+        serialized = {}
+        for name, kind, s, default in self._plan:
 
-            elif is_field:
-                if s.many:
-                    serialized[name] = [s.serialize(v) for v in value]
+            if kind == METHOD_FIELD:
+                serialized[name] = getattr(self, f'get_{name}')(instance)
+                continue
 
-                else:
-                    serialized[name] = s.serialize(value)
+            # -- VALUE
+            if is_dict:
+                value = instance.get(name, default)
 
             else:
-                def __serialize(v):
-                    return s.__class__(v, context=self.context).data
-
-                # -- if value of nested object is none just return it
-                if not value:
+                value = getattr(instance, name, default)
 
-                    if s.many:
-                        serialized[name] = []
+            # -- SERIALIZATION
+            if kind == FIELD:
+                serialized[name] = s.serialize(value)
 
-                    else:
-                        serialized[name] = value
+            elif kind == MANY_FIELD:
+                serialized[name] = [s.serialize(v) for v in value]
 
-                if value and s.many:
-                    try:
-                        serialized[name] = [__serialize(v) for v in value]
+            # -- querysets are passed unevaluated, so that the nested
+            # -- serializer can choose how to fetch them
+            elif kind == MANY_NESTED:
+                serialized[name] = [] if value is None else s.__class__(
+                    context=self.context).serialize_many(iterate(value))
 
-                    except TypeError:
-                        serialized[name] = [
-                            __serialize(v) for v in value.all()]
+            # -- if value of nested object is none just return it
+            elif not value:
+                serialized[name] = value
 
-                elif value:
-                    serialized[name] = __serialize(value)
+            else:
+                serialized[name] = s.__class__(
+                    value, context=self.context).data
 
         # -- for `AbstractSerializer` do not attach any extra data they are
         # -- here only for storing SubEntities without having their own
@@ -374,11 +446,215 @@ class Serializer:
 
         return serialized
 
+    def serialize_many(self, instances):
+        """Serialize all `instances` at once.
+
+        Unlike serialization of each instance with its own serializer, each
+        field is processed across all instances in one pass, while nested
+        serializers are instantiated once per field.
+
+        """
+        if type(self).serialize is not Serializer.serialize:
+            return [
+                self.__class__(instance, context=self.context).data
+                for instance in instances]
+
+        instances = list(instances)
+        rows = [{} for _ in instances]
+
+        for name, kind, s, default in self._plan:
+
+            if kind == METHOD_FIELD:
+                get_value = getattr(self, f'get_{name}')
+                for row, instance in zip(rows, instances):
+                    self.instance = instance
+                    row[name] = get_value(instance)
+
+                continue
+
+            # -- VALUES
+            values = [
+                (
+                    instance.get(name, default)
+                    if isinstance(instance, dict) else
+                    getattr(instance, name, default)
+                )
+                for instance in instances
+            ]
+
+            # -- SERIALIZATION
+            if kind == FIELD:
+                serialize = s.serialize
+                for row, value in zip(rows, values):
+                    row[name] = serialize(value)
+
+            elif kind == MANY_FIELD:
+                serialize = s.serialize
+                for row, value in zip(rows, values):
+                    row[name] = [serialize(v) for v in value]
+
+            elif kind == MANY_NESTED:
+                # -- items of all instances are serialized together and
+                # -- split back afterwards
+                items = [
+                    list(iterate(value)) if value else []
+                    for value in values]
+                serialized = iter(s.__class__(
+                    context=self.context).serialize_many(
+                        [item for value in items for item in value]))
+
+                for row, value in zip(rows, items):
+                    row[name] = [next(serialized) for _ in value]
+
+            else:
+                present = [value for value in values if value]
+                serialized = iter(s.__class__(
+                    context=self.context).serialize_many(present))
+
+                for row, value in zip(rows, values):
+                    row[name] = next(serialized) if value else value
+
+        if isinstance(self, AbstractSerializer):
+            return rows
+
+        try:
+            _type = self._type
+
+        except AttributeError:
+            raise MissingTypeError(
+                'Each Serializer must have `type` specified which informs '
+                'the client about the semantic type a result of the '
+                'Serializer represents')
+
+        for row, instance in zip(rows, instances):
+            row['@type'] = _type
+
+            self.instance = instance
+            access = self.render_access(instance)
+            if access:
+                row['@access'] = access
+
+        return rows
+
+    @classmethod
+    def optimize_queryset(cls, queryset):
+        """Prepare `queryset` for the serialization of its instances.
+
+        Nested serializers of the forward relations are joined with
+        `select_related`, the ones of the `many` relations are fetched with
+        `prefetch_related` (with their own querysets optimized in the same
+        way) and if all serialized values are plain columns the rest of them
+        is deferred with `only`. Therefore the number of executed queries
+        does not depend on the number of instances.
+
+        """
+        return apply_queryset_plan(
+            queryset, *cls.render_queryset_plan(queryset.model))
+
+    @classmethod
+    def render_queryset_plan(cls, model, prefix=''):
+        """Return lookups for `select_related`, `prefetch_related` and
+        `only` (or `None` if columns cannot be restricted) of `model`.
+
+        """
+        fields, _ = cls.compile()
+
+        # -- methods could read any of the columns
+        only = [prefix + model._meta.pk.name]
+        if hasattr(cls, 'get_access'):
+            only = None
+
+        select, prefetch = [], []
+        for name, field in fields.items():
+
+            try:
+                model_field = model._meta.get_field(name)
+
+            except FieldDoesNotExist:
+                model_field = None
+
+            # -- VALUES
+            if field['is_field']:
+                if (field['is_method'] or
+                        model_field is None or
+                        not model_field.concrete):
+                    only = None
+
+                elif only is not None and prefix + name not in only:
+                    only.append(prefix + name)
+
+                continue
+
+            # -- NESTED SERIALIZERS
+            if model_field is None or not model_field.is_relation:
+                only = None
+                continue
+
+            nested = field['serializer'].__class__
+            related_model = model_field.related_model
+
+            if model_field.many_to_one or model_field.one_to_one:
+                nested_select, nested_prefetch, nested_only = (
+                    nested.render_queryset_plan(
+                        related_model, f'{prefix}{name}__'))
+
+                select.extend([prefix + name] + nested_select)
+                prefetch.extend(nested_prefetch)
+                if only is not None and nested_only is not None:
+                    if model_field.concrete:
+                        only.append(prefix + name)
+
+                    only.extend(nested_only)
+
+                else:
+                    only = None
+
+            else:
+                nested_select, nested_prefetch, nested_only = (
+                    nested.render_queryset_plan(related_model))
+
+                # -- instances are matched with the prefetched ones by the
+                # -- reverse foreign key which therefore cannot be deferred
+                if model_field.one_to_many and nested_only is not None:
+                    nested_only.append(model_field.field.name)
+
+                prefetch.append(models.Prefetch(
+                    prefix + name,
+                    apply_queryset_plan(
+                        related_model._default_manager.all(),
+                        nested_select,
+                        nested_prefetch,
+                        nested_only)))
+
+        return select, prefetch, only
+
     @property
     def data(self):
         return self.serialize()
 
 
+def apply_queryset_plan(queryset, select, prefetch, only):
+
+    if select:
+        queryset = queryset.select_related(*select)
+
+    if prefetch:
+        queryset = queryset.prefetch_related(*prefetch)
+
+    if only is not None:
+        queryset = queryset.only(*only)
+
+    return queryset
+
+
+def iterate(value):
+    # -- related managers are not iterable on their own
+    if isinstance(value, models.Manager):
+        return value.all()
+
+    return value
+
+
 class AbstractSerializer(Serializer):
     """Store abstract entities.
 
@@ -390,141 +666,243 @@ class AbstractSerializer(Serializer):
 
 class ModelSerializer(Serializer):
 
-    def __init__(self, instance=None, context=None, many=None):
+    @classmethod
+    def discover_fields(cls):
         from .models import (
             JSONSchemaField as ModelJSONSchemaField,
             EnumChoiceField as ModelEnumChoiceField,
         )
 
-        super(ModelSerializer, self).__init__(instance, context, many)
+        fields = super(ModelSerializer, cls).discover_fields()
 
-        if 'fields' not in Serializer._meta_cache:
+        model_fields_index = {}
 
-            model_fields_index = {}
+        for field in cls.Meta.model._meta.fields:
+            model_fields_index[field.name] = field
 
-            for field in self.Meta.model._meta.fields:
-                model_fields_index[field.name] = field
+            if isinstance(field, (models.OneToOneField, models.ForeignKey)):  # noqa
+                model_fields_index[f'{field.name}_id'] = field
 
-                if isinstance(field, (models.OneToOneField, models.ForeignKey)):  # noqa
-                    model_fields_index[f'{field.name}_id'] = field
+        for field in cls.Meta.fields:
+            if field not in fields:
+                serializer = None
 
-            for field in self.Meta.fields:
-                if field not in self._fields:
-                    serializer = None
+                try:
+                    model_field = model_fields_index[field]
+                    required = True
+                    if model_field.null or model_field.blank:
+                        required = False
 
-                    try:
-                        model_field = model_fields_index[field]
-                        required = True
-                        if model_field.null or model_field.blank:
-                            required = False
+                    elif (model_field.default is not None and
+                            model_field.default != NOT_PROVIDED):
+                        required = False
 
-                        elif (model_field.default is not None and
-                                model_field.default != NOT_PROVIDED):
-                            required = False
+                    if isinstance(model_field, models.AutoField):
+                        serializer = IntegerField(required=required)
 
-                        if isinstance(model_field, models.AutoField):
-                            serializer = IntegerField(required=required)
+                    elif isinstance(model_field, models.OneToOneField):
+                        serializer = IntegerField(required=required)
 
-                        elif isinstance(model_field, models.OneToOneField):
-                            serializer = IntegerField(required=required)
+                    elif isinstance(model_field, models.ForeignKey):
+                        serializer = IntegerField(required=required)
 
-                        elif isinstance(model_field, models.ForeignKey):
-                            serializer = IntegerField(required=required)
+                    elif isinstance(model_field, models.IntegerField):
+                        serializer = IntegerField(required=required)
 
-                        elif isinstance(model_field, models.IntegerField):
-                            serializer = IntegerField(required=required)
+                    elif isinstance(model_field, models.FloatField):
+                        serializer = FloatField(required=required)
 
-                        elif isinstance(model_field, models.FloatField):
-                            serializer = FloatField(required=required)
+                    elif isinstance(model_field, models.JSONField):
+                        serializer = JSONField(
+                            required=required,
+                            validators=model_field.validators)
 
-                        elif isinstance(model_field, models.JSONField):
-                            serializer = JSONField(
-                                required=required,
-                                validators=model_field.validators)
+                    elif isinstance(model_field, ModelJSONSchemaField):
+                        serializer = JSONSchemaField(
+                            required=required,
+                            validators=model_field.validators)
 
-                        elif isinstance(model_field, ModelJSONSchemaField):
-                            serializer = JSONSchemaField(
-                                required=required,
-                                validators=model_field.validators)
+                    elif isinstance(model_field, ArrayField):
+                        if isinstance(model_field.base_field, models.IntegerField):  # noqa
+                            base_serializer = IntegerField
 
-                        elif isinstance(model_field, ArrayField):
-                            if isinstance(model_field.base_field, models.IntegerField):  # noqa
-                                base_serializer = IntegerField
+                        elif isinstance(model_field.base_field, models.FloatField):  # noqa
+                            base_serializer = FloatField
 
-                            elif isinstance(model_field.base_field, models.FloatField):  # noqa
-                                base_serializer = FloatField
+                        elif isinstance(model_field.base_field, models.CharField):  # noqa
+                            base_serializer = CharField
 
-                            elif isinstance(model_field.base_field, models.CharField):  # noqa
-                                base_serializer = CharField
+                        serializer = base_serializer(many=True, required=required)  # noqa
 
-                            serializer = base_serializer(many=True, required=required)  # noqa
+                    elif isinstance(model_field, ModelEnumChoiceField):
+                        serializer = EnumChoiceField(
+                            required=required,
+                            enum_name=model_field.enum_name,
+                            choices=[c[0] for c in model_field.choices])
 
-                        elif isinstance(model_field, ModelEnumChoiceField):
-                            serializer = EnumChoiceField(
-                                required=required,
-                                enum_name=model_field.enum_name,
-                                choices=[c[0] for c in model_field.choices])
+                    elif isinstance(model_field, models.CharField):
+                        serializer = CharField(
+                            required=required,
+                            min_length=getattr(
+                                model_field, 'min_length', None),
+                            max_length=getattr(
+                                model_field, 'max_length', None),
+                        )
 
-                        elif isinstance(model_field, models.CharField):
-                            serializer = CharField(
-                                required=required,
-                                min_length=getattr(
-                                    model_field, 'min_length', None),
-                                max_length=getattr(
-                                    model_field, 'max_length', None),
-                            )
+                    elif isinstance(model_field, models.TextField):
+                        serializer = CharField(required=required)
 
-                        elif isinstance(model_field, models.TextField):
-                            serializer = CharField(required=required)
+                    elif isinstance(model_field, models.BooleanField):
+                        serializer = BooleanField(required=required)
 
-                        elif isinstance(model_field, models.BooleanField):
-                            serializer = BooleanField(required=required)
+                    elif isinstance(model_field, models.DateTimeField):
+                        serializer = DateTimeField(required=required)
 
-                        elif isinstance(model_field, models.DateTimeField):
-                            serializer = DateTimeField(required=required)
+                    elif isinstance(model_field, models.DateField):
+                        serializer = DateField(required=required)
 
-                        elif isinstance(model_field, models.DateField):
-                            serializer = DateField(required=required)
+                    elif isinstance(model_field, models.URLField):
+                        serializer = URLField(required=required)
 
-                        elif isinstance(model_field, models.URLField):
-                            serializer = URLField(required=required)
+                except KeyError:
+                    f = getattr(cls.Meta.model, field)
 
-                    except KeyError:
-                        f = getattr(self.Meta.model, field)
+                    if f and isinstance(f, property):
+                        try:
+                            t = f.fget.__annotations__['return']
 
-                        if f and isinstance(f, property):
-                            try:
-                                t = f.fget.__annotations__['return']
+                        except KeyError:
+                            raise Exception('MISSING_TYPE_FOR_FIELD')
 
-                            except KeyError:
-                                raise Exception('MISSING_TYPE_FOR_FIELD')
+                        if t == bool:
+                            serializer = BooleanField(required=False)
 
-                            if t == bool:
-                                serializer = BooleanField(required=False)
+                        elif t == int:
+                            serializer = IntegerField(required=False)
 
-                            elif t == int:
-                                serializer = IntegerField(required=False)
+                        elif t == float:
+                            serializer = FloatField(required=False)
 
-                            elif t == float:
-                                serializer = FloatField(required=False)
+                        elif t == str:
+                            serializer = CharField(required=False)
 
-                            elif t == str:
-                                serializer = CharField(required=False)
+                    else:
+                        serializer = Field()
 
-                        else:
-                            serializer = Field()
+                if not serializer:
+                    raise Exception('CANNOT_MATCH_FIELD')
 
-                    if not serializer:
-                        raise Exception('CANNOT_MATCH_FIELD')
+                fields[field] = {
+                    'serializer': serializer,
+                    'is_field': True,
+                    'is_method': False,
+                }
+
+        return fields
 
-                    self._fields[field] = {
-                        'serializer': serializer,
-                        'is_field': True,
-                        'is_method': False,
-                    }
+    @classmethod
+    def compile_columns(cls):
+        """Return columns of `Meta.model` serving all fields of the serializer.
 
-        else:
-            self._fields = Serializer._meta_cache['fields']
+        `None` is returned if any of the fields requires the model instance,
+        which is the case for methods, `@property` fields, nested serializers
+        and `get_access`. Like the plan it's computed once per class.
+
+        """
+        try:
+            return cls.__dict__['_compiled_columns']
+
+        except KeyError:
+            cls._compiled_columns = cls.render_columns()
+
+            return cls._compiled_columns
+
+    @classmethod
+    def render_columns(cls):
+
+        if (hasattr(cls, 'get_access') or
+                cls.serialize is not Serializer.serialize):
+            return None
+
+        _, plan = cls.compile()
+
+        columns = []
+        for name, kind, s, default in plan:
+            if kind not in (FIELD, MANY_FIELD):
+                return None
+
+            try:
+                model_field = cls.Meta.model._meta.get_field(name)
+
+            except FieldDoesNotExist:
+                return None
+
+            if not model_field.concrete:
+                return None
+
+            columns.append(name)
+
+        return tuple(columns) or None
+
+    def serialize_many(self, instances):
+        """Serialize all `instances` at once.
+
+        If `instances` is an unevaluated queryset and all fields are served
+        by the columns of `Meta.model` the rows are fetched with
+        `values_list` and mapped straight to the serialized dictionaries,
+        so that no model instances are created.
+
+        """
+        columns = self.compile_columns()
+        if (columns is not None and
+                isinstance(instances, models.QuerySet) and
+                instances._result_cache is None and
+                not instances._prefetch_related_lookups):
+
+            return self.serialize_rows(instances.values_list(*columns))
+
+        return super(ModelSerializer, self).serialize_many(instances)
+
+    def serialize_rows(self, rows):
+        """Serialize `rows` of values ordered as `compile_columns`."""
+
+        names = [name for name, _, _, _ in self._plan]
+
+        # -- fields which do not transform values are copied as they are
+        converters = [
+            (i, name, s.serialize, kind == MANY_FIELD)
+            for i, (name, kind, s, default) in enumerate(self._plan)
+            if kind == MANY_FIELD or type(s).serialize is not Field.serialize
+        ]
+
+        serialized = []
+        for row in rows:
+            out = dict(zip(names, row))
+            for i, name, serialize, many in converters:
+                if many:
+                    out[name] = [serialize(v) for v in row[i]]
+
+                else:
+                    out[name] = serialize(row[i])
+
+            serialized.append(out)
+
+        if isinstance(self, AbstractSerializer):
+            return serialized
+
+        try:
+            _type = self._type
+
+        except AttributeError:
+            raise MissingTypeError(
+                'Each Serializer must have `type` specified which informs '
+                'the client about the semantic type a result of the '
+                'Serializer represents')
+
+        for out in serialized:
+            out['@type'] = _type
+
+        return serialized
 
     def get_fields(self):
         """Calculate and return fields required by the schema renderer."""
@@ -0,0 +1,164 @@
+import atexit
+from functools import lru_cache
+import logging
+import queue
+from threading import Lock, Thread
+
+from django.apps import apps
+from django.db import connections, transaction
+
+from lily.conf import settings
+from .utils import import_from_string
+
+
+logger = logging.getLogger()
+
+
+class BaseEventSink:
+    """Destination of the events emitted by the `EventFactory`.
+
+    Each event is passed as a dictionary with the `event`, `type`
+    (`success` or `error`), `status_code`, `command_name`,
+    `correlation_id` and `data` keys.
+
+    """
+
+    def send(self, record):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class BatchedEventSink(BaseEventSink):
+    """Write events in batches from the background thread.
+
+    Success events are queued only once the transaction of the request
+    commits (or immediately outside of the atomic block), so that events of
+    the rolled back requests are never delivered. Error events are queued
+    immediately since their atomic block is always rolled back. When the
+    queue is full the request waits at most `put_timeout` seconds for the
+    space after which the event is dropped and counted. Events still
+    queued at the exit of the process are flushed.
+
+    """
+
+    def __init__(
+            self,
+            max_size=None,
+            batch_size=None,
+            flush_interval=None,
+            put_timeout=None):
+
+        self.batch_size = batch_size or settings.LILY_EVENT_SINK_BATCH_SIZE
+        self.flush_interval = (
+            flush_interval or settings.LILY_EVENT_SINK_FLUSH_INTERVAL)
+        if put_timeout is None:
+            put_timeout = settings.LILY_EVENT_SINK_PUT_TIMEOUT
+
+        self.put_timeout = put_timeout
+        self.queue = queue.Queue(
+            max_size or settings.LILY_EVENT_SINK_MAX_SIZE)
+        self.dropped = 0
+        self.lock = Lock()
+        self.thread = None
+
+    def write(self, records):
+        raise NotImplementedError
+
+    def send(self, record):
+        if record['type'] == 'error':
+            self.enqueue(record)
+
+        else:
+            transaction.on_commit(lambda: self.enqueue(record))
+
+    def enqueue(self, record):
+        if self.thread is None:
+            self.start()
+
+        try:
+            self.queue.put(record, timeout=self.put_timeout)
+
+        except queue.Full:
+            with self.lock:
+                self.dropped += 1
+
+    def start(self):
+        with self.lock:
+            if self.thread is not None:
+                return
+
+            self.thread = Thread(
+                target=self.run, name='lily-event-sink', daemon=True)
+            self.thread.start()
+
+        atexit.register(self.close)
+
+    def run(self):
+        is_closed = False
+        while not is_closed:
+            batch = []
+            try:
+                record = self.queue.get(timeout=self.flush_interval)
+                while record is not None:
+                    batch.append(record)
+                    if len(batch) >= self.batch_size:
+                        break
+
+                    record = self.queue.get_nowait()
+
+                is_closed = record is None
+
+            except queue.Empty:
+                pass
+
+            if batch:
+                self.flush(batch)
+
+        connections.close_all()
+
+    def flush(self, batch):
+        try:
+            self.write(batch)
+
+        except Exception:
+            if len(batch) == 1:
+                logger.exception(
+                    'EVENT_SINK_WRITE_FAILED: %s events lost', len(batch))
+
+            else:
+                # -- a single broken record must not lose the whole batch
+                for record in batch:
+                    self.flush([record])
+
+    def close(self):
+        """Flush all queued events and stop the background thread."""
+        if self.thread is None:
+            return
+
+        self.queue.put(None)
+        self.thread.join()
+        self.thread = None
+
+
+class ModelEventSink(BatchedEventSink):
+    """Write events to the model (`LILY_EVENT_SINK_MODEL`) derived from
+    the `lily.base.models.BaseEventRecord` with `bulk_create`.
+
+    """
+
+    def __init__(self, model=None, **kwargs):
+        super(ModelEventSink, self).__init__(**kwargs)
+
+        self.model = model or apps.get_model(settings.LILY_EVENT_SINK_MODEL)
+
+    def write(self, records):
+        self.model.objects.bulk_create(
+            [self.model(**record) for record in records],
+            batch_size=self.batch_size)
+
+
+@lru_cache(maxsize=None)
+def get_event_sink(path):
+    return import_from_string(path)()
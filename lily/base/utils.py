@@ -1,8 +1,13 @@
 
+from functools import lru_cache
 import importlib
 import re
 from time import time
 
+from django.core.exceptions import ImproperlyConfigured
+
+from lily.conf import settings
+
 
 def import_from_string(path):
     """Attempt to import a class from a string representation.
@@ -22,6 +27,28 @@ def import_from_string(path):
         raise ImportError(msg)
 
 
+@lru_cache(maxsize=None)
+def get_redis():
+    """Connect to the redis configured by the `LILY_ASYNC_LOCK_DB_*`.
+
+    The `redis` package is an optional dependency required only by the
+    features sharing their state between processes.
+
+    """
+    try:
+        import redis
+
+    except ImportError:
+        raise ImproperlyConfigured(
+            'Processes can share state only if the `redis` package is '
+            'installed.')
+
+    return redis.Redis(
+        host=settings.LILY_ASYNC_LOCK_DB_HOST,
+        port=settings.LILY_ASYNC_LOCK_DB_PORT,
+        db=settings.LILY_ASYNC_LOCK_DB_INDEX)
+
+
 def normalize_indentation(text, min_indent=4):
     """Normalize text so that it's indented by specific amount.
 
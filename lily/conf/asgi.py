@@ -0,0 +1,8 @@
+import os  # pragma: no cover
+
+from django.core.asgi import get_asgi_application  # pragma: no cover
+
+os.environ.setdefault(  # pragma: no cover
+    "DJANGO_SETTINGS_MODULE", "conf.settings")
+
+application = get_asgi_application()  # pragma: no cover
@@ -20,6 +20,20 @@ LILY_AUTHORIZER_CLASS = getattr(
     'lily.base.authorizer.BaseAuthorizer')
 
 
+# -- time in seconds for which successful authorizations are cached per
+# -- identity of the request, `None` disables the cache
+LILY_AUTHORIZER_CACHE_TTL = getattr(
+    settings,
+    'LILY_AUTHORIZER_CACHE_TTL',
+    None)
+
+
+LILY_AUTHORIZER_CACHE_MAX_SIZE = getattr(
+    settings,
+    'LILY_AUTHORIZER_CACHE_MAX_SIZE',
+    10000)
+
+
 LILY_AUTHORIZER_ACCESS_ENUM_CLASS = getattr(
     settings,
     'LILY_AUTHORIZER_ACCESS_ENUM_CLASS',
@@ -32,6 +46,37 @@ LILY_ENTRYPOINT_COMMANDS_ACCESS_LIST = getattr(
     None)
 
 
+# -- the `EXECUTE_BATCH` command can execute any other command therefore
+# -- its route is served by the entrypoint urls only if enabled explicitly
+LILY_BATCH_COMMANDS_ENABLED = getattr(
+    settings,
+    'LILY_BATCH_COMMANDS_ENABLED',
+    False)
+
+
+# -- access list of the `EXECUTE_BATCH` command, each of the executed
+# -- commands is authorized on its own anyway
+LILY_BATCH_COMMANDS_ACCESS_LIST = getattr(
+    settings,
+    'LILY_BATCH_COMMANDS_ACCESS_LIST',
+    None)
+
+
+LILY_BATCH_COMMANDS_MAX_SIZE = getattr(
+    settings,
+    'LILY_BATCH_COMMANDS_MAX_SIZE',
+    50)
+
+
+# -- size of the thread pool shared by all batches in which consecutive
+# -- reads are executed concurrently, by default they are executed one by
+# -- one which is usually faster than opening a connection per read
+LILY_BATCH_COMMANDS_MAX_WORKERS = getattr(
+    settings,
+    'LILY_BATCH_COMMANDS_MAX_WORKERS',
+    0)
+
+
 LILY_EXCLUDE_QUERY_PARSER_ALL_OPTIONAL_ASSERTIONS = getattr(
     settings,
     'LILY_EXCLUDE_QUERY_PARSER_ALL_OPTIONAL_ASSERTIONS',
@@ -42,6 +87,210 @@ LILY_ANGULAR_CLIENT_ORIGIN = getattr(
     'LILY_ANGULAR_CLIENT_ORIGIN',
     'https://github.com/cosphere-org/lily-angular-client-base.git')
 
+#
+# RESPONSE CACHE
+#
+# -- store of the responses of commands declaring the `CachePolicy`, the
+# -- default one is invalidated only by the writes of the same process, use
+# -- `lily.base.cache.DjangoResponseCache` to share it between processes
+LILY_RESPONSE_CACHE_CLASS = getattr(
+    settings,
+    'LILY_RESPONSE_CACHE_CLASS',
+    'lily.base.cache.LocalResponseCache')
+
+LILY_RESPONSE_CACHE_MAX_SIZE = getattr(
+    settings,
+    'LILY_RESPONSE_CACHE_MAX_SIZE',
+    1024)
+
+# -- alias of the Django's cache used by the `DjangoResponseCache`
+LILY_RESPONSE_CACHE_ALIAS = getattr(
+    settings,
+    'LILY_RESPONSE_CACHE_ALIAS',
+    'default')
+
+#
+# COALESCING
+#
+# -- use `lily.base.coalescing.RedisSingleFlight` in order to coalesce
+# -- requests of all processes using the `LILY_ASYNC_LOCK_DB_*` redis
+LILY_COALESCING_CLASS = getattr(
+    settings,
+    'LILY_COALESCING_CLASS',
+    'lily.base.coalescing.LocalSingleFlight')
+
+# -- max time in seconds for which requests wait for the identical one
+# -- being in flight before they are executed on their own
+LILY_COALESCING_TIMEOUT = getattr(
+    settings,
+    'LILY_COALESCING_TIMEOUT',
+    10)
+
+#
+# READ REPLICA
+#
+# -- alias of the database to which `ReadReplicaRouter` routes the
+# -- queries of the non atomic Read and BulkRead commands
+LILY_READ_REPLICA_DATABASE = getattr(
+    settings,
+    'LILY_READ_REPLICA_DATABASE',
+    None)
+
+# -- time in seconds for which the reads of the correlation which
+# -- performed the write are served by the primary database
+LILY_READ_REPLICA_STICKINESS = getattr(
+    settings,
+    'LILY_READ_REPLICA_STICKINESS',
+    0)
+
+LILY_READ_REPLICA_STICKINESS_CACHE_ALIAS = getattr(
+    settings,
+    'LILY_READ_REPLICA_STICKINESS_CACHE_ALIAS',
+    'default')
+
+#
+# ADMISSION CONTROL
+#
+# -- use `lily.base.limits.RedisRateLimiter` in order to share the rate
+# -- limits between all processes using the `LILY_ASYNC_LOCK_DB_*` redis
+LILY_RATE_LIMITER_CLASS = getattr(
+    settings,
+    'LILY_RATE_LIMITER_CLASS',
+    'lily.base.limits.LocalRateLimiter')
+
+#
+# QUERY BUDGET
+#
+# -- fraction of the requests of the commands declaring `max_queries` for
+# -- which the executed queries are counted
+LILY_QUERY_BUDGET_SAMPLE_RATE = getattr(
+    settings,
+    'LILY_QUERY_BUDGET_SAMPLE_RATE',
+    1.0)
+
+#
+# COMPRESSION
+#
+# -- encodings negotiated via `Accept-Encoding` in the order of preference
+# -- (e.g. `('zstd', 'br', 'gzip')`), `br` and `zstd` are used only if
+# -- `brotli` (or `brotlicffi`) and `zstandard` packages are installed,
+# -- compression is disabled by default
+LILY_COMPRESSION_ENCODINGS = getattr(
+    settings,
+    'LILY_COMPRESSION_ENCODINGS',
+    ())
+
+LILY_COMPRESSION_LEVELS = getattr(
+    settings,
+    'LILY_COMPRESSION_LEVELS',
+    {'zstd': 3, 'br': 4, 'gzip': 6})
+
+# -- responses smaller than that (in bytes) are never compressed
+LILY_COMPRESSION_MIN_SIZE = getattr(
+    settings,
+    'LILY_COMPRESSION_MIN_SIZE',
+    1024)
+
+# -- number of compressed contents kept by the commands declaring
+# -- `Output(cache_compressed=True)`
+LILY_COMPRESSION_CACHE_MAX_SIZE = getattr(
+    settings,
+    'LILY_COMPRESSION_CACHE_MAX_SIZE',
+    32)
+
+#
+# LOGGING
+#
+# -- if enabled the handlers of the root logger are moved to the background
+# -- thread, so that request threads never block on the log I/O
+LILY_LOG_QUEUE_ENABLED = getattr(
+    settings,
+    'LILY_LOG_QUEUE_ENABLED',
+    False)
+
+# -- records logged while that many of them are waiting are dropped,
+# -- `0` stands for the unbounded queue
+LILY_LOG_QUEUE_MAX_SIZE = getattr(
+    settings,
+    'LILY_LOG_QUEUE_MAX_SIZE',
+    0)
+
+# -- if set success events are not logged one by one, but aggregated per
+# -- event name and status code and logged every that many seconds
+LILY_SUCCESS_EVENTS_AGGREGATION_INTERVAL = getattr(
+    settings,
+    'LILY_SUCCESS_EVENTS_AGGREGATION_INTERVAL',
+    None)
+
+# -- if set at most that many occurrences of each critical event are
+# -- logged (with the traceback) within the window (in seconds), the
+# -- following ones are counted and logged as a single summary
+LILY_CRITICAL_EVENTS_LOG_LIMIT = getattr(
+    settings,
+    'LILY_CRITICAL_EVENTS_LOG_LIMIT',
+    None)
+
+LILY_CRITICAL_EVENTS_LOG_WINDOW = getattr(
+    settings,
+    'LILY_CRITICAL_EVENTS_LOG_WINDOW',
+    60)
+
+#
+# EVENT SINK
+#
+# -- class to which all success and error events are passed, e.g.
+# -- `lily.base.sinks.ModelEventSink` writing them in batches to the
+# -- `LILY_EVENT_SINK_MODEL` (`app_label.ModelName`) model
+LILY_EVENT_SINK_CLASS = getattr(
+    settings,
+    'LILY_EVENT_SINK_CLASS',
+    None)
+
+LILY_EVENT_SINK_MODEL = getattr(
+    settings,
+    'LILY_EVENT_SINK_MODEL',
+    None)
+
+# -- max number of events waiting for being written
+LILY_EVENT_SINK_MAX_SIZE = getattr(
+    settings,
+    'LILY_EVENT_SINK_MAX_SIZE',
+    10000)
+
+LILY_EVENT_SINK_BATCH_SIZE = getattr(
+    settings,
+    'LILY_EVENT_SINK_BATCH_SIZE',
+    500)
+
+# -- max time in seconds for which events wait for their batch
+LILY_EVENT_SINK_FLUSH_INTERVAL = getattr(
+    settings,
+    'LILY_EVENT_SINK_FLUSH_INTERVAL',
+    1)
+
+# -- max time in seconds for which the request waits for the space in the
+# -- full queue before its event gets dropped
+LILY_EVENT_SINK_PUT_TIMEOUT = getattr(
+    settings,
+    'LILY_EVENT_SINK_PUT_TIMEOUT',
+    0.05)
+
+#
+# METRICS
+#
+# -- record durations of each stage of the command in the in-process
+# -- metrics registry (`lily.base.metrics.registry`)
+LILY_COMMAND_TIMINGS_ENABLED = getattr(
+    settings,
+    'LILY_COMMAND_TIMINGS_ENABLED',
+    False)
+
+# -- additionally attach the durations as the `Server-Timing` header
+LILY_SERVER_TIMING_ENABLED = getattr(
+    settings,
+    'LILY_SERVER_TIMING_ENABLED',
+    False)
+
 #
 # TEST
 #
@@ -137,6 +386,12 @@ WSGI_APPLICATION = getattr(
     'lily.conf.wsgi.application')
 
 
+ASGI_APPLICATION = getattr(
+    settings,
+    'ASGI_APPLICATION',
+    'lily.conf.asgi.application')
+
+
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
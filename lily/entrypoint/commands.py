@@ -1,7 +1,19 @@
 
+from concurrent.futures import ThreadPoolExecutor
+import contextvars
+from functools import lru_cache
+from io import BytesIO
+from urllib.parse import urlencode
 import os
 import json
 
+from asgiref.sync import async_to_sync
+from django.core.handlers.wsgi import WSGIRequest
+from django.db import close_old_connections
+from django.urls import get_resolver, Resolver404, URLResolver
+from django.urls.resolvers import RegexPattern
+import orjson
+
 from lily.conf import settings
 from lily.base import serializers, parsers, name
 from lily.base.command import command
@@ -10,6 +22,7 @@ from lily.base.meta import Meta, Domain
 from lily.base.access import Access
 from lily.base.input import Input
 from lily.base.output import Output
+from .base import BaseRenderer
 from .serializers import CommandSerializer
 from lily.shared import get_lily_path, get_version
 
@@ -71,7 +84,8 @@ class EntryPointCommands(HTTPCommands):
 
         input=Input(query_parser=QueryParser),
 
-        output=Output(serializer=EntryPointSerializer),
+        output=Output(
+            serializer=EntryPointSerializer, cache_compressed=True),
     )
     def get(self, request):
 
@@ -137,3 +151,267 @@ class EntryPointCommands(HTTPCommands):
         commands_path = os.path.join(commands_dir_path, f'{version}.json')
         with open(commands_path, 'r') as f:
             return json.loads(f.read())
+
+
+class BatchCommands(HTTPCommands):
+
+    class BodyParser(parsers.Parser):
+
+        class CommandParser(parsers.Parser):
+
+            name = parsers.CharField()
+
+            params = parsers.DictField(default=dict)
+
+            query = parsers.DictField(default=dict)
+
+            body = parsers.DictField(default=None)
+
+        commands = CommandParser(many=True)
+
+    class BatchSerializer(serializers.Serializer):
+
+        class ResultSerializer(serializers.Serializer):
+
+            _type = 'batch_result'
+
+            name = serializers.CharField()
+
+            status_code = serializers.IntegerField()
+
+            body = serializers.JSONField()
+
+        _type = 'batch'
+
+        results = ResultSerializer(many=True)
+
+    # -- headers of the batch request which must not be passed to the
+    # -- executed commands
+    EXCLUDED_HEADERS = (
+        'CONTENT_LENGTH',
+        'CONTENT_TYPE',
+        'HTTP_ACCEPT_ENCODING',
+        'HTTP_IF_NONE_MATCH',
+        'QUERY_STRING',
+    )
+
+    commands_index = None
+
+    commands_resolver = None
+
+    @command(
+        name=name.Execute('execute', 'batch'),
+
+        meta=Meta(
+            title='Execute Batch',
+            description='''
+                Execute many commands within a single request:
+                - each command is authorized, validated and executed as
+                  if it was requested on its own
+                - consecutive commands reading data can be executed
+                  concurrently (if enabled), while all other commands are
+                  executed in the requested order.
+
+            ''',
+            domain=Domain(id='docs', name='Docs Management')),
+
+        access=Access(
+            is_private=True,
+            access_list=settings.LILY_BATCH_COMMANDS_ACCESS_LIST),
+
+        input=Input(body_parser=BodyParser),
+
+        output=Output(serializer=BatchSerializer),
+    )
+    def post(self, request):
+
+        entries = request.input.body['commands']
+        if len(entries) > settings.LILY_BATCH_COMMANDS_MAX_SIZE:
+            raise self.event.BrokenRequest(
+                'TOO_MANY_BATCH_COMMANDS_DETECTED',
+                context=request,
+                data={'max_size': settings.LILY_BATCH_COMMANDS_MAX_SIZE})
+
+        commands_index = self.get_commands_index()
+        unknown = [
+            entry['name']
+            for entry in entries
+            if entry['name'] not in commands_index
+        ]
+        if unknown:
+            raise self.event.BrokenRequest(
+                'UNKNOWN_BATCH_COMMANDS_DETECTED',
+                context=request,
+                data={'commands': unknown})
+
+        missing_params = {}
+        for entry in entries:
+            missing = (
+                set(commands_index[entry['name']]['params']) -
+                set(entry['params']))
+            if missing:
+                missing_params[entry['name']] = sorted(missing)
+
+        if missing_params:
+            raise self.event.BrokenRequest(
+                'MISSING_BATCH_COMMANDS_PARAMS_DETECTED',
+                context=request,
+                data={'params': missing_params})
+
+        results = []
+        max_workers = settings.LILY_BATCH_COMMANDS_MAX_WORKERS
+        for group in self.group_entries(entries, commands_index):
+            if len(group) == 1 or not max_workers:
+                for entry in group:
+                    results.append(self.execute_entry(request, entry))
+
+            else:
+                # -- each entry runs in its own copy of the caller's context
+                # -- so that `get_context` works the same way in the workers
+                pool = get_batch_executor(max_workers)
+                futures = [
+                    pool.submit(
+                        contextvars.copy_context().run,
+                        self.execute_entry_in_thread,
+                        request,
+                        entry)
+                    for entry in group
+                ]
+
+                for future in futures:
+                    results.append(future.result())
+
+        raise self.event.Executed({'results': results})
+
+    def get_commands_index(self):
+
+        cls = self.__class__
+        if cls.commands_index is None:
+            urlpatterns = get_resolver().url_patterns
+            cls.commands_resolver = URLResolver(
+                RegexPattern(r'^/'), urlpatterns)
+            renderer = BaseRenderer(urlpatterns)
+            views_index = renderer.crawl_views(urlpatterns)
+
+            cls.commands_index = {
+                command_name: {
+                    'view': views_index[
+                        conf['path_conf']['path']]['callback'].view_class,
+                    'method': conf['method'].upper(),
+                    'path': conf['path_conf']['path'],
+                    'params': [
+                        p['name'] for p in conf['path_conf']['parameters']],
+                }
+                for command_name, conf in renderer.render().items()
+                if conf['fn'] is not BatchCommands.post.command_conf['fn']
+            }
+
+        return cls.commands_index
+
+    def group_entries(self, entries, commands_index):
+        """Group entries into the sequence of groups executed one by one.
+
+        Consecutive reads are independent of each other therefore they
+        form a single group executed concurrently, while every other
+        command forms a group on its own.
+
+        """
+        groups = []
+        for entry in entries:
+            conf = commands_index[entry['name']]
+            entry = {**entry, 'conf': conf}
+
+            is_read = conf['method'] == 'GET'
+            if is_read and groups and groups[-1][0]['conf']['method'] == 'GET':
+                groups[-1].append(entry)
+
+            else:
+                groups.append([entry])
+
+        return groups
+
+    def execute_entry_in_thread(self, request, entry):
+        try:
+            return self.execute_entry(request, entry)
+
+        finally:
+            # -- workers are reused, so their connections are treated the
+            # -- same way as at the end of the regular request
+            close_old_connections()
+
+    def execute_entry(self, request, entry):
+
+        conf = entry['conf']
+
+        # -- params are matched against the url pattern of the command just
+        # -- like the path of the regular request
+        path = conf['path'].format(**entry['params'])
+        try:
+            match = self.commands_resolver.resolve(path)
+
+        except Resolver404:
+            match = None
+
+        if (match is None or
+                getattr(match.func, 'view_class', None) is not conf['view']):
+            return {
+                'name': entry['name'],
+                'status_code': 404,
+                'body': {
+                    '@type': 'error',
+                    '@event': 'BATCH_COMMAND_PATH_NOT_FOUND',
+                    'path': path,
+                },
+            }
+
+        body = b''
+        if entry['body'] is not None:
+            body = orjson.dumps(entry['body'])
+
+        environ = {
+            k: v
+            for k, v in request.META.items()
+            if k not in self.EXCLUDED_HEADERS
+        }
+        environ.update({
+            'REQUEST_METHOD': conf['method'],
+            'PATH_INFO': path,
+            'QUERY_STRING': urlencode(entry['query'], doseq=True),
+            'CONTENT_TYPE': 'application/json',
+            'CONTENT_LENGTH': str(len(body)),
+            'wsgi.input': BytesIO(body),
+        })
+
+        # -- the view routed by the urls is called (instead of the fresh one
+        # -- of the commands class) so that its decorators are applied too
+        view = match.func
+        if conf['view'].is_async():
+            view = async_to_sync(view)
+
+        response = view(WSGIRequest(environ), *match.args, **match.kwargs)
+
+        if response.streaming:
+            content = b''.join(response.streaming_content)
+
+        else:
+            content = response.content
+
+        # -- responses which are not JSON (e.g. redirects) are passed as
+        # -- the raw text
+        try:
+            body = orjson.loads(content) if content else None
+
+        except orjson.JSONDecodeError:
+            body = content.decode('utf8', errors='replace')
+
+        return {
+            'name': entry['name'],
+            'status_code': response.status_code,
+            'body': body,
+        }
+
+
+@lru_cache(maxsize=None)
+def get_batch_executor(max_workers):
+    return ThreadPoolExecutor(
+        max_workers=max_workers, thread_name_prefix='lily-batch')
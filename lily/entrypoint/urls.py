@@ -1,6 +1,7 @@
 
 from django.urls import re_path
 
+from lily.conf import settings
 from . import commands
 
 
@@ -12,3 +13,11 @@ urlpatterns = [
         name='entrypoint'),
 
 ]
+
+
+if settings.LILY_BATCH_COMMANDS_ENABLED:
+    urlpatterns.append(
+        re_path(
+            r'^batch/$',
+            commands.BatchCommands.as_view(),
+            name='batch'))
@@ -1,5 +1,5 @@
 
-from unittest.mock import call
+from unittest.mock import Mock, call
 import asyncio
 
 from django.test import TestCase
@@ -8,6 +8,7 @@ import requests
 from requests.exceptions import ConnectionError, Timeout
 
 from lily.asynchronous import AsyncTask, BackoffExecutor
+from lily.base.context import Context, current_context, get_context
 
 
 class Client:
@@ -168,3 +169,19 @@ class BackoffExecutorTestCase(TestCase):
             call('http://hello.world/tasks/14'),
             call('http://hello.world/tasks/16'),
         ]
+
+    def test_context_is_visible_in_tasks(self):
+
+        context = Context(command_name='READ_IT', request=Mock(META={}))
+        token = current_context.set(context)
+
+        try:
+            responses = BackoffExecutor([
+                AsyncTask(callback=get_context, args=[]),
+                AsyncTask(callback=get_context, args=[]),
+            ]).run()
+
+        finally:
+            current_context.reset(token)
+
+        assert responses == [context, context]
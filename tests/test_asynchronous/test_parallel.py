@@ -1,8 +1,10 @@
 
 from unittest import TestCase
+from unittest.mock import Mock
 from time import time, sleep
 
 from lily.asynchronous import AsyncTask, ParallelExecutor
+from lily.base.context import Context, current_context, get_context
 
 
 class ParallelExecutorTestCase(TestCase):
@@ -90,3 +92,20 @@ class ParallelExecutorTestCase(TestCase):
         assert t_1.successful is False
         assert isinstance(t_2.result, Exception)
         assert t_2.successful is False
+
+    def test_execute__context_is_visible_in_tasks(self):
+
+        context = Context(command_name='READ_IT', request=Mock(META={}))
+        token = current_context.set(context)
+
+        try:
+            t_0 = AsyncTask(get_context, [])
+            t_1 = AsyncTask(get_context, [])
+
+            ParallelExecutor(tasks=[t_0, t_1]).execute()
+
+        finally:
+            current_context.reset(token)
+
+        assert t_0.result is context
+        assert t_1.result is context
@@ -41,3 +41,36 @@ class Person(models.Model):
 
     class Meta:
         app_label = 'base'
+
+
+class CatalogueFile(models.Model):
+
+    uri = models.CharField(max_length=100)
+
+    size = models.IntegerField(default=0)
+
+    class Meta:
+        app_label = 'base'
+
+
+class Catalogue(models.Model):
+
+    name = models.CharField(max_length=100)
+
+    description = models.TextField(default='')
+
+    class Meta:
+        app_label = 'base'
+
+
+class CatalogueItem(models.Model):
+
+    catalogue = models.ForeignKey(
+        Catalogue, related_name='items', on_delete=models.CASCADE)
+
+    file = models.ForeignKey(CatalogueFile, on_delete=models.CASCADE)
+
+    name = models.CharField(max_length=100)
+
+    class Meta:
+        app_label = 'base'
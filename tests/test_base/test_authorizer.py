@@ -0,0 +1,131 @@
+from unittest.mock import Mock
+
+from django.test import TestCase
+import pytest
+
+from lily.base.authorizer import (
+    AuthorizedResponse,
+    AuthorizedResponseCache,
+    BaseAuthorizer,
+    get_authorizer_class,
+)
+
+
+class BaseAuthorizerTestCase(TestCase):
+
+    def test_get_identity(self):
+
+        authorizer = BaseAuthorizer(['ADMIN'])
+
+        identity = authorizer.get_identity(Mock(META={
+            'HTTP_X_ACCOUNT_TYPE': 'ADMIN',
+            'HTTP_X_USER_ID': 12,
+            'HTTP_X_OTHER': 'whatever',
+        }))
+
+        assert identity == ('ADMIN', 12)
+
+    def test_get_identity__missing_headers(self):
+
+        authorizer = BaseAuthorizer(['ADMIN'])
+
+        assert authorizer.get_identity(Mock(META={
+            'HTTP_X_ACCOUNT_TYPE': 'ADMIN',
+        })) is None
+
+    def test_get_identity__no_identity_headers(self):
+
+        class Authorizer(BaseAuthorizer):
+
+            identity_headers = None
+
+        authorizer = Authorizer(['ADMIN'])
+
+        assert authorizer.get_identity(Mock(META={
+            'HTTP_X_ACCOUNT_TYPE': 'ADMIN',
+            'HTTP_X_USER_ID': 12,
+        })) is None
+
+    def test_get_identity__inherited_identity_headers(self):
+
+        class Authorizer(BaseAuthorizer):
+
+            def authorize(self, request):
+                pass
+
+        class IdentityAuthorizer(Authorizer):
+
+            identity_headers = ('HTTP_AUTHORIZATION',)
+
+        request = Mock(META={
+            'HTTP_X_ACCOUNT_TYPE': 'ADMIN',
+            'HTTP_X_USER_ID': 12,
+            'HTTP_AUTHORIZATION': 'Bearer abc',
+        })
+
+        assert Authorizer(['ADMIN']).get_identity(request) is None
+        assert IdentityAuthorizer(['ADMIN']).get_identity(request) == (
+            'Bearer abc',)
+
+    def test_get_authorizer_class(self):
+
+        assert get_authorizer_class(
+            'lily.base.authorizer.BaseAuthorizer') == BaseAuthorizer
+
+
+class AuthorizedResponseCacheTestCase(TestCase):
+
+    @pytest.fixture(autouse=True)
+    def initfixtures(self, mocker):
+        self.mocker = mocker
+
+    def setUp(self):
+        self.monotonic = self.mocker.patch('lily.base.authorizer.monotonic')
+        self.monotonic.return_value = 100
+
+    def test_get__returns_copy(self):
+
+        cache = AuthorizedResponseCache(ttl=10, max_size=10)
+        authorized = AuthorizedResponse(
+            request_access={'user_id': 1},
+            response_headers={'X-Hi': 'there'})
+        cache.set('a', authorized)
+
+        cached = cache.get('a')
+        cached.request_access['user_id'] = 2
+
+        assert cached is not authorized
+        assert cache.get('a') == authorized
+
+    def test_get__missing_or_expired(self):
+
+        cache = AuthorizedResponseCache(ttl=10, max_size=10)
+        cache.set('a', AuthorizedResponse(request_access={'user_id': 1}))
+
+        assert cache.get('b') is None
+
+        self.monotonic.return_value = 111
+
+        assert cache.get('a') is None
+
+    def test_set__evicts_expired_entries_first(self):
+
+        cache = AuthorizedResponseCache(ttl=10, max_size=2)
+        cache.set('a', AuthorizedResponse(request_access={'user_id': 1}))
+
+        self.monotonic.return_value = 105
+        cache.set('b', AuthorizedResponse(request_access={'user_id': 2}))
+
+        self.monotonic.return_value = 112
+        cache.set('c', AuthorizedResponse(request_access={'user_id': 3}))
+
+        assert set(cache.entries.keys()) == {'b', 'c'}
+
+    def test_set__evicts_oldest_entry_when_all_valid(self):
+
+        cache = AuthorizedResponseCache(ttl=10, max_size=2)
+        cache.set('a', AuthorizedResponse(request_access={'user_id': 1}))
+        cache.set('b', AuthorizedResponse(request_access={'user_id': 2}))
+        cache.set('c', AuthorizedResponse(request_access={'user_id': 3}))
+
+        assert set(cache.entries.keys()) == {'b', 'c'}
@@ -0,0 +1,118 @@
+
+from django.test import TestCase, RequestFactory
+import pytest
+
+from lily.base.cache import (
+    CachedResponse,
+    CachePolicy,
+    DjangoResponseCache,
+    LocalResponseCache,
+)
+
+
+class CachePolicyTestCase(TestCase):
+
+    def test_render_key(self):
+
+        policy = CachePolicy(ttl=10, vary_on=['Accept-Language'])
+        request = RequestFactory().get(
+            '/items/', {'b': '1', 'a': '2'}, HTTP_ACCEPT_LANGUAGE='pl')
+        request.access = {'user_id': 11}
+
+        key = policy.render_key(request, 'READ_ITEM', {'item_id': 1}, 3)
+
+        assert key == (
+            '["READ_ITEM",{"item_id":1},[["a",["2"]],["b",["1"]]],'
+            '{"user_id":11},3,["pl"]]')
+
+    def test_render_key__parsed_query(self):
+
+        policy = CachePolicy(ttl=10)
+        request = RequestFactory().get('/items/', {'a': '2'})
+        request.input = type('InputAttrs', (), {'query': {'a': 2}})
+
+        key = policy.render_key(request, 'READ_ITEM', {}, 0)
+
+        assert key == '["READ_ITEM",{},{"a":2},null,0,[]]'
+
+
+class LocalResponseCacheTestCase(TestCase):
+
+    @pytest.fixture(autouse=True)
+    def initfixtures(self, mocker):
+        self.mocker = mocker
+
+    def test_get_set(self):
+
+        cache = LocalResponseCache(max_size=10)
+        response = CachedResponse(200, b'{}')
+
+        assert cache.get('a') is None
+
+        cache.set('a', response, 10)
+
+        assert cache.get('a') is response
+
+    def test_get__expired(self):
+
+        monotonic = self.mocker.patch('lily.base.cache.monotonic')
+        cache = LocalResponseCache(max_size=10)
+
+        monotonic.return_value = 100
+        cache.set('a', CachedResponse(200, b'{}'), 10)
+
+        monotonic.return_value = 111
+
+        assert cache.get('a') is None
+        assert cache.entries == {}
+
+    def test_set__least_recently_used_is_evicted(self):
+
+        cache = LocalResponseCache(max_size=2)
+        cache.set('a', CachedResponse(200, b'a'), 10)
+        cache.set('b', CachedResponse(200, b'b'), 10)
+
+        cache.get('a')
+        cache.set('c', CachedResponse(200, b'c'), 10)
+
+        assert list(cache.entries) == ['a', 'c']
+
+    def test_invalidate(self):
+
+        cache = LocalResponseCache(max_size=2)
+
+        assert cache.get_generation('ITEM') == 0
+
+        cache.invalidate('ITEM')
+        cache.invalidate('ITEM')
+
+        assert cache.get_generation('ITEM') == 2
+        assert cache.get_generation('PAGE') == 0
+
+
+class DjangoResponseCacheTestCase(TestCase):
+
+    def setUp(self):
+        self.cache = DjangoResponseCache()
+        self.cache.cache.clear()
+
+    def test_get_set(self):
+
+        assert self.cache.get('a') is None
+
+        self.cache.set('a', CachedResponse(200, b'{}', '"abc"'), 10)
+
+        response = self.cache.get('a')
+        assert response.status_code == 200
+        assert response.content == b'{}'
+        assert response.etag == '"abc"'
+
+    def test_invalidate(self):
+
+        assert self.cache.get_generation('ITEM') == 0
+
+        self.cache.invalidate('ITEM')
+        self.cache.invalidate('ITEM')
+
+        assert self.cache.get_generation('ITEM') == 2
+        assert self.cache.get_generation('PAGE') == 0
@@ -0,0 +1,187 @@
+
+from threading import Event, Thread
+import time
+from unittest.mock import call, MagicMock, Mock
+
+from django.http import HttpResponse
+from django.test import TestCase
+import pytest
+
+from lily.base.cache import CachedResponse
+from lily.base.coalescing import (
+    Flight,
+    LocalSingleFlight,
+    RedisSingleFlight,
+)
+from lily.base.events import Json200
+
+
+class LocalSingleFlightTestCase(TestCase):
+
+    def execute_concurrently(self, flight, render, count):
+
+        results = {}
+
+        def execute(i):
+            results[i] = flight.execute('key', render)
+
+        leader = Thread(target=execute, args=(0,))
+        leader.start()
+        self.started.wait(5)
+
+        followers = [
+            Thread(target=execute, args=(i,)) for i in range(1, count)]
+        for follower in followers:
+            follower.start()
+
+        time.sleep(0.1)
+        self.released.set()
+        for thread in [leader] + followers:
+            thread.join()
+
+        return [results[i] for i in range(count)]
+
+    def setUp(self):
+        self.started = Event()
+        self.released = Event()
+        self.calls = []
+
+    def test_execute__single(self):
+
+        flight = LocalSingleFlight(timeout=1)
+        response = Json200({'hi': 'there'})
+
+        assert flight.execute('key', lambda: response) is response
+        assert flight.flights == {}
+
+    def test_execute__response_is_shared(self):
+
+        def render():
+            self.calls.append(1)
+            self.started.set()
+            self.released.wait(5)
+
+            return Json200({'hi': 'there'})
+
+        results = self.execute_concurrently(
+            LocalSingleFlight(timeout=5), render, 3)
+
+        assert len(self.calls) == 1
+        assert isinstance(results[0], Json200)
+        for result in results[1:]:
+            assert isinstance(result, CachedResponse)
+            assert result.status_code == 200
+            assert result.content == b'{"hi":"there"}'
+
+    def test_execute__not_shareable_response(self):
+
+        def render():
+            self.calls.append(1)
+            self.started.set()
+            self.released.wait(5)
+
+            return HttpResponse('hi')
+
+        results = self.execute_concurrently(
+            LocalSingleFlight(timeout=5), render, 3)
+
+        assert len(self.calls) == 3
+        assert all(isinstance(r, HttpResponse) for r in results)
+
+    def test_execute__timeout(self):
+
+        flight = LocalSingleFlight(timeout=0.01)
+        # -- flight which never finishes
+        flight.flights['key'] = Flight()
+
+        response = Json200({})
+
+        assert flight.execute('key', lambda: response) is response
+
+
+class RedisSingleFlightTestCase(TestCase):
+
+    @pytest.fixture(autouse=True)
+    def initfixtures(self, mocker):
+        self.mocker = mocker
+
+    def setUp(self):
+        self.db = MagicMock()
+        self.mocker.patch(
+            'lily.base.coalescing.get_redis', return_value=self.db)
+        self.pipeline = self.db.pipeline.return_value.__enter__.return_value
+        self.flight = RedisSingleFlight(timeout=1)
+
+    def test_execute__leader(self):
+
+        self.db.set.return_value = True
+        response = Json200({'hi': 'there'})
+
+        assert self.flight.execute('key', lambda: response) is response
+
+        lock_key, flight_id = self.db.set.call_args[0]
+        shared_key = 'lily:flight:shared:{}'.format(flight_id)
+        assert self.pipeline.hset.call_args_list == [
+            call(shared_key, mapping={
+                'status_code': 200,
+                'content': b'{"hi":"there"}',
+                'etag': '',
+            }),
+        ]
+        assert self.pipeline.pexpire.call_args_list == [
+            call(shared_key, 1000)]
+        assert self.pipeline.execute.call_count == 1
+
+    def test_execute__leader_releases_only_its_own_lock(self):
+
+        self.db.set.return_value = True
+
+        self.flight.execute('key', lambda: HttpResponse('hi'))
+
+        lock_key, flight_id = self.db.set.call_args[0]
+        assert self.db.register_script.call_args_list == [
+            call(RedisSingleFlight.RELEASE_SCRIPT)]
+        assert self.db.register_script.return_value.call_args_list == [
+            call(keys=[lock_key], args=[flight_id], client=self.pipeline),
+        ]
+        assert self.pipeline.delete.call_count == 0
+        assert self.pipeline.hset.call_count == 0
+
+    def test_execute__response_is_shared(self):
+
+        self.db.set.return_value = False
+        self.db.get.return_value = b'abc'
+        self.db.hgetall.return_value = {
+            b'status_code': b'200',
+            b'content': b'{"hi":"there"}',
+            b'etag': b'"v1"',
+        }
+        render = Mock()
+
+        result = self.flight.execute('key', render)
+
+        assert isinstance(result, CachedResponse)
+        assert result.status_code == 200
+        assert result.content == b'{"hi":"there"}'
+        assert result.etag == '"v1"'
+        assert self.db.hgetall.call_args_list == [
+            call('lily:flight:shared:abc')]
+        assert render.call_count == 0
+
+    def test_execute__leader_finished_without_sharing(self):
+
+        self.db.set.return_value = False
+        self.db.get.side_effect = [b'abc', None]
+        self.db.hgetall.return_value = {}
+        response = HttpResponse('hi')
+
+        assert self.flight.execute('key', lambda: response) is response
+
+    def test_execute__no_leader(self):
+
+        self.db.set.return_value = False
+        self.db.get.return_value = None
+        response = HttpResponse('hi')
+
+        assert self.flight.execute('key', lambda: response) is response
+        assert self.db.hgetall.call_count == 0
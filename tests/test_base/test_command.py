@@ -9,7 +9,7 @@ from django.core.exceptions import ValidationError
 from django.db.utils import DatabaseError
 from django.contrib.auth.models import User
 from django_fake_model import models as fake_models
-from django.db import models, transaction
+from django.db import connection, models, transaction
 import pytest
 
 from lily.base.command import command, HTTPCommands
@@ -371,6 +371,12 @@ class CommandTestCase(TestCase):
             'input': Input(body_parser=TestCommands.BodyParser),
             'output': Output(serializer=TestCommands.ClientSerializer),
             'is_atomic': False,
+            'cache': None,
+            'coalesce': False,
+            'rate_limit': None,
+            'concurrency_limit': None,
+            'replica': None,
+            'max_queries': None,
             'fn': TestCommands.post.command_conf['fn'],
         }
 
@@ -674,3 +680,103 @@ class CommandTestCase(TestCase):
         assert response.status_code == 200
         assert response.content == b'hello world'
         assert response.get('Content-Type') == 'text/html; charset=utf-8'
+
+    #
+    # ATOMICITY: RESPONSE RENDERING
+    #
+    def test_atomicity__response_is_rendered_after_commit(self):
+
+        class AtomicContext(ContextDecorator):
+
+            is_open = False
+
+            def __init__(self, *args, **kwargs):
+                pass
+
+            def __enter__(self):
+                self.__class__.is_open = True
+
+            def __exit__(self, exc_type, exc, exc_tb):
+                self.__class__.is_open = False
+
+        self.mocker.patch.object(transaction, 'atomic', AtomicContext)
+        is_open_on_serialization = []
+        serializer_init = serializers.EmptySerializer.__init__
+
+        def init(*args, **kwargs):
+            is_open_on_serialization.append(AtomicContext.is_open)
+            serializer_init(*args, **kwargs)
+
+        self.mocker.patch.object(
+            serializers.EmptySerializer, '__init__', init)
+        log = self.mocker.spy(EventFactory.BaseSuccessException, 'log')
+        request = Mock(log_authorizer={}, META=get_auth_headers(11))
+
+        # -- raised success exception
+        self.mocker.patch.object(TestCommands, 'some_stuff')
+        TestCommands().delete(request)
+
+        # -- returned success exception
+        TestReturnCommands().get(request)
+
+        assert is_open_on_serialization == [False, False]
+        assert log.call_count == 2
+
+    def test_atomicity__locked_rows_are_fetched_before_commit(self):
+
+        class AtomicContext(ContextDecorator):
+
+            is_open = False
+
+            def __init__(self, *args, **kwargs):
+                pass
+
+            def __enter__(self):
+                self.__class__.is_open = True
+
+            def __exit__(self, exc_type, exc, exc_tb):
+                self.__class__.is_open = False
+
+        class UserSerializer(serializers.Serializer):
+
+            _type = 'item'
+
+            id = serializers.IntegerField()
+
+        class UsersSerializer(serializers.Serializer):
+
+            _type = 'users'
+
+            users = UserSerializer(many=True)
+
+        class LockingCommands(HTTPCommands):
+
+            @command(
+                name='LOCK',
+                meta=Meta(
+                    title='lock',
+                    domain=Domain(id='lock', name='lock')),
+                output=Output(serializer=UsersSerializer),
+                is_atomic='default')
+            def get(self, request):
+
+                raise self.event.Executed(
+                    event='LOCKED',
+                    context=request,
+                    data={'users': User.objects.select_for_update()})
+
+        self.mocker.patch.object(transaction, 'atomic', AtomicContext)
+        u = User.objects.create_user(username='jacky')
+        is_open_on_query = []
+
+        def record(execute, *args):
+            is_open_on_query.append(AtomicContext.is_open)
+            return execute(*args)
+
+        with connection.execute_wrapper(record):
+            response = LockingCommands().get(
+                Mock(log_authorizer={}, META=get_auth_headers(11)))
+
+        assert response.status_code == 200
+        assert to_json(response)['users'] == [{'@type': 'item', 'id': u.id}]
+        assert is_open_on_query == [True]
@@ -0,0 +1,1604 @@
+
+import asyncio
+import gzip
+import json
+import re
+import threading
+import time
+import timeit
+from unittest.mock import call
+
+from django.test import TestCase, RequestFactory
+from django.http import HttpResponse
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.utils import DatabaseError
+import pytest
+
+from lily.conf import settings
+from lily.base.command import command, HTTPCommands, _handle_response
+from lily.base.access import Access
+from lily.base.authorizer import BaseAuthorizer
+from lily.base.cache import CachePolicy, get_response_cache
+from lily.base.coalescing import get_single_flight
+from lily.base.limits import RateLimit
+from lily.base.context import Context, get_context
+from lily.base.meta import Meta, Domain
+from lily.base.metrics import registry
+from lily.base.input import Input
+from lily.base.output import Output
+from lily.base import serializers, parsers, name
+from lily.base.events import EventFactory
+from lily.base.test import override_settings
+from lily.base.utils import import_from_string
+from .test_command import (
+    HttpCommands,
+    TestCommands,
+    get_auth_headers,
+    to_json,
+)
+
+
+def get_request(method='get', path='/it/', data=None, **headers):
+    factory = getattr(RequestFactory(), method)
+
+    if data is None:
+        return factory(path, **headers)
+
+    return factory(
+        path, data=data, content_type='application/json', **headers)
+
+
+def get_premium_request(amount):
+    return get_request(
+        'post', data={'amount': amount}, **get_auth_headers(11, 'PREMIUM'))
+
+
+class ReadItCommands(HTTPCommands):
+
+    @command(
+        name=name.Read('IT'),
+        meta=Meta(
+            title='read it',
+            domain=Domain(id='read', name='read')),
+    )
+    def get(self, request):
+
+        raise self.event.Read()
+
+
+def baseline_command(name, meta, access=None, input=None, output=None):
+    """Per request work of the `command` done before its pipeline got
+    compiled at the decoration time (the non atomic path only).
+
+    """
+    access = access or Access(access_list=None)
+    input = input or Input()
+    output = output or Output(serializer=serializers.EmptySerializer)
+
+    def command_inner(fn):
+
+        def inner(self, request, *args, **kwargs):
+
+            self.event = EventFactory()
+
+            request._lily_context = Context(
+                command_name=name.render_command_name(),
+                request=request)
+
+            try:
+                response_headers = {}
+                if access.access_list:
+                    authorizer = import_from_string(
+                        settings.LILY_AUTHORIZER_CLASS
+                    )(access.access_list)
+                    authorized = authorizer.authorize(request)
+                    request.access = authorized.request_access
+                    request.log_authorizer = authorizer.log(request.access)
+                    response_headers = authorized.response_headers
+
+                if input:
+                    input.parse(
+                        request,
+                        command_name=request._lily_context.command_name)
+
+                response = fn(self, request, *args, **kwargs)
+                if isinstance(response, EventFactory.BaseSuccessException):
+                    return _handle_response(
+                        request,
+                        name.render_event_name,
+                        output,
+                        response_headers,
+                        response)
+
+                else:
+                    return response
+
+            except EventFactory.Generic as e:
+                return e.extend(
+                    method=request.method, path=request.path
+                ).log().response()
+
+            except EventFactory.BaseSuccessException as e:
+                return _handle_response(
+                    request,
+                    name.render_event_name,
+                    output,
+                    response_headers,
+                    e)
+
+        return inner
+
+    return command_inner
+
+
+class BaselineReadItCommands(HTTPCommands):
+
+    @baseline_command(
+        name=name.Read('IT'),
+        meta=Meta(
+            title='read it',
+            domain=Domain(id='read', name='read')),
+    )
+    def get(self, request):
+
+        raise self.event.Read()
+
+
+class CommandPipelineTestCase(TestCase):
+
+    @pytest.fixture(autouse=True)
+    def initfixtures(self, mocker):
+        self.mocker = mocker
+
+    def test_not_declared_stages_are_skipped(self):
+
+        render_command_name = self.mocker.spy(
+            name.Read, 'render_command_name')
+        render_event_name = self.mocker.spy(name.Read, 'render_event_name')
+        parse = self.mocker.spy(Input, 'parse')
+        get_authorizer_class = self.mocker.patch(
+            'lily.base.command.get_authorizer_class')
+        atomic = self.mocker.spy(transaction, 'atomic')
+        c = ReadItCommands()
+
+        for _ in range(3):
+            request = get_request()
+
+            response = c.get(request)
+
+            assert response.status_code == 200
+            assert to_json(response) == {
+                '@event': 'IT_READ',
+                '@type': 'empty',
+            }
+            assert isinstance(request.input, Input.InputAttrs)
+
+        assert render_command_name.call_count == 0
+        assert render_event_name.call_count <= 1
+        assert parse.call_count == 0
+        assert get_authorizer_class.call_count == 0
+        assert atomic.call_count == 0
+
+    def test_event_names_are_cached_per_finalizer(self):
+
+        class ItCommands(HTTPCommands):
+
+            @command(
+                name=name.Read('IT'),
+                meta=Meta(
+                    title='read it',
+                    domain=Domain(id='read', name='read')),
+            )
+            def get(self, request):
+
+                raise self.event.Read()
+
+            @command(
+                name='DO_IT',
+                meta=Meta(
+                    title='do it',
+                    domain=Domain(id='do', name='do')),
+            )
+            def post(self, request):
+
+                raise self.event.Executed(event=request.event)
+
+        render_event_name = self.mocker.spy(name.Read, 'render_event_name')
+        render_constant_event_name = self.mocker.spy(
+            name.ConstantName, 'render_event_name')
+        c = ItCommands()
+
+        for _ in range(3):
+            response = c.get(get_request())
+
+            assert to_json(response) == {'@event': 'IT_READ', '@type': 'empty'}
+
+        assert render_event_name.call_count == 1
+
+        # -- constant names are cached per declared event
+        for event in ['DONE', 'FAILED', 'DONE', 'FAILED']:
+            request = get_request('post')
+            request.event = event
+
+            response = c.post(request)
+
+            assert to_json(response) == {'@event': event, '@type': 'empty'}
+
+        assert render_constant_event_name.call_count == 2
+
+    def test_event_names_are_cached_per_finalizer__invalid_finalizer(self):
+
+        class BrokenReadCommands(HTTPCommands):
+
+            @command(
+                name=name.Read('IT'),
+                meta=Meta(
+                    title='read it',
+                    domain=Domain(id='read', name='read')),
+            )
+            def get(self, request):
+
+                raise self.event.Created()
+
+        render_event_name = self.mocker.spy(name.Read, 'render_event_name')
+        c = BrokenReadCommands()
+
+        for _ in range(2):
+            response = c.get(get_request())
+
+            assert response.status_code == 400
+            assert to_json(response) == {
+                '@event': (
+                    'INVALID_FINALIZER_USED_FOR_SPECIFIC_COMMAND_DETECTED'),
+                '@type': 'error',
+            }
+
+        # -- the rejection is not cached
+        assert render_event_name.call_count == 2
+
+    def test_benchmark__no_op_read(self):
+
+        compiled = ReadItCommands()
+        baseline = BaselineReadItCommands()
+
+        # -- both render the same response
+        assert (
+            baseline.get(get_request()).content ==
+            compiled.get(get_request()).content)
+
+        # -- the same request is reused in order to measure only the
+        # -- dispatching of the command, while the measurements of both
+        # -- are interleaved so that they would not drift apart
+        request = get_request()
+        timings = {compiled: [], baseline: []}
+        for _ in range(20):
+            for c, measured in timings.items():
+                measured.append(
+                    timeit.timeit(lambda: c.get(request), number=200))
+
+        assert min(timings[compiled]) < min(timings[baseline])
+
+
+class AuthorizationStageTestCase(TestCase):
+
+    @pytest.fixture(autouse=True)
+    def initfixtures(self, mocker):
+        self.mocker = mocker
+
+    def get_commands_class(self):
+
+        class AuthorizedCommands(HTTPCommands):
+
+            @command(
+                name=name.Read('IT'),
+                meta=Meta(
+                    title='read it',
+                    domain=Domain(id='read', name='read')),
+                access=Access(access_list=['PREMIUM']),
+            )
+            def get(self, request):
+
+                raise self.event.Read()
+
+        return AuthorizedCommands
+
+    def test_authorizer_is_reused(self):
+
+        init = self.mocker.spy(BaseAuthorizer, '__init__')
+        authorize = self.mocker.spy(BaseAuthorizer, 'authorize')
+        c = self.get_commands_class()()
+
+        for _ in range(3):
+            response = c.get(get_request(**get_auth_headers(11, 'PREMIUM')))
+
+            assert response.status_code == 200
+
+        assert init.call_count == 1
+        assert authorize.call_count == 3
+
+    @override_settings(LILY_AUTHORIZER_CACHE_TTL=60)
+    def test_authorized_response_is_cached_per_identity(self):
+
+        authorize = self.mocker.spy(BaseAuthorizer, 'authorize')
+        c = self.get_commands_class()()
+
+        # -- same identity
+        for _ in range(3):
+            request = get_request(**get_auth_headers(11, 'PREMIUM'))
+
+            response = c.get(request)
+
+            assert response.status_code == 200
+            assert request.access == {
+                'account_type': 'PREMIUM',
+                'user_id': 11,
+            }
+
+        assert authorize.call_count == 1
+
+        # -- different identity
+        request = get_request(**get_auth_headers(12, 'PREMIUM'))
+
+        response = c.get(request)
+
+        assert response.status_code == 200
+        assert request.access == {'account_type': 'PREMIUM', 'user_id': 12}
+        assert authorize.call_count == 2
+
+    @override_settings(LILY_AUTHORIZER_CACHE_TTL=60)
+    def test_authorized_response_is_cached__expired(self):
+
+        monotonic = self.mocker.patch('lily.base.authorizer.monotonic')
+        authorize = self.mocker.spy(BaseAuthorizer, 'authorize')
+        c = self.get_commands_class()()
+
+        monotonic.return_value = 100
+        c.get(get_request(**get_auth_headers(11, 'PREMIUM')))
+
+        monotonic.return_value = 150
+        c.get(get_request(**get_auth_headers(11, 'PREMIUM')))
+
+        assert authorize.call_count == 1
+
+        monotonic.return_value = 161
+        c.get(get_request(**get_auth_headers(11, 'PREMIUM')))
+
+        assert authorize.call_count == 2
+
+    @override_settings(LILY_AUTHORIZER_CACHE_TTL=60)
+    def test_authorized_response_is_cached__access_denied_not_cached(self):
+
+        authorize = self.mocker.spy(BaseAuthorizer, 'authorize')
+        c = self.get_commands_class()()
+
+        for _ in range(2):
+            response = c.get(get_request())
+
+            assert response.status_code == 403
+
+        assert authorize.call_count == 2
+
+
+class AsyncCommands(HTTPCommands):
+
+    class BodyParser(parsers.Parser):
+
+        amount = parsers.IntegerField()
+
+    @command(
+        name=name.Read('IT'),
+        meta=Meta(
+            title='read it',
+            domain=Domain(id='read', name='read')),
+        access=Access(access_list=['PREMIUM']),
+        input=Input(body_parser=BodyParser),
+        output=Output(serializer=TestCommands.SimpleSerializer),
+    )
+    async def post(self, request):
+
+        await asyncio.sleep(0)
+
+        raise self.event.Read(data={'amount': request.input.body['amount']})
+
+    @command(
+        name='BREAK_IT',
+        meta=Meta(
+            title='break it',
+            domain=Domain(id='break', name='break')),
+    )
+    async def delete(self, request):
+
+        await asyncio.sleep(0)
+
+        raise DatabaseError()
+
+    @command(
+        name=name.Read('IT'),
+        meta=Meta(
+            title='read it',
+            domain=Domain(id='read', name='read')),
+    )
+    async def get(self, request):
+
+        return HttpResponse('hello world')
+
+
+class AsyncCommandTestCase(TestCase):
+
+    def test_success(self):
+
+        request = get_premium_request(81)
+
+        response = asyncio.run(AsyncCommands().post(request))
+
+        assert response.status_code == 200
+        assert to_json(response) == {
+            '@type': 'simple',
+            '@event': 'IT_READ',
+            'amount': 81,
+        }
+        assert request.access == {'account_type': 'PREMIUM', 'user_id': 11}
+        assert request._lily_context.command_name == 'READ_IT'
+
+    def test_access_denied(self):
+
+        response = asyncio.run(AsyncCommands().post(
+            get_request('post', data={'amount': 81})))
+
+        assert response.status_code == 403
+        assert to_json(response) == {
+            '@type': 'error',
+            '@event': 'ACCESS_DENIED',
+        }
+
+    def test_database_error(self):
+
+        response = asyncio.run(AsyncCommands().delete(get_request('delete')))
+
+        assert response.status_code == 500
+        assert to_json(response) == {
+            '@type': 'error',
+            '@event': 'DATABASE_ERROR_OCCURRED',
+        }
+
+    def test_http_response(self):
+
+        response = asyncio.run(AsyncCommands().get(get_request()))
+
+        assert response.status_code == 200
+        assert response.content == b'hello world'
+
+    def test_many_requests_in_flight(self):
+
+        class SlowCommands(HTTPCommands):
+
+            @command(
+                name=name.Read('IT'),
+                meta=Meta(
+                    title='read it',
+                    domain=Domain(id='read', name='read')),
+            )
+            async def get(self, request):
+
+                await asyncio.sleep(0.2)
+
+                raise self.event.Read()
+
+        async def run():
+            return await asyncio.gather(*[
+                SlowCommands().get(get_request())
+                for _ in range(50)
+            ])
+
+        start = time.monotonic()
+        responses = asyncio.run(run())
+
+        assert time.monotonic() - start < 1
+        assert [r.status_code for r in responses] == 50 * [200]
+
+    def test_atomic_async_command_is_rejected(self):
+
+        with pytest.raises(ImproperlyConfigured):
+
+            @command(
+                name=name.Read('IT'),
+                meta=Meta(
+                    title='read it',
+                    domain=Domain(id='read', name='read')),
+                is_atomic=True)
+            async def get(self, request):
+                pass
+
+    def test_as_view__is_marked_as_coroutine(self):
+
+        assert asyncio.iscoroutinefunction(AsyncCommands.as_view()) is True
+        assert asyncio.iscoroutinefunction(HttpCommands.as_view()) is False
+
+    def test_as_view__mixed_handlers_are_rejected(self):
+
+        class MixedCommands(AsyncCommands):
+
+            @command(
+                name='PUT_IT',
+                meta=Meta(
+                    title='put it',
+                    domain=Domain(id='put', name='put')),
+            )
+            def put(self, request):
+                pass
+
+        with pytest.raises(ImproperlyConfigured):
+            MixedCommands.as_view()
+
+    def test_http_method_not_allowed(self):
+
+        request = get_request('patch')
+
+        response = asyncio.run(AsyncCommands.as_view()(request))
+
+        assert response.status_code == 405
+
+
+class ContextCommands(HTTPCommands):
+
+    @command(
+        name=name.Read('IT'),
+        meta=Meta(
+            title='read it',
+            domain=Domain(id='read', name='read')),
+    )
+    def get(self, request):
+
+        raise self.event.Read(data={'context': get_context()})
+
+    @command(
+        name=name.Read('IT'),
+        meta=Meta(
+            title='read it',
+            domain=Domain(id='read', name='read')),
+    )
+    async def post(self, request):
+
+        await asyncio.sleep(0)
+
+        raise self.event.Read(data={'context': get_context()})
+
+
+class CommandContextTestCase(TestCase):
+
+    @pytest.fixture(autouse=True)
+    def initfixtures(self, mocker):
+        self.mocker = mocker
+
+    def test_context_is_published(self):
+
+        handle_response = self.mocker.patch(
+            'lily.base.command._handle_response')
+        request = get_request(HTTP_X_CS_CORRELATION_ID='abc')
+
+        ContextCommands().get(request)
+
+        e = handle_response.call_args[0][-1]
+        assert e.data['context'] is request._lily_context
+        assert e.data['context'].command_name == 'READ_IT'
+        assert e.data['context'].correlation_id == 'abc'
+        assert get_context() is None
+
+    def test_context_is_published__async(self):
+
+        handle_response = self.mocker.patch(
+            'lily.base.command._handle_response')
+        request = get_request(HTTP_X_CS_CORRELATION_ID='abc')
+
+        asyncio.run(ContextCommands().post(request))
+
+        e = handle_response.call_args[0][-1]
+        assert e.data['context'] is request._lily_context
+        assert get_context() is None
+
+
+class TimingsTestCase(TestCase):
+
+    def setUp(self):
+        registry.reset()
+
+    def get_commands_class(self):
+
+        class TimedCommands(HTTPCommands):
+
+            class BodyParser(parsers.Parser):
+
+                amount = parsers.IntegerField()
+
+            @command(
+                name=name.Read('IT'),
+                meta=Meta(
+                    title='read it',
+                    domain=Domain(id='read', name='read')),
+                access=Access(access_list=['PREMIUM']),
+                input=Input(body_parser=BodyParser),
+                output=Output(serializer=TestCommands.SimpleSerializer),
+            )
+            def post(self, request):
+
+                raise self.event.Read(
+                    data={'amount': request.input.body['amount']})
+
+        return TimedCommands
+
+    @override_settings(LILY_COMMAND_TIMINGS_ENABLED=True)
+    def test_timings_recorded(self):
+
+        c = self.get_commands_class()()
+
+        response = c.post(get_premium_request(81))
+        c.post(get_premium_request(81))
+
+        assert response.status_code == 200
+        assert 'Server-Timing' not in response
+        snapshot = registry.snapshot()['READ_IT']
+        assert set(snapshot.keys()) == {
+            'authorization',
+            'input',
+            'handler',
+            'serialization',
+            'encoding',
+            'total',
+        }
+        assert all(h['count'] == 2 for h in snapshot.values())
+
+    @override_settings(LILY_SERVER_TIMING_ENABLED=True)
+    def test_server_timing_header(self):
+
+        c = self.get_commands_class()()
+
+        response = c.post(get_premium_request(81))
+
+        assert response.status_code == 200
+        stages = [
+            timing.split(';dur=')[0]
+            for timing in response['Server-Timing'].split(', ')
+        ]
+        assert stages == [
+            'authorization',
+            'input',
+            'handler',
+            'serialization',
+            'encoding',
+            'total',
+        ]
+
+    @override_settings(LILY_SERVER_TIMING_ENABLED=True)
+    def test_server_timing_header__error(self):
+
+        c = self.get_commands_class()()
+        request = get_premium_request(81)
+        request.META = {}
+
+        response = c.post(request)
+
+        assert response.status_code == 403
+        assert response['Server-Timing'].startswith('authorization;dur=')
+
+    def test_timings_disabled(self):
+
+        c = self.get_commands_class()()
+
+        response = c.post(get_premium_request(81))
+
+        assert response.status_code == 200
+        assert 'Server-Timing' not in response
+        assert registry.snapshot() == {}
+
+
+class ItemSerializer(serializers.Serializer):
+
+    _type = 'item'
+
+    id = serializers.IntegerField()
+
+
+class ItemsSerializer(serializers.Serializer):
+
+    _type = 'items_list'
+
+    items = ItemSerializer(many=True)
+
+
+class StreamingCommands(HTTPCommands):
+
+    @command(
+        name=name.BulkRead('item'),
+        meta=Meta(
+            title='bulk read items',
+            domain=Domain(id='read', name='read')),
+        access=Access(access_list=['PREMIUM']),
+        output=Output(
+            serializer=ItemsSerializer, stream_field='items', chunk_size=2),
+    )
+    def get(self, request):
+
+        raise self.event.BulkRead({
+            'items': ({'id': i} for i in range(5)),
+        })
+
+
+class StreamingTestCase(TestCase):
+
+    def test_streaming_response(self):
+
+        request = get_request(**get_auth_headers(11, 'PREMIUM'))
+
+        response = StreamingCommands().get(request)
+
+        assert response.status_code == 200
+        assert response.streaming is True
+        assert response['Content-Type'] == 'application/json'
+        assert json.loads(b''.join(response.streaming_content)) == {
+            '@type': 'items_list',
+            '@event': 'ITEMS_BULK_READ',
+            'items': [
+                {'@type': 'item', 'id': 0},
+                {'@type': 'item', 'id': 1},
+                {'@type': 'item', 'id': 2},
+                {'@type': 'item', 'id': 3},
+                {'@type': 'item', 'id': 4},
+            ],
+        }
+
+
+class ConditionalCommands(HTTPCommands):
+
+    @command(
+        name=name.Read('IT'),
+        meta=Meta(
+            title='read it',
+            domain=Domain(id='read', name='read')),
+        output=Output(
+            serializer=TestCommands.SimpleSerializer, etag=True),
+    )
+    def get(self, request):
+
+        raise self.event.Read({'amount': request.amount})
+
+    @command(
+        name=name.Read('IT'),
+        meta=Meta(
+            title='read it',
+            domain=Domain(id='read', name='read')),
+        output=Output(
+            serializer=TestCommands.SimpleSerializer, etag=True),
+    )
+    def post(self, request):
+
+        raise self.event.Read(
+            {'amount': request.amount}, version=request.version)
+
+    @command(
+        name=name.Update('IT'),
+        meta=Meta(
+            title='update it',
+            domain=Domain(id='update', name='update')),
+        output=Output(
+            serializer=TestCommands.SimpleSerializer, etag=True),
+    )
+    def put(self, request):
+
+        raise self.event.Updated({'amount': request.amount})
+
+
+class ConditionalRequestsTestCase(TestCase):
+
+    @pytest.fixture(autouse=True)
+    def initfixtures(self, mocker):
+        self.mocker = mocker
+
+    def get_request(self, amount=12, version=None, if_none_match=None):
+        headers = {}
+        if if_none_match:
+            headers['HTTP_IF_NONE_MATCH'] = if_none_match
+
+        request = get_request(**headers)
+        request.amount = amount
+        request.version = version
+
+        return request
+
+    def test_content_etag(self):
+
+        c = ConditionalCommands()
+
+        response = c.get(self.get_request())
+
+        assert response.status_code == 200
+        assert to_json(response) == {
+            '@type': 'simple',
+            '@event': 'IT_READ',
+            'amount': 12,
+        }
+        etag = response['ETag']
+        assert re.match(r'^"\w{32}"$', etag)
+
+        # -- not modified
+        response = c.get(self.get_request(if_none_match=etag))
+
+        assert response.status_code == 304
+        assert response.content == b''
+        assert response['ETag'] == etag
+
+        # -- modified
+        response = c.get(self.get_request(amount=13, if_none_match=etag))
+
+        assert response.status_code == 200
+        assert response['ETag'] != etag
+
+    def test_version_etag(self):
+
+        c = ConditionalCommands()
+
+        response = c.post(self.get_request(version='2022-01-01T00:00:00'))
+
+        assert response.status_code == 200
+        assert to_json(response) == {
+            '@type': 'simple',
+            '@event': 'IT_READ',
+            'amount': 12,
+        }
+        etag = response['ETag']
+        assert re.match(r'^W/"\w{32}"$', etag)
+
+        # -- not modified, serializer is never called
+        serializer_init = self.mocker.spy(
+            TestCommands.SimpleSerializer, '__init__')
+
+        response = c.post(self.get_request(
+            version='2022-01-01T00:00:00',
+            if_none_match=f'"abc", {etag}'))
+
+        assert response.status_code == 304
+        assert response.content == b''
+        assert response['ETag'] == etag
+        assert serializer_init.call_count == 0
+
+        # -- modified
+        response = c.post(self.get_request(
+            version='2022-01-02T00:00:00', if_none_match=etag))
+
+        assert response.status_code == 200
+        assert response['ETag'] != etag
+
+    def test_if_none_match__any(self):
+
+        response = ConditionalCommands().get(
+            self.get_request(if_none_match='*'))
+
+        assert response.status_code == 304
+
+    def test_not_read_events_are_not_conditional(self):
+
+        response = ConditionalCommands().put(
+            self.get_request(if_none_match='*'))
+
+        assert response.status_code == 200
+        assert 'ETag' not in response
+
+
+class CachedCommands(HTTPCommands):
+
+    calls = []
+
+    @command(
+        name=name.Read('CATALOGUE_ITEM'),
+        meta=Meta(
+            title='read it',
+            domain=Domain(id='read', name='read')),
+        output=Output(serializer=TestCommands.SimpleSerializer, etag=True),
+        cache=CachePolicy(ttl=60, vary_on=['Accept-Language']),
+    )
+    def get(self, request, item_id):
+
+        self.calls.append(item_id)
+
+        raise self.event.Read({'amount': len(self.calls)})
+
+    @command(
+        name=name.Update('CATALOGUE_ITEM'),
+        meta=Meta(
+            title='update it',
+            domain=Domain(id='update', name='update')),
+        output=Output(serializer=TestCommands.SimpleSerializer),
+    )
+    def put(self, request, item_id):
+
+        raise self.event.Updated({'amount': 0})
+
+    @command(
+        name=name.BulkDelete('CATALOGUE_PAGE'),
+        meta=Meta(
+            title='delete them',
+            domain=Domain(id='delete', name='delete')),
+        output=Output(serializer=TestCommands.SimpleSerializer),
+    )
+    def delete(self, request, item_id):
+
+        raise self.event.BulkDeleted({'amount': 0})
+
+
+class ResponseCacheTestCase(TestCase):
+
+    @pytest.fixture(autouse=True)
+    def initfixtures(self, mocker):
+        self.mocker = mocker
+
+    def setUp(self):
+        get_response_cache.cache_clear()
+        CachedCommands.calls = []
+
+    def test_response_is_cached(self):
+
+        c = CachedCommands()
+
+        for _ in range(3):
+            response = c.get(get_request(), item_id=1)
+
+            assert response.status_code == 200
+            assert to_json(response) == {
+                '@type': 'simple',
+                '@event': 'CATALOGUE_ITEM_READ',
+                'amount': 1,
+            }
+
+        assert CachedCommands.calls == [1]
+
+    def test_response_is_cached__conditional_request(self):
+
+        c = CachedCommands()
+        etag = c.get(get_request(), item_id=1)['ETag']
+
+        response = c.get(
+            get_request(HTTP_IF_NONE_MATCH=etag), item_id=1)
+
+        assert response.status_code == 304
+        assert response['ETag'] == etag
+        assert CachedCommands.calls == [1]
+
+    def test_response_is_cached__key(self):
+
+        c = CachedCommands()
+
+        c.get(get_request(), item_id=1)
+        c.get(get_request(), item_id=2)
+        c.get(get_request(HTTP_ACCEPT_LANGUAGE='pl'), item_id=2)
+        c.get(RequestFactory().get('/it/', {'q': 'a'}), item_id=2)
+
+        assert CachedCommands.calls == [1, 2, 2, 2]
+
+        c.get(get_request(HTTP_ACCEPT_LANGUAGE='pl'), item_id=2)
+
+        assert CachedCommands.calls == [1, 2, 2, 2]
+
+    def test_response_is_cached__expired(self):
+
+        monotonic = self.mocker.patch('lily.base.cache.monotonic')
+        c = CachedCommands()
+
+        monotonic.return_value = 100
+        c.get(get_request(), item_id=1)
+
+        monotonic.return_value = 160
+        c.get(get_request(), item_id=1)
+
+        assert CachedCommands.calls == [1]
+
+        monotonic.return_value = 161
+        c.get(get_request(), item_id=1)
+
+        assert CachedCommands.calls == [1, 1]
+
+    def test_response_is_invalidated_by_write(self):
+
+        c = CachedCommands()
+
+        c.get(get_request(), item_id=1)
+
+        # -- write of other resource
+        response = c.delete(get_request('delete'), item_id=1)
+
+        assert response.status_code == 200
+
+        c.get(get_request(), item_id=1)
+
+        assert CachedCommands.calls == [1]
+
+        # -- write of the same resource
+        response = c.put(get_request('put'), item_id=2)
+
+        assert response.status_code == 200
+
+        c.get(get_request(), item_id=1)
+
+        assert CachedCommands.calls == [1, 1]
+
+    def test_only_read_commands_can_be_cached(self):
+
+        with pytest.raises(ImproperlyConfigured):
+            command(
+                name=name.Update('CATALOGUE_ITEM'),
+                meta=Meta(
+                    title='update it',
+                    domain=Domain(id='update', name='update')),
+                cache=CachePolicy(ttl=60),
+            )(lambda self, request: None)
+
+
+class CoalescedCommands(HTTPCommands):
+
+    calls = []
+
+    started = None
+
+    released = None
+
+    @command(
+        name=name.Read('CATALOGUE_ITEM'),
+        meta=Meta(
+            title='read it',
+            domain=Domain(id='read', name='read')),
+        output=Output(serializer=TestCommands.SimpleSerializer),
+        coalesce=True,
+    )
+    def get(self, request, item_id):
+
+        self.calls.append(item_id)
+        self.started.set()
+        self.released.wait(5)
+
+        if item_id < 0:
+            raise self.event.DoesNotExist('NOT_FOUND')
+
+        raise self.event.Read({'amount': item_id})
+
+
+class CoalescingTestCase(TestCase):
+
+    def setUp(self):
+        get_single_flight.cache_clear()
+        CoalescedCommands.calls = []
+        CoalescedCommands.started = threading.Event()
+        CoalescedCommands.released = threading.Event()
+
+    def execute_concurrently(self, item_ids):
+
+        responses = {}
+
+        def get(i, item_id):
+            responses[i] = CoalescedCommands().get(
+                get_request(), item_id=item_id)
+
+        # -- the first request is in flight when the others arrive
+        threads = [
+            threading.Thread(target=get, args=(i, item_id))
+            for i, item_id in enumerate(item_ids)
+        ]
+        threads[0].start()
+        CoalescedCommands.started.wait(5)
+        for thread in threads[1:]:
+            thread.start()
+
+        time.sleep(0.1)
+        CoalescedCommands.released.set()
+        for thread in threads:
+            thread.join()
+
+        return [responses[i] for i in range(len(item_ids))]
+
+    def test_identical_requests_are_coalesced(self):
+
+        responses = self.execute_concurrently([1, 1, 1, 2])
+
+        assert CoalescedCommands.calls == [1, 2]
+        assert [r.status_code for r in responses] == [200, 200, 200, 200]
+        assert [to_json(r)['amount'] for r in responses] == [1, 1, 1, 2]
+
+    def test_errors_are_not_shared(self):
+
+        responses = self.execute_concurrently([-1, -1, -1])
+
+        assert CoalescedCommands.calls == [-1, -1, -1]
+        assert [r.status_code for r in responses] == [404, 404, 404]
+
+    def test_only_sync_read_commands_can_be_coalesced(self):
+
+        meta = Meta(title='do it', domain=Domain(id='do', name='do'))
+
+        with pytest.raises(ImproperlyConfigured):
+            command(
+                name=name.Update('CATALOGUE_ITEM'),
+                meta=meta,
+                coalesce=True,
+            )(lambda self, request: None)
+
+        async def get(self, request):
+            pass
+
+        with pytest.raises(ImproperlyConfigured):
+            command(
+                name=name.Read('CATALOGUE_ITEM'),
+                meta=meta,
+                coalesce=True,
+            )(get)
+
+
+class AdmissionControlTestCase(TestCase):
+
+    @pytest.fixture(autouse=True)
+    def initfixtures(self, mocker):
+        self.mocker = mocker
+
+    def get_commands_class(self, handler, **limits):
+
+        class BodyParser(parsers.Parser):
+
+            amount = parsers.IntegerField()
+
+        class LimitedCommands(HTTPCommands):
+
+            @command(
+                name=name.Read('IT'),
+                meta=Meta(
+                    title='read it',
+                    domain=Domain(id='read', name='read')),
+                access=Access(access_list=['PREMIUM']),
+                input=Input(body_parser=BodyParser),
+                output=Output(serializer=TestCommands.SimpleSerializer),
+                **limits,
+            )
+            def post(self, request):
+                return handler(self, request)
+
+        return LimitedCommands
+
+    def read(self, c, request):
+        raise c.event.Read({'amount': request.input.body['amount']})
+
+    def test_rate_limit(self):
+
+        monotonic = self.mocker.patch('lily.base.limits.monotonic')
+        monotonic.return_value = 100
+        authorize = self.mocker.spy(BaseAuthorizer, 'authorize')
+        parse = self.mocker.spy(Input, 'parse')
+        c = self.get_commands_class(
+            self.read, rate_limit=RateLimit(rate=2, per=10))()
+
+        responses = [c.post(get_premium_request(12)) for _ in range(3)]
+
+        assert [r.status_code for r in responses] == [200, 200, 429]
+        assert to_json(responses[2]) == {
+            '@type': 'error',
+            '@event': 'RATE_LIMIT_EXCEEDED',
+        }
+        assert responses[2]['Retry-After'] == '5'
+
+        # -- rejected request is neither authorized nor parsed
+        assert authorize.call_count == 2
+        assert parse.call_count == 2
+
+        # -- tokens are refilled
+        monotonic.return_value = 105
+
+        assert c.post(get_premium_request(12)).status_code == 200
+
+    def test_concurrency_limit(self):
+
+        started, released = threading.Event(), threading.Event()
+
+        def read(c, request):
+            started.set()
+            released.wait(5)
+
+            return self.read(c, request)
+
+        c = self.get_commands_class(read, concurrency_limit=1)()
+        responses = []
+        thread = threading.Thread(
+            target=lambda: responses.append(c.post(get_premium_request(12))))
+        thread.start()
+        started.wait(5)
+
+        rejected = c.post(get_premium_request(12))
+
+        released.set()
+        thread.join()
+
+        assert rejected.status_code == 429
+        assert to_json(rejected)['@event'] == 'CONCURRENCY_LIMIT_EXCEEDED'
+        assert responses[0].status_code == 200
+
+        # -- slot is released
+        assert c.post(get_premium_request(12)).status_code == 200
+
+    def test_concurrency_limit__released_after_error(self):
+
+        def fail(c, request):
+            raise c.event.DoesNotExist('NOT_FOUND')
+
+        c = self.get_commands_class(fail, concurrency_limit=1)()
+
+        assert c.post(get_premium_request(12)).status_code == 404
+        assert c.post(get_premium_request(12)).status_code == 404
+
+    def test_limits__async(self):
+
+        class LimitedCommands(HTTPCommands):
+
+            @command(
+                name=name.Read('IT'),
+                meta=Meta(
+                    title='read it',
+                    domain=Domain(id='read', name='read')),
+                output=Output(serializer=TestCommands.SimpleSerializer),
+                rate_limit=RateLimit(rate=1, per=60),
+                concurrency_limit=1,
+            )
+            async def get(self, request):
+                await asyncio.sleep(0)
+
+                raise self.event.Read({'amount': 1})
+
+        c = LimitedCommands()
+
+        async def read():
+            return [
+                await c.get(get_request()) for _ in range(2)]
+
+        responses = asyncio.run(read())
+
+        assert [r.status_code for r in responses] == [200, 429]
+
+
+class ReadReplicaTestCase(TestCase):
+
+    @pytest.fixture(autouse=True)
+    def initfixtures(self, mocker):
+        self.mocker = mocker
+
+    def setUp(self):
+        caches['default'].clear()
+
+    def get_commands_class(self, **read_conf):
+
+        class ReplicaCommands(HTTPCommands):
+
+            databases = []
+
+            @command(
+                name=name.Read('IT'),
+                meta=Meta(
+                    title='read it',
+                    domain=Domain(id='read', name='read')),
+                **read_conf,
+            )
+            def get(self, request):
+
+                self.databases.append(get_context().database)
+
+                raise self.event.Read({})
+
+            @command(
+                name=name.Update('IT'),
+                meta=Meta(
+                    title='update it',
+                    domain=Domain(id='update', name='update')),
+            )
+            def put(self, request):
+
+                self.databases.append(get_context().database)
+
+                raise self.event.Updated({})
+
+        return ReplicaCommands
+
+    @override_settings(LILY_READ_REPLICA_DATABASE='replica')
+    def test_reads_are_routed_to_replica(self):
+
+        c = self.get_commands_class()()
+
+        c.get(get_request(HTTP_X_CS_CORRELATION_ID='abc'))
+        c.put(get_request('put', HTTP_X_CS_CORRELATION_ID='abc'))
+
+        assert c.databases == ['replica', None]
+
+    @override_settings(LILY_READ_REPLICA_DATABASE='replica')
+    def test_reads_are_routed_to_replica__override(self):
+
+        databases = []
+        for read_conf in [
+                {'is_atomic': 'default'},
+                {'replica': False},
+                {'replica': 'other'}]:
+
+            c = self.get_commands_class(**read_conf)()
+            c.get(get_request(HTTP_X_CS_CORRELATION_ID='abc'))
+            databases.extend(c.databases)
+
+        assert databases == [None, None, 'other']
+
+    @override_settings(LILY_READ_REPLICA_DATABASE=None)
+    def test_reads_are_routed_to_replica__disabled(self):
+
+        c = self.get_commands_class()()
+
+        c.get(get_request(HTTP_X_CS_CORRELATION_ID='abc'))
+
+        assert c.databases == [None]
+
+    @override_settings(
+        LILY_READ_REPLICA_DATABASE='replica',
+        LILY_READ_REPLICA_STICKINESS=10)
+    def test_read_your_writes(self):
+
+        c = self.get_commands_class()()
+
+        c.put(get_request('put', HTTP_X_CS_CORRELATION_ID='abc'))
+        c.get(get_request(HTTP_X_CS_CORRELATION_ID='abc'))
+        c.get(get_request(HTTP_X_CS_CORRELATION_ID='def'))
+
+        assert c.databases == [None, None, 'replica']
+
+    @override_settings(
+        LILY_READ_REPLICA_DATABASE='replica',
+        LILY_READ_REPLICA_STICKINESS=10)
+    def test_read_your_writes__not_correlated(self):
+
+        is_sticky = self.mocker.patch('lily.base.command.is_sticky')
+        make_sticky = self.mocker.patch('lily.base.command.make_sticky')
+        c = self.get_commands_class()()
+
+        c.put(get_request('put'))
+        c.get(get_request())
+
+        assert c.databases == [None, 'replica']
+        assert is_sticky.call_count == 0
+        assert make_sticky.call_count == 0
+
+    @override_settings(LILY_READ_REPLICA_DATABASE='replica')
+    def test_reads_are_routed_to_replica__async_cached(self):
+
+        get_response_cache.cache_clear()
+        databases = []
+
+        class AsyncReplicaCommands(HTTPCommands):
+
+            @command(
+                name=name.Read('IT'),
+                meta=Meta(
+                    title='read it',
+                    domain=Domain(id='read', name='read')),
+                cache=CachePolicy(ttl=60),
+            )
+            async def get(self, request):
+
+                databases.append(get_context().database)
+
+                raise self.event.Read({})
+
+        for _ in range(3):
+            response = asyncio.run(AsyncReplicaCommands().get(
+                get_request(HTTP_X_CS_CORRELATION_ID='abc')))
+
+            assert response.status_code == 200
+
+        assert databases == ['replica']
+
+    @override_settings(LILY_READ_REPLICA_DATABASE='replica')
+    def test_reads_are_routed_to_replica__streamed_rows(self):
+
+        databases = []
+
+        def items():
+            for i in range(3):
+                databases.append(get_context().database)
+                yield {'id': i}
+
+        class StreamedReplicaCommands(HTTPCommands):
+
+            @command(
+                name=name.BulkRead('item'),
+                meta=Meta(
+                    title='bulk read items',
+                    domain=Domain(id='read', name='read')),
+                output=Output(
+                    serializer=ItemsSerializer,
+                    stream_field='items',
+                    chunk_size=2),
+            )
+            def get(self, request):
+
+                raise self.event.BulkRead({'items': items()})
+
+        response = StreamedReplicaCommands().get(
+            get_request(HTTP_X_CS_CORRELATION_ID='abc'))
+        b''.join(response.streaming_content)
+
+        assert databases == ['replica', 'replica', 'replica']
+        assert get_context() is None
+
+
+class QueryBudgetTestCase(TestCase):
+
+    @pytest.fixture(autouse=True)
+    def initfixtures(self, mocker):
+        self.mocker = mocker
+
+    def setUp(self):
+        registry.reset()
+
+    def get_commands_class(self, queries_count, max_queries=2):
+
+        class BudgetCommands(HTTPCommands):
+
+            @command(
+                name=name.BulkRead('USER'),
+                meta=Meta(
+                    title='read them',
+                    domain=Domain(id='read', name='read')),
+                max_queries=max_queries,
+            )
+            def get(self, request):
+
+                for _ in range(queries_count):
+                    list(User.objects.all())
+
+                raise self.event.BulkRead({})
+
+        return BudgetCommands
+
+    def test_queries_are_counted(self):
+
+        warning = self.mocker.patch.object(EventFactory, 'Warning')
+
+        response = self.get_commands_class(2)().get(
+            get_request(path='/users/'))
+
+        assert response.status_code == 200
+        metrics = registry.snapshot()['BULK_READ_USERS']
+        assert metrics['queries']['count'] == 1
+        assert metrics['queries']['sum'] == 2
+        assert metrics['db']['count'] == 1
+        assert metrics['db']['sum'] > 0
+        assert warning.call_count == 0
+
+    def test_queries_are_counted__budget_exceeded(self):
+
+        warning = self.mocker.patch.object(EventFactory, 'Warning')
+        request = get_request(path='/users/')
+
+        response = self.get_commands_class(3)().get(request)
+
+        assert response.status_code == 200
+        assert registry.snapshot()['BULK_READ_USERS']['queries']['sum'] == 3
+        assert warning.call_args_list == [
+            call(
+                'QUERY_BUDGET_EXCEEDED',
+                context=request,
+                data={
+                    'command_name': 'BULK_READ_USERS',
+                    'max_queries': 2,
+                    'queries': 3,
+                }),
+        ]
+
+    @override_settings(LILY_QUERY_BUDGET_SAMPLE_RATE=0)
+    def test_queries_are_counted__not_sampled(self):
+
+        warning = self.mocker.patch.object(EventFactory, 'Warning')
+
+        self.get_commands_class(3)().get(get_request(path='/users/'))
+
+        assert registry.snapshot() == {}
+        assert warning.call_count == 0
+
+    def test_queries_are_counted__streamed_rows(self):
+
+        warning = self.mocker.patch.object(EventFactory, 'Warning')
+
+        class StreamedBudgetCommands(HTTPCommands):
+
+            @command(
+                name=name.BulkRead('USER'),
+                meta=Meta(
+                    title='read them',
+                    domain=Domain(id='read', name='read')),
+                output=Output(
+                    serializer=ItemsSerializer, stream_field='items'),
+                max_queries=0,
+            )
+            def get(self, request):
+
+                raise self.event.BulkRead({'items': User.objects.all()})
+
+        response = StreamedBudgetCommands().get(
+            get_request(path='/users/'))
+
+        assert registry.snapshot() == {}
+
+        b''.join(response.streaming_content)
+
+        assert registry.snapshot()['BULK_READ_USERS']['queries']['sum'] == 1
+        assert warning.call_count == 1
+
+    def test_max_queries__async_command_is_rejected(self):
+
+        async def get(self, request):
+            pass
+
+        with pytest.raises(ImproperlyConfigured):
+            command(
+                name=name.Read('IT'),
+                meta=Meta(
+                    title='read it',
+                    domain=Domain(id='read', name='read')),
+                max_queries=1,
+            )(get)
+
+
+class CompressionTestCase(TestCase):
+
+    def get_commands_class(self):
+
+        class NamesSerializer(serializers.Serializer):
+
+            _type = 'names'
+
+            names = serializers.ListField(child=serializers.CharField())
+
+        class CompressedCommands(HTTPCommands):
+
+            @command(
+                name=name.BulkRead('USER'),
+                meta=Meta(
+                    title='read them',
+                    domain=Domain(id='read', name='read')),
+                output=Output(serializer=NamesSerializer),
+            )
+            def get(self, request):
+
+                raise self.event.BulkRead({'names': ['hi there'] * 200})
+
+        return CompressedCommands
+
+    @override_settings(
+        LILY_COMPRESSION_ENCODINGS=('gzip',),
+        LILY_COMPRESSION_MIN_SIZE=100)
+    def test_response_is_compressed(self):
+
+        response = self.get_commands_class()().get(
+            get_request(path='/users/', HTTP_ACCEPT_ENCODING='gzip'))
+
+        assert response.status_code == 200
+        assert response['Content-Encoding'] == 'gzip'
+        assert json.loads(gzip.decompress(response.content))['names'] == (
+            ['hi there'] * 200)
+
+    @override_settings(
+        LILY_COMPRESSION_ENCODINGS=('gzip',),
+        LILY_COMPRESSION_MIN_SIZE=100)
+    def test_response_is_compressed__not_accepted(self):
+
+        response = self.get_commands_class()().get(
+            get_request(path='/users/'))
+
+        assert response.status_code == 200
+        assert not response.has_header('Content-Encoding')
+        assert to_json(response)['names'] == ['hi there'] * 200
+
+    def test_response_is_compressed__disabled_by_default(self):
+
+        response = self.get_commands_class()().get(
+            get_request(path='/users/', HTTP_ACCEPT_ENCODING='gzip'))
+
+        assert response.status_code == 200
+        assert not response.has_header('Content-Encoding')
@@ -0,0 +1,166 @@
+
+import gzip
+from unittest.mock import Mock
+
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase
+import pytest
+
+from lily.base import compression
+from lily.base.compression import (
+    GzipCodec,
+    ResponseCompressor,
+    parse_accept_encoding,
+)
+from lily.base.events import Json200
+
+
+class ParseAcceptEncodingTestCase(TestCase):
+
+    def test_parse_accept_encoding(self):
+
+        assert parse_accept_encoding('') == {}
+        assert parse_accept_encoding('gzip, br') == {'gzip': 1.0, 'br': 1.0}
+        assert parse_accept_encoding('GZIP;q=0.5, br;q=0, *;q=x') == {
+            'gzip': 0.5,
+            'br': 0.0,
+            '*': 0.0,
+        }
+
+
+class ResponseCompressorTestCase(TestCase):
+
+    @pytest.fixture(autouse=True)
+    def initfixtures(self, mocker):
+        self.mocker = mocker
+
+    def setUp(self):
+        self.data = {'items': [{'id': i, 'name': 'hi'} for i in range(100)]}
+
+    def get_compressor(self, encodings=('zstd', 'br', 'gzip'), **kwargs):
+        return ResponseCompressor(
+            encodings,
+            {'zstd': 3, 'br': 4, 'gzip': 6},
+            kwargs.pop('min_size', 100),
+            **kwargs)
+
+    def compress(self, compressor, accept_encoding, response=None):
+        request = RequestFactory().get(
+            '/', HTTP_ACCEPT_ENCODING=accept_encoding)
+
+        return compressor.compress(request, response or Json200(self.data))
+
+    def test_negotiate(self):
+
+        # -- optional packages are not needed for the negotiation itself
+        self.mocker.patch.object(compression, 'zstandard', Mock())
+        self.mocker.patch.object(compression, 'brotli', Mock())
+        compressor = self.get_compressor()
+
+        assert compressor.negotiate('') is None
+        assert compressor.negotiate('deflate') is None
+        assert compressor.negotiate('gzip').encoding == 'gzip'
+        assert compressor.negotiate('gzip, br, zstd').encoding == 'zstd'
+        assert compressor.negotiate('gzip, br;q=0.9').encoding == 'gzip'
+        assert compressor.negotiate('*').encoding == 'zstd'
+        assert compressor.negotiate('*, zstd;q=0').encoding == 'br'
+
+    def test_negotiate__codec_not_available(self):
+
+        self.mocker.patch.object(compression, 'zstandard', None)
+        self.mocker.patch.object(compression, 'brotli', Mock())
+
+        compressor = self.get_compressor()
+
+        assert [c.encoding for c in compressor.codecs] == ['br', 'gzip']
+
+    def test_compress(self):
+
+        response = self.compress(self.get_compressor(), 'gzip, deflate')
+
+        assert response['Content-Encoding'] == 'gzip'
+        assert response['Content-Length'] == str(len(response.content))
+        assert response['Vary'] == 'Accept-Encoding'
+        assert gzip.decompress(response.content) == Json200(self.data).content
+
+    def test_compress__brotli(self):
+
+        if compression.brotli is None:
+            pytest.skip('optional package')
+
+        response = self.compress(self.get_compressor(), 'br, gzip')
+
+        assert response['Content-Encoding'] == 'br'
+        assert compression.brotli.decompress(response.content) == (
+            Json200(self.data).content)
+
+    def test_compress__zstd(self):
+
+        zstandard = pytest.importorskip('zstandard', reason='optional package')
+
+        response = self.compress(self.get_compressor(), 'zstd, gzip')
+
+        assert response['Content-Encoding'] == 'zstd'
+        assert zstandard.ZstdDecompressor().decompress(response.content) == (
+            Json200(self.data).content)
+
+    def test_compress__compressor_is_reused(self):
+
+        codec = GzipCodec(6)
+
+        assert (
+            gzip.decompress(codec.compress(b'abc')) +
+            gzip.decompress(codec.compress(b'def'))) == b'abcdef'
+
+    def test_compress__not_accepted(self):
+
+        response = self.compress(self.get_compressor(), 'deflate')
+
+        assert not response.has_header('Content-Encoding')
+        assert response['Vary'] == 'Accept-Encoding'
+        assert response.content == Json200(self.data).content
+
+    def test_compress__too_small(self):
+
+        response = self.compress(
+            self.get_compressor(min_size=10 ** 6), 'gzip')
+
+        assert not response.has_header('Content-Encoding')
+        assert not response.has_header('Vary')
+
+    def test_compress__already_encoded(self):
+
+        response = HttpResponse(b'a' * 1000)
+        response['Content-Encoding'] = 'identity'
+
+        response = self.compress(self.get_compressor(), 'gzip', response)
+
+        assert response['Content-Encoding'] == 'identity'
+        assert response.content == b'a' * 1000
+
+    def test_compress__strong_etag_is_weakened(self):
+
+        response = Json200(self.data)
+        response['ETag'] = '"abc"'
+
+        response = self.compress(self.get_compressor(), 'gzip', response)
+
+        assert response['ETag'] == 'W/"abc"'
+
+    def test_compress__cached(self):
+
+        compressor = self.get_compressor(('gzip',), cache_max_size=1)
+        compress = self.mocker.spy(compressor.codecs[0], 'compress')
+
+        first = self.compress(compressor, 'gzip')
+        second = self.compress(compressor, 'gzip')
+
+        assert compress.call_count == 1
+        assert first.content == second.content
+
+        # -- the least recently used content is evicted
+        self.data['items'].pop()
+        self.compress(compressor, 'gzip')
+
+        assert len(compressor.cache) == 1
+        assert compress.call_count == 2
@@ -0,0 +1,80 @@
+import asyncio
+from unittest.mock import Mock
+import threading
+
+from django.test import TestCase
+
+from lily.base.context import Context, current_context, get_context
+
+
+class ContextTestCase(TestCase):
+
+    def test_correlation_id__from_header(self):
+
+        context = Context(
+            command_name='READ_IT',
+            request=Mock(META={'HTTP_X_CS_CORRELATION_ID': 'abc'}))
+
+        assert context.command_name == 'READ_IT'
+        assert context.correlation_id == 'abc'
+
+    def test_correlation_id__generated(self):
+
+        context = Context(command_name='READ_IT', request=Mock(META={}))
+
+        assert context.command_name == 'READ_IT'
+        assert len(context.correlation_id) == 36
+
+
+class GetContextTestCase(TestCase):
+
+    def test_no_context(self):
+
+        assert get_context() is None
+
+    def test_context(self):
+
+        context = Context(command_name='READ_IT', request=Mock(META={}))
+        token = current_context.set(context)
+
+        try:
+            assert get_context() is context
+
+        finally:
+            current_context.reset(token)
+
+        assert get_context() is None
+
+    def test_context__not_visible_in_other_threads(self):
+
+        context = Context(command_name='READ_IT', request=Mock(META={}))
+        token = current_context.set(context)
+        found = []
+
+        try:
+            thread = threading.Thread(target=lambda: found.append(
+                get_context()))
+            thread.start()
+            thread.join()
+
+        finally:
+            current_context.reset(token)
+
+        assert found == [None]
+
+    def test_context__isolated_between_async_tasks(self):
+
+        async def run(command_name):
+            current_context.set(
+                Context(command_name=command_name, request=Mock(META={})))
+            await asyncio.sleep(0.01)
+
+            return get_context().command_name
+
+        async def run_all():
+            return await asyncio.gather(*[
+                run(command_name)
+                for command_name in ['A', 'B', 'C']
+            ])
+
+        assert asyncio.run(run_all()) == ['A', 'B', 'C']
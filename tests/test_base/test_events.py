@@ -1,10 +1,19 @@
 
+from dataclasses import dataclass
+from datetime import datetime
+from decimal import Decimal
+from uuid import UUID
+
 from django.test import TestCase
 from django.http import HttpResponse
+import orjson
 import pytest
 from unittest.mock import Mock, call
 
-from lily.base.events import EventFactory
+from lily.base.context import Context
+from lily.base.events import EventFactory, Json200, render_json
+from lily.base.log import EventMessage
+from lily.base.test import override_settings
 
 
 class GenericExceptionTestCase(TestCase):
@@ -45,6 +54,81 @@ class GenericExceptionTestCase(TestCase):
         assert response.content == b'{"hello":"there"}'
 
 
+class RenderJsonTestCase(TestCase):
+
+    @pytest.fixture(autouse=True)
+    def initfixtures(self, mocker):
+        self.mocker = mocker
+
+    def test_render_json(self):
+
+        assert render_json({'a': 1}) == b'{"a":1}'
+        assert render_json(None) == b'null'
+
+    def test_render_json__envelope(self):
+
+        data = {'a': 1}
+
+        assert render_json(data, {'@event': 'HI'}) == (
+            b'{"a":1,"@event":"HI"}')
+        assert data == {'a': 1}
+        assert render_json({}, {'@event': 'HI'}) == b'{"@event":"HI"}'
+        assert render_json(None, {'@event': 'HI'}) == b'{"@event":"HI"}'
+
+    def test_render_json__envelope_overrides_data(self):
+
+        assert render_json({'@event': 'X', 'a': 1}, {'@event': 'HI'}) == (
+            b'{"@event":"HI","a":1}')
+
+    def test_render_json__envelope_of_not_object(self):
+
+        with pytest.raises(TypeError):
+            render_json([1, 2], {'@event': 'HI'})
+
+        assert render_json([1, 2]) == b'[1,2]'
+
+    def test_render_json__data_is_encoded_once(self):
+
+        dumps = self.mocker.spy(orjson, 'dumps')
+
+        render_json({'a': 1}, {'@event': 'HI'})
+        render_json({'@event': 'X'}, {'@event': 'HI'})
+
+        assert [c[0][0] for c in dumps.call_args_list] == [
+            {'@event': 'HI'}, {'a': 1}, {'@event': 'HI'}]
+
+    def test_render_json__native_types(self):
+
+        @dataclass
+        class Point:
+            x: int
+
+        assert render_json({
+            'at': datetime(2020, 1, 2, 3, 4, 5),
+            'id': UUID('2b8e6c4c-2f36-4a0c-9b5e-0f5c4d9f0a11'),
+            'price': Decimal('1.50'),
+            'point': Point(1),
+            3: 'three',
+        }) == (
+            b'{"at":"2020-01-02T03:04:05",'
+            b'"id":"2b8e6c4c-2f36-4a0c-9b5e-0f5c4d9f0a11",'
+            b'"price":"1.50","point":{"x":1},"3":"three"}')
+
+    def test_response__no_data(self):
+
+        assert Json200().content == b'{}'
+        assert Json200(None).content == b'{}'
+        assert Json200(envelope={'@event': 'HI'}).content == (
+            b'{"@event":"HI"}')
+
+    def test_response__data_is_not_retained(self):
+
+        response = Json200({'a': 1}, envelope={'@event': 'HI'})
+
+        assert response.content == b'{"a":1,"@event":"HI"}'
+        assert not hasattr(response, 'data')
+
+
 class ContextTestCase(TestCase):
 
     def test_constructor(self):
@@ -92,32 +176,159 @@ class BaseSuccessExceptionTestCase(TestCase):
 
     def test_log__user_id_in_context(self):
 
-        dumps = self.mocker.patch('lily.base.events.orjson.dumps')
-        dumps.return_value = '{XX}'
         e = EventFactory.BaseSuccessException(
             context=Mock(log_authorizer={'user_id': 12}), event='HELLO')
         logger = self.mocker.patch.object(e, 'logger')
 
         e.log()
 
-        assert logger.info.call_args_list == [call('HELLO: {XX}')]
-        assert dumps.call_args_list == [
-            call({'@authorizer': {'user_id': 12}, '@event': 'HELLO'}, option=4)
-        ]
+        message = logger.info.call_args[0][0]
+        assert isinstance(message, EventMessage)
+        assert message.event == 'HELLO'
+        assert message.data == {
+            '@authorizer': {'user_id': 12},
+            '@event': 'HELLO',
+        }
+        assert str(message) == (
+            'HELLO: {"@event":"HELLO","@authorizer":{"user_id":12}}')
 
     def test_log__no_user_id_in_context(self):
 
-        dumps = self.mocker.patch('lily.base.events.orjson.dumps')
-        dumps.return_value = '{XX}'
-        logger = Mock()
         e = EventFactory.BaseSuccessException(
             context=EventFactory.Context(), event='HELLO')
         logger = self.mocker.patch.object(e, 'logger')
 
         e.log()
 
-        assert logger.info.call_args_list == [call('HELLO: {XX}')]
-        assert dumps.call_args_list == [call({'@event': 'HELLO'}, option=4)]
+        message = logger.info.call_args[0][0]
+        assert str(message) == 'HELLO: {"@event":"HELLO"}'
+
+    def test_log__level_disabled(self):
+
+        dumps = self.mocker.patch('lily.base.log.orjson.dumps')
+        e = EventFactory.BaseSuccessException(event='HELLO')
+        logger = self.mocker.patch.object(e, 'logger')
+        logger.isEnabledFor.return_value = False
+
+        e.log()
+
+        assert logger.info.call_count == 0
+        assert dumps.call_count == 0
+
+    def test_log__aggregated(self):
+
+        aggregator = Mock()
+        self.mocker.patch(
+            'lily.base.events.get_success_events_aggregator',
+            return_value=aggregator)
+        request = Mock(_lily_context=Context('READ_IT', Mock(META={})))
+        e = EventFactory.Read(context=request, event='HELLO')
+        logger = self.mocker.patch.object(e, 'logger')
+
+        with override_settings(LILY_SUCCESS_EVENTS_AGGREGATION_INTERVAL=10):
+            e.log()
+
+        assert logger.info.call_count == 0
+        (event, status_code, latency), _ = aggregator.record.call_args
+        assert event == 'HELLO'
+        assert status_code == 200
+        assert latency > 0
+
+
+class BaseErrorExceptionTestCase(TestCase):
+
+    @pytest.fixture(autouse=True)
+    def initfixtures(self, mocker):
+        self.mocker = mocker
+
+    def test_log__lazy(self):
+
+        dumps = self.mocker.patch('lily.base.log.orjson.dumps')
+        logger = self.mocker.patch('lily.base.events.logging.getLogger')
+
+        EventFactory.BrokenRequest('HELLO', data={'a': 1})
+
+        message = logger.return_value.info.call_args[0][0]
+        assert isinstance(message, EventMessage)
+        assert dumps.call_count == 0
+
+    def test_log__critical(self):
+
+        logger = self.mocker.patch('lily.base.events.logging.getLogger')
+        context = EventFactory.Context(user_id=12)
+
+        EventFactory.ServerError('HELLO', context=context, is_critical=True)
+
+        assert logger.return_value.info.call_count == 0
+        assert logger.return_value.error.call_args[1] == {
+            'exc_info': True,
+            'extra': {'data': {'user_id': 12}},
+        }
+
+    def test_log__critical__throttled(self):
+
+        logger = self.mocker.patch('lily.base.events.logging.getLogger')
+        throttle = self.mocker.patch(
+            'lily.base.events.get_critical_events_throttle')
+        throttle.return_value.acquire.side_effect = [True, False]
+
+        with override_settings(LILY_CRITICAL_EVENTS_LOG_LIMIT=1):
+            EventFactory.ServerError('HELLO', is_critical=True)
+            EventFactory.ServerError('HELLO', is_critical=True)
+
+        assert throttle.call_args_list == [call(1, 60), call(1, 60)]
+        assert logger.return_value.error.call_count == 1
+
+
+class SendToSinkTestCase(TestCase):
+
+    @pytest.fixture(autouse=True)
+    def initfixtures(self, mocker):
+        self.mocker = mocker
+
+    def test_send_to_sink(self):
+
+        get_event_sink = self.mocker.patch(
+            'lily.base.events.get_event_sink')
+        self.mocker.patch('lily.base.events.logging.getLogger')
+        request = Mock(
+            _lily_context=Context('READ_IT', Mock(META={})),
+            log_authorizer={})
+        request._lily_context.correlation_id = 'abc'
+
+        with override_settings(LILY_EVENT_SINK_CLASS='some.Sink'):
+            EventFactory.Read(context=request, event='IT_READ').log()
+            EventFactory.BrokenRequest('IT_BROKEN', context=request)
+
+        assert get_event_sink.call_args_list == [
+            call('some.Sink'), call('some.Sink')]
+        assert get_event_sink.return_value.send.call_args_list == [
+            call({
+                'event': 'IT_READ',
+                'type': 'success',
+                'status_code': 200,
+                'command_name': 'READ_IT',
+                'correlation_id': 'abc',
+                'data': {'@event': 'IT_READ'},
+            }),
+            call({
+                'event': 'IT_BROKEN',
+                'type': 'error',
+                'status_code': 400,
+                'command_name': 'READ_IT',
+                'correlation_id': 'abc',
+                'data': {'@type': 'error', '@event': 'IT_BROKEN'},
+            }),
+        ]
+
+    def test_send_to_sink__disabled(self):
+
+        get_event_sink = self.mocker.patch(
+            'lily.base.events.get_event_sink')
+
+        EventFactory.Read(event='IT_READ').log()
+
+        assert get_event_sink.call_count == 0
 
 
 @pytest.mark.parametrize(
@@ -146,6 +357,7 @@ class BaseSuccessExceptionTestCase(TestCase):
         (EventFactory.AccessDenied, 403),
         (EventFactory.DoesNotExist, 404),
         (EventFactory.Conflict, 409),
+        (EventFactory.TooManyRequests, 429),
         (EventFactory.ServerError, 500),
     ])
 def test_response_classes(exception, expected_status_code):
@@ -0,0 +1,78 @@
+
+from django.test import TestCase
+import pytest
+
+from lily.base.limits import (
+    ConcurrencyLimiter,
+    LocalRateLimiter,
+    RateLimit,
+    get_rate_limiter,
+)
+from lily.base.test import override_settings
+
+
+class RateLimitTestCase(TestCase):
+
+    def test_defaults(self):
+
+        rate_limit = RateLimit(rate=10)
+
+        assert rate_limit.per == 1
+        assert rate_limit.burst == 10
+        assert rate_limit.retry_after == 1
+
+    def test_retry_after(self):
+
+        assert RateLimit(rate=1, per=60).retry_after == 60
+        assert RateLimit(rate=7, per=60).retry_after == 9
+
+
+class LocalRateLimiterTestCase(TestCase):
+
+    @pytest.fixture(autouse=True)
+    def initfixtures(self, mocker):
+        self.mocker = mocker
+
+    def test_acquire(self):
+
+        monotonic = self.mocker.patch('lily.base.limits.monotonic')
+        monotonic.return_value = 100
+        limiter = LocalRateLimiter('READ_IT', RateLimit(rate=2, burst=3))
+
+        # -- burst
+        assert [limiter.acquire() for _ in range(4)] == [
+            True, True, True, False]
+
+        # -- refill
+        monotonic.return_value = 100.5
+        assert [limiter.acquire() for _ in range(2)] == [True, False]
+
+        # -- refill is capped by the burst
+        monotonic.return_value = 200
+        assert [limiter.acquire() for _ in range(4)] == [
+            True, True, True, False]
+
+    @override_settings(
+        LILY_RATE_LIMITER_CLASS='lily.base.limits.LocalRateLimiter')
+    def test_get_rate_limiter(self):
+
+        limiter = get_rate_limiter('READ_IT', RateLimit(rate=2))
+
+        assert isinstance(limiter, LocalRateLimiter)
+        assert limiter.key == 'READ_IT'
+
+
+class ConcurrencyLimiterTestCase(TestCase):
+
+    def test_acquire_release(self):
+
+        limiter = ConcurrencyLimiter(2)
+
+        assert limiter.acquire() is True
+        assert limiter.acquire() is True
+        assert limiter.acquire() is False
+
+        limiter.release()
+
+        assert limiter.acquire() is True
+        assert limiter.in_flight == 2
@@ -0,0 +1,181 @@
+
+import logging
+import queue
+from unittest.mock import Mock
+
+from django.test import TestCase
+import pytest
+
+from lily.base.log import (
+    CriticalEventsThrottle,
+    EventMessage,
+    EventQueueHandler,
+    SuccessEventsAggregator,
+    start_queue_listener,
+)
+
+
+class EventMessageTestCase(TestCase):
+
+    def test_str(self):
+
+        data = {'a': 1}
+        message = EventMessage('HELLO', data)
+        data['b'] = 2
+
+        assert str(message) == 'HELLO: {"a":1,"b":2}'
+        # -- rendered only once
+        data['c'] = 3
+        assert str(message) == 'HELLO: {"a":1,"b":2}'
+
+    def test_str__not_serializable(self):
+
+        assert str(EventMessage('HELLO', {'a': {1}})) == (
+            "HELLO: {\"a\":\"{1}\"}")
+
+
+class EventQueueHandlerTestCase(TestCase):
+
+    def test_emit__record_is_not_formatted(self):
+
+        records = queue.Queue()
+        message = EventMessage('HELLO', {})
+        handler = EventQueueHandler(records)
+
+        handler.emit(logging.makeLogRecord({'msg': message}))
+
+        assert records.get_nowait().msg is message
+        assert message.rendered is None
+
+    def test_emit__queue_is_full(self):
+
+        handler = EventQueueHandler(queue.Queue(1))
+
+        handler.emit(logging.makeLogRecord({'msg': 'a'}))
+        handler.emit(logging.makeLogRecord({'msg': 'b'}))
+
+        assert handler.queue.qsize() == 1
+        assert handler.dropped == 1
+
+
+class StartQueueListenerTestCase(TestCase):
+
+    def test_start_queue_listener(self):
+
+        logger = logging.getLogger('lily.test.queue')
+        logger.propagate = False
+        logger.setLevel(logging.INFO)
+        emitted = []
+
+        class Handler(logging.Handler):
+
+            def emit(self, record):
+                emitted.append(self.format(record))
+
+        logger.addHandler(Handler())
+
+        listener = start_queue_listener(logger)
+        try:
+            logger.info(EventMessage('HELLO', {'a': 1}))
+
+        finally:
+            listener.stop()
+            logger.handlers = []
+
+        assert emitted == ['HELLO: {"a":1}']
+
+
+class SuccessEventsAggregatorTestCase(TestCase):
+
+    def test_flush(self):
+
+        logger = Mock()
+        aggregator = SuccessEventsAggregator(60, logger)
+        aggregator.start = Mock()
+
+        aggregator.record('USER_READ', 200, 0.25)
+        aggregator.record('USER_READ', 200, 0.5)
+        aggregator.record('USER_CREATED', 201, 1)
+        aggregator.flush()
+
+        message = logger.info.call_args[0][0]
+        assert message.event == 'SUCCESS_EVENTS_AGGREGATED'
+        assert message.data['events'] == [
+            {
+                '@event': 'USER_READ',
+                'status_code': 200,
+                'count': 2,
+                'latency_sum': 0.75,
+            },
+            {
+                '@event': 'USER_CREATED',
+                'status_code': 201,
+                'count': 1,
+                'latency_sum': 1,
+            },
+        ]
+
+        # -- nothing is logged for the empty window
+        aggregator.flush()
+
+        assert logger.info.call_count == 1
+
+    def test_run(self):
+
+        logger = Mock()
+        aggregator = SuccessEventsAggregator(0.01, logger)
+
+        aggregator.record('USER_READ', 200, 0.25)
+        aggregator.thread.join(0.1)
+
+        assert logger.info.call_count == 1
+        assert aggregator.counters == {}
+
+        aggregator.stop()
+        aggregator.thread.join(1)
+
+        assert not aggregator.thread.is_alive()
+
+
+class CriticalEventsThrottleTestCase(TestCase):
+
+    @pytest.fixture(autouse=True)
+    def initfixtures(self, mocker):
+        self.mocker = mocker
+
+    def test_acquire(self):
+
+        monotonic = self.mocker.patch('lily.base.log.monotonic')
+        timer = self.mocker.patch('lily.base.log.Timer')
+        monotonic.return_value = 100
+        throttle = CriticalEventsThrottle(2, 60, Mock())
+
+        assert [throttle.acquire('DB_ERROR') for _ in range(4)] == [
+            True, True, False, False]
+        assert throttle.acquire('OTHER_ERROR') is True
+
+        # -- summary is scheduled for the end of the window once
+        assert timer.call_count == 1
+        assert timer.call_args[0][0] == 60
+
+        # -- next window
+        monotonic.return_value = 160
+        assert throttle.acquire('DB_ERROR') is True
+
+    def test_close(self):
+
+        self.mocker.patch('lily.base.log.Timer')
+        logger = Mock()
+        throttle = CriticalEventsThrottle(1, 60, logger)
+        for _ in range(4):
+            throttle.acquire('DB_ERROR')
+
+        window = throttle.windows['DB_ERROR']
+        throttle.close('DB_ERROR', window)
+
+        message = logger.error.call_args[0][0]
+        assert str(message) == (
+            'CRITICAL_EVENTS_SUPPRESSED: '
+            '{"@event":"DB_ERROR","suppressed":3,"window":60}')
+        assert throttle.windows == {}
+        assert throttle.acquire('DB_ERROR') is True
@@ -0,0 +1,92 @@
+import threading
+
+from django.test import TestCase
+
+from lily.base.metrics import Histogram, MetricsRegistry
+
+
+class HistogramTestCase(TestCase):
+
+    def test_observe(self):
+
+        h = Histogram(buckets=(1, 5, 10))
+
+        h.observe(0.5)
+        h.observe(1)
+        h.observe(7)
+        h.observe(100)
+
+        assert h.serialize() == {
+            'count': 4,
+            'sum': 108.5,
+            'buckets': {1: 2, 5: 0, 10: 1, '+Inf': 1},
+        }
+
+    def test_merge(self):
+
+        a = Histogram(buckets=(1, 5))
+        a.observe(2)
+        b = Histogram(buckets=(1, 5))
+        b.observe(3)
+        b.observe(0)
+
+        a.merge(b)
+
+        assert a.serialize() == {
+            'count': 3,
+            'sum': 5,
+            'buckets': {1: 1, 5: 2, '+Inf': 0},
+        }
+
+
+class MetricsRegistryTestCase(TestCase):
+
+    def test_observe__merges_all_threads(self):
+
+        registry = MetricsRegistry()
+
+        def observe():
+            for _ in range(100):
+                registry.observe('READ_IT', 'handler', 0.002)
+
+        threads = [threading.Thread(target=observe) for _ in range(4)]
+        for t in threads:
+            t.start()
+
+        for t in threads:
+            t.join()
+
+        registry.observe('READ_IT', 'total', 0.003)
+
+        snapshot = registry.snapshot()
+
+        assert snapshot['READ_IT']['handler']['count'] == 400
+        assert snapshot['READ_IT']['handler']['buckets'][0.0025] == 400
+        assert snapshot['READ_IT']['total']['count'] == 1
+
+    def test_observe__stores_of_finished_threads_are_retired(self):
+
+        registry = MetricsRegistry()
+
+        for _ in range(50):
+            t = threading.Thread(
+                target=registry.observe, args=('READ_IT', 'handler', 0.002))
+            t.start()
+            t.join()
+
+        assert len(registry.stores) == 1
+
+        registry.observe('READ_IT', 'handler', 0.002)
+
+        assert len(registry.stores) == 1
+        assert registry.snapshot()['READ_IT']['handler']['count'] == 51
+        assert len(registry.stores) == 1
+
+    def test_reset(self):
+
+        registry = MetricsRegistry()
+        registry.observe('READ_IT', 'handler', 0.002)
+
+        registry.reset()
+
+        assert registry.snapshot() == {}
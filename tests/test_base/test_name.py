@@ -248,3 +248,20 @@ def test_cause_and_effect(phrase, expected_command, expected_event):
 
     e = phrase.effect.finalizers[0]()
     assert phrase.render_event_name(Mock(), e) == expected_event
+
+
+@pytest.mark.parametrize(
+    'noun', ['address', 'process', 'access', 'bus', 'analysis', 'box', 'cat'])
+def test_resource__shared_by_single_and_bulk_verbs(noun):
+
+    resources = {
+        verb(noun).resource
+        for verb in [
+            Create, Read, Update, Delete,
+            BulkCreate, BulkRead, BulkUpdate, BulkDelete,
+            CreateOrUpdate, CreateOrRead,
+        ]
+    }
+
+    assert len(resources) == 1
+    assert Execute('buy', noun).resource in resources
@@ -1,12 +1,36 @@
-
+import json
 from unittest.mock import Mock
 
 from django.test import TestCase
 import pytest
 
+from lily.base import serializers
 from lily.base.output import Output
 
 
+class ItemSerializer(serializers.Serializer):
+
+    _type = 'item'
+
+    id = serializers.IntegerField()
+
+
+class ItemsSerializer(serializers.Serializer):
+
+    _type = 'items_list'
+
+    total = serializers.IntegerField()
+
+    items = ItemSerializer(many=True)
+
+
+class TagsSerializer(serializers.Serializer):
+
+    _type = 'tags_list'
+
+    tags = serializers.ListField(child=serializers.CharField())
+
+
 class OutputTestCase(TestCase):
 
     def test_required_fields(self):
@@ -20,3 +44,117 @@ class OutputTestCase(TestCase):
         o = Output(serializer=serializer)
 
         assert o.serializer == serializer
+        assert o.stream_field is None
+
+    #
+    # STREAM
+    #
+    def test_stream(self):
+
+        o = Output(serializer=ItemsSerializer, stream_field='items')
+
+        chunks = list(o.stream(
+            {'total': 3, 'items': [{'id': 1}, {'id': 2}, {'id': 3}]},
+            'ITEMS_BULK_READ',
+            {}))
+
+        assert json.loads(b''.join(chunks)) == {
+            '@type': 'items_list',
+            '@event': 'ITEMS_BULK_READ',
+            'total': 3,
+            'items': [
+                {'@type': 'item', 'id': 1},
+                {'@type': 'item', 'id': 2},
+                {'@type': 'item', 'id': 3},
+            ],
+        }
+
+    def test_stream__no_items(self):
+
+        o = Output(serializer=ItemsSerializer, stream_field='items')
+
+        chunks = list(o.stream(
+            {'total': 0, 'items': []}, 'ITEMS_BULK_READ', {}))
+
+        assert json.loads(b''.join(chunks)) == {
+            '@type': 'items_list',
+            '@event': 'ITEMS_BULK_READ',
+            'total': 0,
+            'items': [],
+        }
+
+    def test_stream__field(self):
+
+        o = Output(serializer=TagsSerializer, stream_field='tags')
+
+        chunks = list(o.stream({'tags': ['a', 'b']}, 'TAGS_BULK_READ', {}))
+
+        assert json.loads(b''.join(chunks)) == {
+            '@type': 'tags_list',
+            '@event': 'TAGS_BULK_READ',
+            'tags': ['a', 'b'],
+        }
+
+    def test_stream__items_are_consumed_in_chunks(self):
+
+        consumed = []
+
+        def items():
+            for i in range(5):
+                consumed.append(i)
+                yield {'id': i}
+
+        o = Output(
+            serializer=ItemsSerializer, stream_field='items', chunk_size=2)
+
+        stream = o.stream(
+            {'total': 5, 'items': items()}, 'ITEMS_BULK_READ', {})
+
+        # -- envelope
+        next(stream)
+        assert consumed == []
+
+        # -- 1st chunk
+        assert next(stream) == (
+            b'{"id":0,"@type":"item"},{"id":1,"@type":"item"}')
+        assert consumed == [0, 1]
+
+        # -- 2nd chunk
+        assert next(stream) == (
+            b',{"id":2,"@type":"item"},{"id":3,"@type":"item"}')
+        assert consumed == [0, 1, 2, 3]
+
+        assert list(stream) == [b',{"id":4,"@type":"item"}', b']}']
+
+    def test_stream__memo_is_kept_per_chunk(self):
+
+        class DoubleSerializer(serializers.Serializer):
+
+            _type = 'double'
+
+            double = serializers.SerializerMethodField()
+
+            @serializers.memoize
+            def get_double(self, instance):
+                return 2 * instance['id']
+
+        class DoublesSerializer(serializers.Serializer):
+
+            _type = 'doubles_list'
+
+            items = DoubleSerializer(many=True)
+
+        o = Output(
+            serializer=DoublesSerializer, stream_field='items', chunk_size=1)
+        context = {'memo': {}}
+
+        chunks = list(o.stream(
+            {'items': ({'id': i} for i in range(50))},
+            'DOUBLES_BULK_READ',
+            context))
+
+        assert [
+            item['double']
+            for item in json.loads(b''.join(chunks))['items']
+        ] == [2 * i for i in range(50)]
+        assert context['memo'] == {}
@@ -0,0 +1,54 @@
+
+from django.core.cache import caches
+from django.test import TestCase, RequestFactory
+
+from lily.base.context import Context, current_context
+from lily.base.routers import ReadReplicaRouter, is_sticky, make_sticky
+from lily.base.test import override_settings
+
+
+class ReadReplicaRouterTestCase(TestCase):
+
+    def test_db_for_read(self):
+
+        router = ReadReplicaRouter()
+        context = Context('READ_IT', RequestFactory().get('/'))
+
+        # -- no command
+        assert router.db_for_read(None) is None
+
+        token = current_context.set(context)
+        try:
+            # -- default routing
+            assert router.db_for_read(None) is None
+
+            # -- replica
+            context.database = 'replica'
+            assert router.db_for_read(None) == 'replica'
+            assert router.db_for_write(None) is None
+
+        finally:
+            current_context.reset(token)
+
+
+class StickinessTestCase(TestCase):
+
+    def setUp(self):
+        caches['default'].clear()
+
+    @override_settings(LILY_READ_REPLICA_STICKINESS=10)
+    def test_make_sticky(self):
+
+        assert is_sticky('abc') is False
+
+        make_sticky('abc')
+
+        assert is_sticky('abc') is True
+        assert is_sticky('def') is False
+
+    @override_settings(LILY_READ_REPLICA_STICKINESS=0)
+    def test_make_sticky__disabled(self):
+
+        make_sticky('abc')
+
+        assert is_sticky('abc') is False
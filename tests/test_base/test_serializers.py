@@ -14,7 +14,45 @@ from .serializers import (
     MediaItemFileSerializer,
     MediaItemSerializer,
 )
-from .models import Account, Person, MediaItemFile
+from .models import (
+    Account,
+    Catalogue,
+    CatalogueFile,
+    CatalogueItem,
+    MediaItemFile,
+    Person,
+)
+
+
+class CatalogueFileSerializer(serializers.ModelSerializer):
+
+    _type = 'catalogue_file'
+
+    class Meta:
+        model = CatalogueFile
+        fields = ('id', 'uri')
+
+
+class CatalogueItemSerializer(serializers.ModelSerializer):
+
+    _type = 'catalogue_item'
+
+    file = CatalogueFileSerializer()
+
+    class Meta:
+        model = CatalogueItem
+        fields = ('id', 'name')
+
+
+class CatalogueSerializer(serializers.ModelSerializer):
+
+    _type = 'catalogue'
+
+    items = CatalogueItemSerializer(many=True)
+
+    class Meta:
+        model = Catalogue
+        fields = ('id', 'name')
 
 
 class SerializerTestCase(TestCase):
@@ -176,6 +214,340 @@ class SerializerTestCase(TestCase):
             }
         }
 
+    #
+    # CASE: COMPILED FIELDS
+    #
+    def test_compile__computed_once_per_class(self):
+
+        class FileSerializer(serializers.Serializer):
+
+            _type = 'file'
+
+            uri = serializers.CharField()
+
+        class FolderSerializer(serializers.Serializer):
+
+            _type = 'folder'
+
+            files = FileSerializer(many=True)
+
+        # -- fields are discovered with the `dir` builtin
+        discover = self.mocker.patch(
+            'lily.base.serializers.dir', create=True, side_effect=dir)
+
+        data = FolderSerializer({
+            'files': [{'uri': str(i)} for i in range(1000)],
+        }).data
+
+        assert len(data['files']) == 1000
+        assert data['files'][999] == {'@type': 'file', 'uri': '999'}
+        # -- `FileSerializer` got compiled already while `FolderSerializer`
+        # -- was being declared
+        assert discover.call_count == 1
+
+    def test_compile__fields_of_subclass(self):
+
+        class PersonWithEmailSerializer(PersonSerializer):
+
+            email = serializers.CharField()
+
+        assert list(PersonSerializer.compile()[0]) == ['age', 'name']
+        assert list(PersonWithEmailSerializer.compile()[0]) == [
+            'age', 'email', 'name']
+
+
+class SerializeManyTestCase(TestCase):
+
+    @pytest.fixture(autouse=True)
+    def initfixture(self, mocker):
+        self.mocker = mocker
+
+    def get_media_items(self):
+        return [
+            {
+                'id': i,
+                'original': i and MediaItemFile(
+                    content_type='image/png',
+                    file_uri=f'http://{i}.png') or None,
+                'files': [
+                    MediaItemFile(
+                        content_type='image/jpg',
+                        file_uri=f'http://{i}.{j}.jpg')
+                    for j in range(i)
+                ],
+                'type': 'IMAGE',
+                'usage_type': 'MEDIAITEM',
+                'text': 'hello world',
+                'reference': {'i': i},
+            }
+            for i in range(4)
+        ]
+
+    def test_serialize_many(self):
+
+        items = self.get_media_items()
+
+        assert MediaItemSerializer().serialize_many(items) == [
+            MediaItemSerializer(item).data for item in items]
+
+    def test_serialize_many__methods_and_access(self):
+
+        now = timezone.now()
+        accounts = [
+            Account(
+                user_id=i,
+                atype='FREE',
+                freemium_till_datetime=now,
+                show_in_ranking=True)
+            for i in range(3)
+        ]
+        for a in accounts:
+            a.user_email = f'{a.user_id}@player.io'
+
+        context = {'request': Mock(access={'user_id': 1})}
+
+        assert AccountSerializer(
+            context=context).serialize_many(accounts) == [
+            AccountSerializer(a, context=context).data for a in accounts]
+        assert PersonSerializer().serialize_many(
+            [Person(name='John', age=81)]) == [
+            PersonSerializer(Person(name='John', age=81)).data]
+
+    def test_serialize_many__nested_serializer_is_reused(self):
+
+        items = self.get_media_items()
+        init = self.mocker.spy(MediaItemFileSerializer, '__init__')
+
+        MediaItemSerializer().serialize_many(items)
+
+        # -- once for `original` and once for `files`
+        assert init.call_count == 2
+
+    def test_serialize_many__custom_serialize(self):
+
+        assert serializers.ObjectSerializer().serialize_many(
+            [{'a': 1}, {'b': 2}]) == [
+            {'@type': 'object', 'a': 1},
+            {'@type': 'object', 'b': 2},
+        ]
+
+    def test_serialize_many__missing_type(self):
+
+        class TypelessSerializer(serializers.Serializer):
+
+            name = serializers.CharField()
+
+        with pytest.raises(serializers.MissingTypeError):
+            TypelessSerializer().serialize_many([{'name': 'a'}])
+
+
+class OptimizeQuerysetTestCase(TestCase):
+
+    def create_catalogues(self, count):
+        for i in range(count):
+            catalogue = Catalogue.objects.create(name=f'catalogue {i}')
+            for j in range(count):
+                CatalogueItem.objects.create(
+                    catalogue=catalogue,
+                    file=CatalogueFile.objects.create(uri=f'{i}/{j}'),
+                    name=f'item {j}')
+
+    def test_render_queryset_plan(self):
+
+        select, prefetch, only = CatalogueSerializer.render_queryset_plan(
+            Catalogue)
+
+        assert select == []
+        assert only == ['id', 'name']
+        assert len(prefetch) == 1
+        assert prefetch[0].prefetch_through == 'items'
+        items = prefetch[0].queryset.query
+        assert items.select_related == {'file': {}}
+        assert items.deferred_loading == (
+            frozenset({
+                'id', 'name', 'file', 'file__id', 'file__uri', 'catalogue',
+            }),
+            False)
+
+    def test_render_queryset_plan__access_needs_all_columns(self):
+
+        class AccessibleCatalogueFileSerializer(CatalogueFileSerializer):
+
+            def get_access(self, instance):
+                return []
+
+        assert AccessibleCatalogueFileSerializer.render_queryset_plan(
+            CatalogueFile) == ([], [], None)
+
+    def test_optimize_queryset__constant_number_of_queries(self):
+
+        for count in [2, 5]:
+            self.create_catalogues(count)
+            expected = CatalogueSerializer().serialize_many(
+                Catalogue.objects.all())
+
+            queryset = CatalogueSerializer.optimize_queryset(
+                Catalogue.objects.all())
+            with self.assertNumQueries(2):
+                assert CatalogueSerializer().serialize_many(
+                    queryset) == expected
+
+            Catalogue.objects.all().delete()
+
+
+class ModelSerializerRowsTestCase(TestCase):
+
+    @pytest.fixture(autouse=True)
+    def initfixtures(self, mocker):
+        self.mocker = mocker
+
+    def test_compile_columns(self):
+
+        class SizedCatalogueFileSerializer(CatalogueFileSerializer):
+
+            class Meta:
+                model = CatalogueFile
+                fields = ('id', 'uri', 'size')
+
+        assert SizedCatalogueFileSerializer.compile_columns() == (
+            'id', 'uri', 'size')
+        assert CatalogueItemSerializer.compile_columns() is None
+
+    def test_compile_columns__instance_required(self):
+
+        class AccessibleCatalogueFileSerializer(CatalogueFileSerializer):
+
+            def get_access(self, instance):
+                return []
+
+        class MethodCatalogueFileSerializer(CatalogueFileSerializer):
+
+            kind = serializers.SerializerMethodField()
+
+            def get_kind(self, instance):
+                return 'file'
+
+        assert AccessibleCatalogueFileSerializer.compile_columns() is None
+        assert MethodCatalogueFileSerializer.compile_columns() is None
+
+    def test_serialize_many__rows(self):
+
+        for i in range(3):
+            CatalogueFile.objects.create(uri=f'{i}', size=i)
+
+        expected = [
+            CatalogueFileSerializer(f).data
+            for f in CatalogueFile.objects.order_by('id')]
+        init = self.mocker.spy(CatalogueFile, '__init__')
+
+        with self.assertNumQueries(1):
+            assert CatalogueFileSerializer().serialize_many(
+                CatalogueFile.objects.order_by('id')) == expected
+
+        assert init.call_count == 0
+
+    def test_serialize_many__evaluated_queryset(self):
+
+        CatalogueFile.objects.create(uri='a')
+        queryset = CatalogueFile.objects.all()
+        list(queryset)
+
+        with self.assertNumQueries(0):
+            assert CatalogueFileSerializer().serialize_many(queryset) == [
+                {'@type': 'catalogue_file', 'id': queryset[0].id, 'uri': 'a'},
+            ]
+
+    def test_serialize__nested_queryset(self):
+
+        class FilesSerializer(serializers.Serializer):
+
+            _type = 'files'
+
+            files = CatalogueFileSerializer(many=True)
+
+        f = CatalogueFile.objects.create(uri='a')
+
+        with self.assertNumQueries(1):
+            assert FilesSerializer(
+                {'files': CatalogueFile.objects.all()}).data == {
+                    '@type': 'files',
+                    'files': [
+                        {'@type': 'catalogue_file', 'id': f.id, 'uri': 'a'},
+                    ],
+                }
+
+
+class MemoizeTestCase(TestCase):
+
+    def get_serializer_class(self, counted):
+
+        class CountedCatalogueFileSerializer(CatalogueFileSerializer):
+
+            is_big = serializers.SerializerMethodField()
+
+            @serializers.memoize
+            def get_is_big(self, instance):
+                counted.append(instance)
+                return instance.size > 10
+
+        return CountedCatalogueFileSerializer
+
+    def test_memoize(self):
+
+        counted = []
+        serializer_class = self.get_serializer_class(counted)
+        f = CatalogueFile.objects.create(uri='a', size=11)
+        context = {'memo': {}}
+
+        data = serializer_class(
+            context=context).serialize_many([f, f, CatalogueFile(pk=f.pk)])
+
+        assert [d['is_big'] for d in data] == [True, True, True]
+        assert counted == [f]
+        assert len(context['memo']) == 1
+
+    def test_memoize__identity_of_unsaved_instances(self):
+
+        counted = []
+        serializer_class = self.get_serializer_class(counted)
+        f, g = CatalogueFile(size=1), CatalogueFile(size=20)
+        context = {'memo': {}}
+
+        assert serializer_class(f, context=context).data['is_big'] is False
+        assert serializer_class(g, context=context).data['is_big'] is True
+        assert serializer_class(f, context=context).data['is_big'] is False
+        assert len(counted) == 2
+
+    def test_memoize__freed_objects(self):
+
+        class DoubleSerializer(serializers.Serializer):
+
+            _type = 'double'
+
+            double = serializers.SerializerMethodField()
+
+            @serializers.memoize
+            def get_double(self, instance):
+                return 2 * instance['id']
+
+        context = {'memo': {}}
+
+        assert [
+            DoubleSerializer({'id': i}, context=context).data['double']
+            for i in range(50)
+        ] == [2 * i for i in range(50)]
+
+    def test_memoize__no_memo(self):
+
+        counted = []
+        serializer_class = self.get_serializer_class(counted)
+        f = CatalogueFile(size=1)
+
+        serializer_class(f).data
+        serializer_class(f, context={}).data
+
+        assert len(counted) == 2
+
 
 class EmptySerializerTestCase(TestCase):
 
@@ -0,0 +1,210 @@
+
+from datetime import datetime
+from decimal import Decimal
+from uuid import UUID
+
+from django.db import transaction
+from django.test import RequestFactory, TestCase
+from django_fake_model import models as fake_models
+import pytest
+
+from lily.base.command import command, HTTPCommands
+from lily.base.meta import Meta, Domain
+from lily.base.models import BaseEventRecord
+from lily.base.sinks import BatchedEventSink, ModelEventSink
+from lily.base.test import override_settings
+
+
+class EventRecord(fake_models.FakeModel, BaseEventRecord):
+    pass
+
+
+class RecordingSink(BatchedEventSink):
+
+    def __init__(self, **kwargs):
+        super(RecordingSink, self).__init__(**kwargs)
+        self.batches = []
+
+    def write(self, records):
+        self.batches.append(records)
+
+
+def record(i, event_type='success'):
+    return {
+        'event': 'EVENT_{}'.format(i),
+        'type': event_type,
+        'status_code': 200,
+        'command_name': 'READ_IT',
+        'correlation_id': 'abc',
+        'data': {},
+    }
+
+
+class AtomicCommands(HTTPCommands):
+
+    @command(
+        name='BREAK_IT',
+        meta=Meta(
+            title='break it',
+            domain=Domain(id='break', name='break')),
+        is_atomic='default')
+    def post(self, request):
+
+        raise self.event.BrokenRequest('IT_BROKEN', context=request)
+
+
+class BatchedEventSinkTestCase(TestCase):
+
+    @pytest.fixture(autouse=True)
+    def initfixtures(self, mocker):
+        self.mocker = mocker
+
+    def test_send__written_in_batches(self):
+
+        sink = RecordingSink(batch_size=2, flush_interval=5)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            for i in range(5):
+                sink.send(record(i))
+
+        sink.close()
+
+        assert [len(batch) for batch in sink.batches] == [2, 2, 1]
+        assert [r['event'] for b in sink.batches for r in b] == [
+            'EVENT_0', 'EVENT_1', 'EVENT_2', 'EVENT_3', 'EVENT_4']
+        assert sink.thread is None
+
+    def test_send__rolled_back(self):
+
+        sink = RecordingSink()
+
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            sink.send(record(0))
+            try:
+                with transaction.atomic():
+                    sink.send(record(1))
+                    raise ValueError
+
+            except ValueError:
+                pass
+
+        assert len(callbacks) == 1
+
+        sink.close()
+
+        assert [r['event'] for b in sink.batches for r in b] == ['EVENT_0']
+
+    def test_send__queue_is_full(self):
+
+        sink = RecordingSink(max_size=1, put_timeout=0)
+        self.mocker.patch.object(sink, 'start')
+
+        sink.enqueue(record(0))
+        sink.enqueue(record(1))
+
+        assert sink.queue.qsize() == 1
+        assert sink.dropped == 1
+
+    def test_flush__write_failed(self):
+
+        sink = RecordingSink()
+        self.mocker.patch.object(sink, 'write', side_effect=ValueError)
+        logger = self.mocker.patch('lily.base.sinks.logger')
+
+        sink.flush([record(0)])
+
+        assert logger.exception.call_count == 1
+
+    def test_flush__write_failed__only_broken_records_are_lost(self):
+
+        sink = RecordingSink()
+        write = sink.write
+
+        def write_valid(records):
+            if any(r['data'] for r in records):
+                raise ValueError
+
+            write(records)
+
+        self.mocker.patch.object(sink, 'write', side_effect=write_valid)
+        logger = self.mocker.patch('lily.base.sinks.logger')
+        broken = {**record(1), 'data': {'broken': True}}
+
+        sink.flush([record(0), broken, record(2)])
+
+        assert [r['event'] for b in sink.batches for r in b] == [
+            'EVENT_0', 'EVENT_2']
+        assert logger.exception.call_count == 1
+
+    def test_send__error_of_rolled_back_transaction(self):
+
+        sink = RecordingSink()
+
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            try:
+                with transaction.atomic():
+                    sink.send(record(0, 'error'))
+                    raise ValueError
+
+            except ValueError:
+                pass
+
+        assert callbacks == []
+
+        sink.close()
+
+        assert [r['event'] for b in sink.batches for r in b] == ['EVENT_0']
+
+    def test_send__error_of_atomic_command(self):
+
+        sink = RecordingSink()
+        self.mocker.patch(
+            'lily.base.events.get_event_sink', return_value=sink)
+        self.mocker.patch('lily.base.events.logging.getLogger')
+
+        with override_settings(LILY_EVENT_SINK_CLASS='some.Sink'):
+            with self.captureOnCommitCallbacks(execute=True):
+                response = AtomicCommands().post(
+                    RequestFactory().post('/'))
+
+        sink.close()
+
+        assert response.status_code == 400
+        assert [
+            (r['event'], r['type'], r['status_code'])
+            for b in sink.batches for r in b
+        ] == [('IT_BROKEN', 'error', 400)]
+
+
+@EventRecord.fake_me
+class ModelEventSinkTestCase(TestCase):
+
+    def test_write(self):
+
+        sink = ModelEventSink(model=EventRecord)
+
+        sink.write([record(0), record(1)])
+
+        assert list(
+            EventRecord.objects.order_by('id').values_list(
+                'event', 'command_name')) == [
+            ('EVENT_0', 'READ_IT'),
+            ('EVENT_1', 'READ_IT'),
+        ]
+
+    def test_write__native_types(self):
+
+        sink = ModelEventSink(model=EventRecord)
+        data = {
+            'id': UUID('2b8e6c4c-2f36-4a0c-9b5e-0f5c4d9f0a11'),
+            'at': datetime(2020, 1, 2, 3, 4, 5),
+            'price': Decimal('1.50'),
+        }
+
+        sink.write([{**record(0), 'data': data}])
+
+        assert EventRecord.objects.get().data == {
+            'id': '2b8e6c4c-2f36-4a0c-9b5e-0f5c4d9f0a11',
+            'at': '2020-01-02T03:04:05',
+            'price': '1.50',
+        }
@@ -1,14 +1,24 @@
 
 from unittest.mock import call
 from copy import deepcopy
+from functools import wraps
+from importlib import reload
 import json
 
-from django.test import TestCase
-from django.urls import reverse
+from django.http import HttpResponse
+from django.test import TestCase, override_settings as override_urls
+from django.urls import get_resolver, reverse, re_path, NoReverseMatch
 import pytest
 
-from lily.base.test import Client
+from lily.base import name, parsers, serializers
+from lily.base.command import command, HTTPCommands
+from lily.base.input import Input
+from lily.base.meta import Meta, Domain
+from lily.base.output import Output
+from lily.base.test import Client, override_settings
+from lily.entrypoint import urls
 from lily.entrypoint.commands import (
+    BatchCommands,
     EntryPointCommands,
     CommandSerializer,
 )
@@ -374,3 +384,330 @@ class EntryPointCommandsTestCase(TestCase):
         self.commands_dir.join('2.0.0.json').write(json.dumps(commands1))
 
         assert EntryPointCommands().get_commands('2.0.0') == commands1
+
+
+class ItemSerializer(serializers.Serializer):
+
+    _type = 'item'
+
+    id = serializers.IntegerField()
+
+    amount = serializers.IntegerField()
+
+    trace = serializers.CharField()
+
+
+class ItemCommands(HTTPCommands):
+
+    class QueryParser(parsers.Parser):
+
+        amount = parsers.IntegerField(default=0)
+
+    class BodyParser(parsers.Parser):
+
+        amount = parsers.IntegerField()
+
+    @command(
+        name=name.Read('ITEM'),
+        meta=Meta(
+            title='read item',
+            domain=Domain(id='items', name='items')),
+        input=Input(query_parser=QueryParser),
+        output=Output(serializer=ItemSerializer),
+    )
+    def get(self, request, item_id):
+
+        raise self.event.Read({
+            'id': item_id,
+            'amount': request.input.query['amount'],
+            'trace': request.META.get('HTTP_X_TRACE'),
+        })
+
+    @command(
+        name=name.Update('ITEM'),
+        meta=Meta(
+            title='update item',
+            domain=Domain(id='items', name='items')),
+        input=Input(body_parser=BodyParser),
+        output=Output(serializer=ItemSerializer),
+    )
+    def put(self, request, item_id):
+
+        raise self.event.Updated({
+            'id': item_id,
+            'amount': request.input.body['amount'],
+            'trace': request.META.get('HTTP_X_TRACE'),
+        })
+
+    @command(
+        name=name.Delete('ITEM'),
+        meta=Meta(
+            title='delete item',
+            domain=Domain(id='items', name='items')),
+    )
+    def delete(self, request, item_id):
+
+        return HttpResponse('deleted')
+
+
+def rejected_with_header_body(view):
+
+    @wraps(view)
+    def wrapped(request, *args, **kwargs):
+        if 'HTTP_X_REJECTED_BODY' in request.META:
+            return HttpResponse(
+                request.META['HTTP_X_REJECTED_BODY'], status=403)
+
+        return view(request, *args, **kwargs)
+
+    return wrapped
+
+
+urlpatterns = [
+    re_path(r'^batch/$', BatchCommands.as_view(), name='batch'),
+]
+
+
+@override_urls(ROOT_URLCONF=__name__)
+class BatchCommandsTestCase(TestCase):
+
+    uri = '/batch/'
+
+    @pytest.fixture(autouse=True)
+    def initfixtures(self, mocker):
+        self.mocker = mocker
+
+    def setUp(self):
+        self.app = Client()
+        self.app.resolver = get_resolver(__name__)
+
+        BatchCommands.commands_index = None
+        self.mocker.patch(
+            'lily.entrypoint.commands.get_resolver'
+        ).return_value.url_patterns = [
+            re_path(
+                r'^items/(?P<item_id>\d+)/$',
+                ItemCommands.as_view(),
+                name='items.element'),
+            re_path(
+                r'^batch/$',
+                BatchCommands.as_view(),
+                name='batch'),
+        ]
+
+    @override_settings(LILY_BATCH_COMMANDS_MAX_WORKERS=4)
+    def test_post(self):
+
+        execute = self.mocker.spy(BatchCommands, 'execute_entry_in_thread')
+
+        response = self.app.post(
+            self.uri,
+            data={
+                'commands': [
+                    {
+                        'name': 'READ_ITEM',
+                        'params': {'item_id': 1},
+                        'query': {'amount': 10},
+                    },
+                    {
+                        'name': 'READ_ITEM',
+                        'params': {'item_id': 2},
+                    },
+                    {
+                        'name': 'UPDATE_ITEM',
+                        'params': {'item_id': 3},
+                        'body': {'amount': 30},
+                    },
+                    {
+                        'name': 'UPDATE_ITEM',
+                        'params': {'item_id': 4},
+                        'body': {},
+                    },
+                ],
+            },
+            content_type='application/json',
+            HTTP_X_TRACE='abc')
+
+        assert response.status_code == 200
+        body = response.json()
+        assert body['@event'] == 'BATCH_EXECUTED'
+        assert [
+            (r['name'], r['status_code'], r['body']['@event'])
+            for r in body['results']
+        ] == [
+            ('READ_ITEM', 200, 'ITEM_READ'),
+            ('READ_ITEM', 200, 'ITEM_READ'),
+            ('UPDATE_ITEM', 200, 'ITEM_UPDATED'),
+            ('UPDATE_ITEM', 400, 'BODY_DID_NOT_VALIDATE'),
+        ]
+        assert body['results'][0]['body'] == {
+            '@type': 'item',
+            '@event': 'ITEM_READ',
+            'id': 1,
+            'amount': 10,
+            'trace': 'abc',
+        }
+        assert body['results'][2]['body']['amount'] == 30
+
+        # -- only consecutive reads are executed concurrently
+        assert execute.call_count == 2
+
+    def test_post__unknown_commands(self):
+
+        response = self.app.post(
+            self.uri,
+            data={
+                'commands': [
+                    {'name': 'READ_ITEM', 'params': {'item_id': 1}},
+                    {'name': 'READ_WHAT'},
+                    {'name': 'EXECUTE_BATCH'},
+                ],
+            },
+            content_type='application/json')
+
+        assert response.status_code == 400
+        assert response.json()['@event'] == 'UNKNOWN_BATCH_COMMANDS_DETECTED'
+        assert response.json()['commands'] == ['READ_WHAT', 'EXECUTE_BATCH']
+
+    def test_post__missing_params(self):
+
+        response = self.app.post(
+            self.uri,
+            data={'commands': [{'name': 'READ_ITEM'}]},
+            content_type='application/json')
+
+        assert response.status_code == 400
+        assert response.json()['params'] == {'READ_ITEM': ['item_id']}
+
+    @override_settings(LILY_BATCH_COMMANDS_MAX_SIZE=1)
+    def test_post__too_many_commands(self):
+
+        response = self.app.post(
+            self.uri,
+            data={
+                'commands': [
+                    {'name': 'READ_ITEM', 'params': {'item_id': 1}},
+                    {'name': 'READ_ITEM', 'params': {'item_id': 2}},
+                ],
+            },
+            content_type='application/json')
+
+        assert response.status_code == 400
+        assert response.json()['@event'] == (
+            'TOO_MANY_BATCH_COMMANDS_DETECTED')
+
+    def test_post__reads_are_executed_one_by_one(self):
+
+        execute = self.mocker.spy(BatchCommands, 'execute_entry_in_thread')
+
+        response = self.app.post(
+            self.uri,
+            data={
+                'commands': [
+                    {'name': 'READ_ITEM', 'params': {'item_id': 1}},
+                    {'name': 'READ_ITEM', 'params': {'item_id': 2}},
+                ],
+            },
+            content_type='application/json')
+
+        assert response.status_code == 200
+        assert [
+            r['body']['id'] for r in response.json()['results']
+        ] == [1, 2]
+        assert execute.call_count == 0
+
+    def test_post__params_not_matching_path(self):
+
+        response = self.app.post(
+            self.uri,
+            data={
+                'commands': [
+                    {
+                        'name': 'READ_ITEM',
+                        'params': {'item_id': 'not-a-number'},
+                    },
+                    {
+                        'name': 'READ_ITEM',
+                        'params': {'item_id': 1, 'extra': 'yo'},
+                    },
+                ],
+            },
+            content_type='application/json')
+
+        assert response.status_code == 200
+        assert [
+            (r['status_code'], r['body']['@event'])
+            for r in response.json()['results']
+        ] == [
+            (404, 'BATCH_COMMAND_PATH_NOT_FOUND'),
+            (200, 'ITEM_READ'),
+        ]
+
+    def test_post__not_json_response(self):
+
+        response = self.app.post(
+            self.uri,
+            data={
+                'commands': [
+                    {'name': 'DELETE_ITEM', 'params': {'item_id': 1}},
+                ],
+            },
+            content_type='application/json')
+
+        assert response.status_code == 200
+        assert response.json()['results'] == [
+            {
+                '@type': 'batch_result',
+                'name': 'DELETE_ITEM',
+                'status_code': 200,
+                'body': 'deleted',
+            },
+        ]
+
+    def test_post__routed_view_is_executed(self):
+
+        self.mocker.patch(
+            'lily.entrypoint.commands.get_resolver'
+        ).return_value.url_patterns = [
+            re_path(
+                r'^items/(?P<item_id>\d+)/$',
+                rejected_with_header_body(ItemCommands.as_view()),
+                name='items.element'),
+        ]
+
+        for rejected_body, expected in [
+                ('{}', {}),
+                ('[]', []),
+                ('0', 0),
+                ('false', False),
+                ('', None)]:
+
+            response = self.app.post(
+                self.uri,
+                data={
+                    'commands': [
+                        {'name': 'READ_ITEM', 'params': {'item_id': 1}},
+                    ],
+                },
+                content_type='application/json',
+                HTTP_X_REJECTED_BODY=rejected_body)
+
+            assert response.status_code == 200
+            assert response.json()['results'][0]['status_code'] == 403
+            assert response.json()['results'][0]['body'] == expected
+
+    def test_route_is_enabled_explicitly(self):
+
+        try:
+            with override_settings(LILY_BATCH_COMMANDS_ENABLED=True):
+                reload(urls)
+
+            assert [p.name for p in urls.urlpatterns] == [
+                'entrypoint', 'batch']
+
+        finally:
+            reload(urls)
+
+        assert [p.name for p in urls.urlpatterns] == ['entrypoint']
+        with pytest.raises(NoReverseMatch):
+            reverse('entrypoint:batch')